@@ -0,0 +1,107 @@
+# adaptive_scheduler.py
+import math
+import threading
+
+from scanner_metrics import metrics
+
+TARGET_FPS = 30.0 # Cadence d'affichage visée (images par seconde)
+LATENCY_BUDGET_MS = 150.0 # Temps de traitement maximal souhaité pour une image
+RESIZE_HEIGHT_LEVELS = (1000, 800, 640, 480) # Hauteurs de détection possibles, de la plus précise à la plus rapide
+MAX_PROCESSING_INTERVAL = 15 # Ne jamais traiter moins d'une image sur N
+COST_SMOOTHING = 0.2 # Poids de la dernière mesure dans la moyenne glissante exponentielle
+SAMPLES_BEFORE_RESIZE_CHANGE = 5 # Mesures consécutives hors budget avant de changer la hauteur de détection
+
+
+class AdaptiveScheduler:
+    """
+    Ajuste la fréquence de traitement et la hauteur de redimensionnement de la détection
+    à partir du coût mesuré de chaque traitement (détection + identification).
+
+    - L'intervalle de traitement (une image sur N) est choisi pour que les workers suivent la
+      cadence visée : N = ceil(coût moyen x fps visé / nombre de workers).
+    - Si le coût dépasse le budget de latence, la détection passe à une hauteur plus faible ;
+      s'il reste largement sous le budget, elle remonte vers une hauteur plus précise.
+      Un changement de hauteur exige plusieurs mesures consécutives (hystérésis).
+
+    Les décisions courantes sont exportées en direct dans les jauges `scheduler_*` de scanner_metrics.
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, latency_budget_ms=LATENCY_BUDGET_MS, workers=1,
+                 resize_height_levels=RESIZE_HEIGHT_LEVELS, max_processing_interval=MAX_PROCESSING_INTERVAL):
+        self.target_fps = target_fps
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.workers = max(workers, 1)
+        self.resize_height_levels = tuple(resize_height_levels)
+        self.max_processing_interval = max_processing_interval
+        self.processing_interval = 1
+        self._resize_level = 0
+        self.average_cost = None
+        self.samples = 0
+        self.interval_changes = 0
+        self.resize_changes = 0
+        self._over_budget_streak = 0
+        self._under_budget_streak = 0
+        self._lock = threading.Lock()
+        self._export_gauges()
+
+    @property
+    def resize_height(self):
+        return self.resize_height_levels[self._resize_level]
+
+    def record(self, processing_seconds):
+        """Enregistre le coût d'un traitement et met à jour les décisions."""
+        with self._lock:
+            self.samples += 1
+            if self.average_cost is None:
+                self.average_cost = processing_seconds
+            else:
+                self.average_cost += COST_SMOOTHING * (processing_seconds - self.average_cost)
+
+            interval = math.ceil(self.average_cost * self.target_fps / self.workers)
+            interval = min(max(interval, 1), self.max_processing_interval)
+            if interval != self.processing_interval:
+                self.processing_interval = interval
+                self.interval_changes += 1
+
+            if self.average_cost > self.latency_budget:
+                self._over_budget_streak += 1
+                self._under_budget_streak = 0
+            elif self.average_cost < 0.5 * self.latency_budget:
+                self._under_budget_streak += 1
+                self._over_budget_streak = 0
+            else:
+                self._over_budget_streak = self._under_budget_streak = 0
+
+            if self._over_budget_streak >= SAMPLES_BEFORE_RESIZE_CHANGE and self._resize_level < len(self.resize_height_levels) - 1:
+                self._change_resize_level(+1)
+            elif self._under_budget_streak >= SAMPLES_BEFORE_RESIZE_CHANGE and self._resize_level > 0:
+                self._change_resize_level(-1)
+            self._export_gauges()
+
+    def _export_gauges(self):
+        metrics.set_gauge("scheduler_workers", self.workers)
+        metrics.set_gauge("scheduler_processing_interval", self.processing_interval)
+        metrics.set_gauge("scheduler_resize_height", self.resize_height)
+        metrics.set_gauge("scheduler_average_cost_ms", (self.average_cost or 0.0) * 1000)
+
+    def _change_resize_level(self, step):
+        self._resize_level += step
+        self.resize_changes += 1
+        self._over_budget_streak = self._under_budget_streak = 0
+        # Le coût dépend de la hauteur de détection : repartir d'une nouvelle moyenne
+        self.average_cost = None
+
+    def should_process(self, frames_since_last_submission):
+        return frames_since_last_submission >= self.processing_interval
+
+    def metrics(self):
+        """Décisions courantes du scheduler, à exporter avec les métriques du pipeline."""
+        with self._lock:
+            return {
+                "scheduler_processing_interval": self.processing_interval,
+                "scheduler_resize_height": self.resize_height,
+                "scheduler_average_cost_ms": (self.average_cost or 0.0) * 1000,
+                "scheduler_samples": self.samples,
+                "scheduler_interval_changes": self.interval_changes,
+                "scheduler_resize_changes": self.resize_changes,
+            }
@@ -0,0 +1,248 @@
+# batch_identifier.py
+"""
+Identification en lot, sans interface graphique, de photos de cartes (imports d'inventaire).
+
+Pour chaque image : détection des cartes -> redressement -> identification, répartis sur plusieurs
+processus. Les résultats sont écrits en JSON Lines ou CSV, une ligne par carte détectée
+(fichier, coins, carte identifiée, meilleur candidat même rejeté, distance, marge, temps par étape).
+Aucune fenêtre n'est jamais ouverte : le script peut tourner dans un conteneur.
+
+    python batch_identifier.py photos/ "scans/*.jpg" --output resultats.jsonl
+    python batch_identifier.py photos/ --format csv --output resultats.csv --workers 8
+    python batch_identifier.py classeur_base/ --sets base1,base2 --output resultats.jsonl
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+from PIL import Image
+
+from detect_card import detect_card_boxes
+from card_warper import warp_card_to_standard_ratio
+from card_identifier import find_top_matches_batch
+from hash_database import load_hash_matrix
+from search_partitions import SearchScope
+
+HASHED_CARDS_JSON_PATH = "pokemon_card_hashes.json"
+HASHED_CARDS_BINARY_PATH = "pokemon_card_hashes.bin"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+RESIZE_HEIGHT_FOR_DETECTION = 1000 # Même hauteur de détection que le scanner en direct
+HAMMING_THRESHOLD = 14
+MIN_CONFIDENCE_MARGIN = 2
+USE_CASCADE = True
+ADAPTIVE_THRESHOLDS = False # Rayons d'acceptation par carte (hash_audit.py) : optionnels, moins de top-1 que le seuil 14
+CSV_COLUMNS = ("file", "card_index", "quad", "card_id", "card_name", "candidate_id", "candidate_name", "distance",
+               "margin", "confidence", "accepted", "detected", "load_ms", "detect_ms", "warp_ms", "identify_ms", "error")
+
+# Base de hachages du processus worker (chargée une fois par processus, mappée en mémoire)
+_worker_database = None
+
+
+def collect_image_paths(inputs, recursive=False):
+    """
+    Développe une liste de fichiers, dossiers et motifs glob en une liste triée de chemins d'images.
+
+    Args:
+        inputs (list): Chemins de fichiers, de dossiers ou motifs glob (ex. "scans/*.jpg").
+        recursive (bool): Parcourir aussi les sous-dossiers des dossiers donnés.
+    """
+    image_paths = []
+    for input_path in inputs:
+        if os.path.isdir(input_path):
+            pattern = os.path.join(input_path, "**", "*") if recursive else os.path.join(input_path, "*")
+            candidates = glob.glob(pattern, recursive=recursive)
+        elif glob.has_magic(input_path):
+            candidates = glob.glob(input_path, recursive=True)
+        else:
+            candidates = [input_path]
+        image_paths.extend(path for path in candidates
+                           if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(set(image_paths))
+
+
+def _init_worker(json_path, binary_path, set_ids=None, series=None):
+    global _worker_database
+    # Un seul thread OpenCV par processus : le parallélisme vient du pool de processus
+    cv2.setNumThreads(1)
+    _worker_database = SearchScope(set_ids, series).apply(load_hash_matrix(json_path, binary_path))
+
+
+def identify_image_file(image_path, card_hash_database, resize_height=RESIZE_HEIGHT_FOR_DETECTION,
+                        whole_image_fallback=False):
+    """
+    Détecte, redresse et identifie les cartes d'un fichier image.
+
+    Args:
+        image_path (str): Chemin de la photo.
+        card_hash_database (HashMatrix): Base de hachages.
+        resize_height (int): Hauteur de traitement de la détection.
+        whole_image_fallback (bool): Si aucune carte n'est détectée, identifier l'image entière
+                                     (photo déjà recadrée sur une seule carte).
+
+    Returns:
+        list: Une ligne (dict) par carte, ou une seule ligne sans carte si rien n'est trouvé.
+    """
+    timings = {"load_ms": 0.0, "detect_ms": 0.0, "warp_ms": 0.0, "identify_ms": 0.0}
+    started_at = time.perf_counter()
+    image = cv2.imread(image_path)
+    timings["load_ms"] = (time.perf_counter() - started_at) * 1000
+    if image is None:
+        return [_result_row(image_path, None, None, None, False, timings, error="Image illisible")]
+
+    detect_timings = {}
+    detected_card_corners_list = detect_card_boxes(image, resize_height=resize_height, timings=detect_timings)
+    timings["detect_ms"] = sum(detect_timings.values())
+
+    started_at = time.perf_counter()
+    card_quads = []
+    pil_warped_cards = []
+    for corners in detected_card_corners_list:
+        warped_card_cv = warp_card_to_standard_ratio(image, corners)
+        if warped_card_cv is not None:
+            card_quads.append(corners.tolist())
+            pil_warped_cards.append(Image.fromarray(cv2.cvtColor(warped_card_cv, cv2.COLOR_BGR2RGB)))
+    detected = bool(pil_warped_cards)
+    if not detected and whole_image_fallback:
+        height, width = image.shape[:2]
+        card_quads.append([[0, 0], [width - 1, 0], [width - 1, height - 1], [0, height - 1]])
+        pil_warped_cards.append(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+    timings["warp_ms"] = (time.perf_counter() - started_at) * 1000
+
+    if not pil_warped_cards:
+        return [_result_row(image_path, None, None, None, False, timings)]
+
+    started_at = time.perf_counter()
+    match_results = find_top_matches_batch(
+        pil_warped_cards,
+        card_hash_database,
+        max_hamming_distance=HAMMING_THRESHOLD,
+        min_margin=MIN_CONFIDENCE_MARGIN,
+        cascade=USE_CASCADE,
+        adaptive_thresholds=ADAPTIVE_THRESHOLDS,
+    )
+    timings["identify_ms"] = (time.perf_counter() - started_at) * 1000
+
+    return [_result_row(image_path, card_index, quad, match_result, detected, timings)
+            for card_index, (quad, match_result) in enumerate(zip(card_quads, match_results))]
+
+
+def _result_row(image_path, card_index, quad, match_result, detected, timings, error=None):
+    # "card_id" / "card_name" ne sont remplis que pour une identification acceptée ;
+    # le meilleur candidat, même rejeté, est dans "candidate_id" / "candidate_name"
+    best_match = match_result["matches"][0] if match_result and match_result["matches"] else None
+    accepted = bool(match_result and match_result["accepted"])
+    row = {
+        "file": image_path,
+        "card_index": card_index,
+        "quad": quad,
+        "card_id": best_match["id"] if accepted else None,
+        "card_name": best_match["name"] if accepted else None,
+        "candidate_id": best_match["id"] if best_match else None,
+        "candidate_name": best_match["name"] if best_match else None,
+        "distance": match_result["distance"] if match_result else None,
+        "margin": round(match_result["margin"], 3) if match_result else None,
+        "confidence": round(match_result["confidence"], 3) if match_result else None,
+        "accepted": accepted,
+        "detected": detected,
+        "error": error,
+    }
+    row.update({stage: round(duration, 2) for stage, duration in timings.items()})
+    return row
+
+
+def _identify_in_worker(task):
+    image_path, resize_height, whole_image_fallback = task
+    try:
+        return identify_image_file(image_path, _worker_database, resize_height, whole_image_fallback)
+    except Exception as e:
+        return [_result_row(image_path, None, None, None, False, {}, error=str(e))]
+
+
+def write_results(rows, output_file, output_format):
+    """Écrit les lignes de résultat au fil de l'eau ; retourne un itérateur sur les lignes écrites."""
+    if output_format == "csv":
+        writer = csv.DictWriter(output_file, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+    for row in rows:
+        if output_format == "csv":
+            writer.writerow(dict(row, quad=json.dumps(row["quad"]) if row["quad"] is not None else ""))
+        else:
+            output_file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        yield row
+
+
+def identify_images(image_paths, workers=None, resize_height=RESIZE_HEIGHT_FOR_DETECTION,
+                    whole_image_fallback=False, json_path=HASHED_CARDS_JSON_PATH,
+                    binary_path=HASHED_CARDS_BINARY_PATH, set_ids=None, series=None):
+    """
+    Identifie les cartes de toutes les images sur un pool de processus.
+
+    Chaque processus charge la base une seule fois (format binaire mappé en mémoire, pages partagées
+    entre processus). Avec `set_ids` / `series`, la recherche est limitée à ces extensions / séries.
+    Les lignes sont produites dans l'ordre de `image_paths`.
+    """
+    # Convertir la base au format binaire une seule fois avant de lancer les workers,
+    # et vérifier le périmètre avant de répartir le travail
+    scoped_database = SearchScope(set_ids, series).apply(load_hash_matrix(json_path, binary_path))
+    if not len(scoped_database):
+        raise ValueError(f"Aucune carte de la base dans le périmètre {SearchScope(set_ids, series)}.")
+    tasks = [(image_path, resize_height, whole_image_fallback) for image_path in image_paths]
+    with Pool(processes=workers, initializer=_init_worker,
+              initargs=(json_path, binary_path, set_ids, series)) as pool:
+        for rows in pool.imap(_identify_in_worker, tasks, chunksize=4):
+            yield from rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Identification en lot de photos de cartes Pokémon (sans interface).")
+    parser.add_argument("inputs", nargs="+", help="Fichiers, dossiers ou motifs glob d'images.")
+    parser.add_argument("--output", help="Fichier de sortie (par défaut : sortie standard).")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Format de sortie.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Nombre de processus.")
+    parser.add_argument("--resize-height", type=int, default=RESIZE_HEIGHT_FOR_DETECTION,
+                        help="Hauteur de traitement de la détection.")
+    parser.add_argument("--recursive", action="store_true", help="Parcourir les sous-dossiers.")
+    parser.add_argument("--whole-image-fallback", action="store_true",
+                        help="Identifier l'image entière quand aucune carte n'est détectée (photos déjà recadrées).")
+    parser.add_argument("--sets", help="Limiter la recherche à ces extensions (ids séparés par des virgules).")
+    parser.add_argument("--series", help="Limiter la recherche à ces séries (séparées par des virgules).")
+    args = parser.parse_args()
+
+    image_paths = collect_image_paths(args.inputs, recursive=args.recursive)
+    if not image_paths:
+        print("Aucune image trouvée.", file=sys.stderr)
+        sys.exit(1)
+    if not os.path.exists(HASHED_CARDS_JSON_PATH) and not os.path.exists(HASHED_CARDS_BINARY_PATH):
+        print(f"Base de hachages '{HASHED_CARDS_JSON_PATH}' introuvable.", file=sys.stderr)
+        sys.exit(1)
+
+    started_at = time.perf_counter()
+    card_count = identified_count = error_count = 0
+    output_file = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        rows = identify_images(image_paths, workers=args.workers, resize_height=args.resize_height,
+                               whole_image_fallback=args.whole_image_fallback, set_ids=args.sets, series=args.series)
+        for row in write_results(rows, output_file, args.format):
+            card_count += row["card_index"] is not None
+            identified_count += row["accepted"]
+            error_count += row["error"] is not None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if args.output:
+            output_file.close()
+    elapsed = time.perf_counter() - started_at
+    # Résumé sur la sortie d'erreur pour ne pas polluer les résultats écrits sur la sortie standard
+    print(f"{len(image_paths)} images, {card_count} cartes analysées, {identified_count} identifiées, "
+          f"{error_count} erreurs en {elapsed:.1f} s ({len(image_paths) / elapsed:.1f} images/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
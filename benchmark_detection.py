@@ -0,0 +1,166 @@
+# benchmark_detection.py
+"""
+Banc de mesure des détecteurs de cartes sur les images de data_for_testing.
+
+Pour chaque détecteur (detect_card_boxes, detect_enhanced_card_contours), chaque image et chaque
+hauteur de redimensionnement : temps médian par étape et total, nombre de cartes trouvées et pic
+de mémoire alloué. Les résultats peuvent être enregistrés comme référence puis comparés à
+une référence existante pour détecter les régressions (code de sortie 1).
+
+    python benchmark_detection.py --save-baseline detection_baseline.json
+    python benchmark_detection.py --compare detection_baseline.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from detect_card import detect_card_boxes
+from detect_card_test import detect_enhanced_card_contours
+
+TEST_IMAGES_DIR = "data_for_testing"
+RESIZE_HEIGHTS = (480, 640, 800, 1000)
+REPEATS = 5 # Mesures par configuration (après une exécution d'échauffement)
+TIME_REGRESSION_RATIO = 0.25 # Un total plus lent de 25 %...
+TIME_REGRESSION_MIN_MS = 2.0 # ... et d'au moins 2 ms est signalé comme régression
+
+DETECTORS = {
+    "detect_card_boxes": lambda image, resize_height, timings: detect_card_boxes(
+        image, resize_height=resize_height, timings=timings),
+    "enhanced": lambda image, resize_height, timings: detect_enhanced_card_contours(
+        image, resize_height=resize_height, timings=timings)[0],
+}
+
+
+def measure_detector(detect, image, resize_height, repeats=REPEATS):
+    """
+    Mesure un détecteur sur une image.
+
+    Returns:
+        dict: cartes trouvées, temps total et par étape (médianes en ms), pic de mémoire (Mo).
+    """
+    detect(image, resize_height, None) # Échauffement (allocations, caches d'OpenCV)
+    stage_samples = {}
+    total_samples = []
+    cards_found = 0
+    for _ in range(repeats):
+        timings = {}
+        started_at = time.perf_counter()
+        card_corners_list = detect(image, resize_height, timings)
+        total_samples.append((time.perf_counter() - started_at) * 1000)
+        cards_found = len(card_corners_list)
+        for stage, duration in timings.items():
+            stage_samples.setdefault(stage, []).append(duration)
+
+    # Pic mémoire mesuré à part : tracemalloc ralentit l'exécution (les tableaux numpy/OpenCV sont suivis)
+    tracemalloc.start()
+    detect(image, resize_height, None)
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "cards_found": cards_found,
+        "total_ms": float(np.median(total_samples)),
+        "stages_ms": {stage: float(np.median(samples)) for stage, samples in stage_samples.items()},
+        "peak_memory_mb": peak_bytes / (1024 * 1024),
+    }
+
+
+def run_benchmark(image_paths, detector_names=tuple(DETECTORS), resize_heights=RESIZE_HEIGHTS, repeats=REPEATS):
+    """Retourne un dict "détecteur|image|hauteur" -> mesures."""
+    cv2.setNumThreads(1) # Mesures reproductibles, indépendantes du nombre de cœurs
+    results = {}
+    for image_path in image_paths:
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"Image illisible ignorée : {image_path}")
+            continue
+        for detector_name in detector_names:
+            for resize_height in resize_heights:
+                key = f"{detector_name}|{os.path.basename(image_path)}|{resize_height}"
+                results[key] = measure_detector(DETECTORS[detector_name], image, resize_height, repeats)
+    return results
+
+
+def compare_with_baseline(results, baseline):
+    """
+    Compare les mesures à une référence.
+
+    Returns:
+        list: Messages décrivant les régressions (nombre de cartes différent, temps total plus lent).
+    """
+    regressions = []
+    for key, measures in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        if measures["cards_found"] != reference["cards_found"]:
+            regressions.append(f"{key} : {measures['cards_found']} cartes au lieu de {reference['cards_found']}")
+        slowdown_ms = measures["total_ms"] - reference["total_ms"]
+        if slowdown_ms > TIME_REGRESSION_MIN_MS and slowdown_ms > TIME_REGRESSION_RATIO * reference["total_ms"]:
+            regressions.append(f"{key} : {measures['total_ms']:.1f} ms au lieu de {reference['total_ms']:.1f} ms")
+    return regressions
+
+
+def print_results(results, baseline=None):
+    stage_names = []
+    for measures in results.values():
+        stage_names.extend(stage for stage in measures["stages_ms"] if stage not in stage_names)
+    header = f"{'détecteur|image|hauteur':<45} {'cartes':>6} {'total':>8} {'réf.':>8} {'Mo':>6}  "
+    print(header + " ".join(f"{stage[:13]:>13}" for stage in stage_names))
+    for key, measures in results.items():
+        reference = (baseline or {}).get(key)
+        reference_total = f"{reference['total_ms']:8.1f}" if reference else f"{'-':>8}"
+        stages = " ".join(f"{measures['stages_ms'][stage]:13.2f}" if stage in measures["stages_ms"] else f"{'-':>13}"
+                          for stage in stage_names)
+        print(f"{key:<45} {measures['cards_found']:>6} {measures['total_ms']:8.1f} {reference_total} "
+              f"{measures['peak_memory_mb']:6.1f}  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de mesure des détecteurs de cartes.")
+    parser.add_argument("images", nargs="*", help=f"Images à mesurer (par défaut : toutes celles de {TEST_IMAGES_DIR}).")
+    parser.add_argument("--detector", action="append", choices=tuple(DETECTORS),
+                        help="Détecteur à mesurer (répétable ; par défaut : tous).")
+    parser.add_argument("--resize-height", type=int, action="append",
+                        help=f"Hauteur de traitement (répétable ; par défaut : {RESIZE_HEIGHTS}).")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="Mesures par configuration.")
+    parser.add_argument("--output", help="Écrire les mesures en JSON dans ce fichier.")
+    parser.add_argument("--save-baseline", help="Enregistrer les mesures comme référence dans ce fichier.")
+    parser.add_argument("--compare", help="Comparer les mesures à ce fichier de référence.")
+    args = parser.parse_args()
+
+    image_paths = args.images or sorted(glob.glob(os.path.join(TEST_IMAGES_DIR, "*")))
+    results = run_benchmark(image_paths, args.detector or tuple(DETECTORS),
+                            args.resize_height or RESIZE_HEIGHTS, args.repeats)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    for output_path in (args.output, args.save_baseline):
+        if output_path:
+            with open(output_path, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            print(f"Mesures enregistrées dans '{output_path}'.")
+
+    if baseline is not None:
+        regressions = compare_with_baseline(results, baseline)
+        if regressions:
+            print(f"\n{len(regressions)} régression(s) par rapport à '{args.compare}' :")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"\nAucune régression par rapport à '{args.compare}'.")
+
+
+if __name__ == "__main__":
+    main()
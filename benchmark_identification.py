@@ -0,0 +1,484 @@
+# benchmark_identification.py
+"""
+Banc de mesure de l'identification : précision et latence de `find_matching_card` selon le
+backend et le seuil de Hamming, sur des requêtes synthétiques dont la carte attendue est connue.
+
+Les images de référence viennent d'un dossier local (aucun accès réseau) : un fichier par carte,
+nommé d'après son id dans la base, ex. `fixtures/reference_cards/base1-4.png`. Le dépôt fournit
+dans `fixtures/reference_cards` les huit cartes de data_for_testing/binder1.png, redressées et
+identifiées à l'œil : le banc tourne hors ligne sans autre préparation. Ces références sont des
+photos de la page de test, pas des scans indépendants ; deux d'entre elles (pgo-15 et pgo-17, cartes
+Pokémon GO) ont un pHash plus proche d'une autre carte de la base, et le rapport par carte les signale.
+Chaque référence est collée en perspective sur un fond, puis dégradée (flou, reflet, compression
+JPEG, dérive de couleur) à plusieurs niveaux ; les coins connus, légèrement bruités pour simuler
+l'erreur du détecteur, passent ensuite par le pipeline complet redressement -> hachage -> correspondance.
+
+Mesures par backend et par seuil :
+    - précision top-1 : la carte acceptée est la bonne ;
+    - faux acceptés : une autre carte est acceptée ;
+    - faux acceptés hors base : la bonne carte est retirée de la base (carte inconnue) et une autre est acceptée ;
+    - latence par requête (redressement + hachage + correspondance), p50 et p95.
+
+Comparaison seuil global / rayons d'acceptation par carte (voir hash_audit.py) : pour les requêtes
+d'images et, avec --simulate, pour des requêtes simulées dans l'espace des hachages (bits du pHash
+de cartes tirées dans toute la base inversés au hasard, sans aucune image), chaque politique
+d'acceptation est mesurée en précision top-1, faux acceptés, faux acceptés hors base (cartes de
+même nom retirées de la base) et part des requêtes renvoyées à la vérification secondaire.
+
+    python benchmark_identification.py --fixtures fixtures/reference_cards
+    python benchmark_identification.py --backend numpy --backend index --threshold 10 --threshold 14
+    python benchmark_identification.py --simulate 2000 --radius-offset 2
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+import cv2
+import imagehash
+import numpy as np
+from PIL import Image
+
+from card_identifier import find_matching_card, load_hashed_data, match_fingerprints_batch, MIN_CONFIDENCE_MARGIN
+from card_warper import warp_card_to_standard_ratio
+from hash_audit import audit_hashes
+from hash_index import MultiIndexHash
+from hash_matcher import (HashMatrix, hash_to_uint64, hamming_distances, uint64_to_hex, compute_acceptance_radii,
+                          ADAPTIVE_RADIUS_OFFSET, ADAPTIVE_RADIUS_MIN, ADAPTIVE_RADIUS_MAX)
+
+HASHED_CARDS_JSON_PATH = "pokemon_card_hashes.json"
+FIXTURES_DIR = os.path.join("fixtures", "reference_cards")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+BACKENDS = ("python", "numpy", "numpy+cascade", "index")
+THRESHOLDS = (6, 8, 10, 12, 14, 16)
+DISTORTIONS = ("none", "perspective", "blur", "glare", "jpeg", "colour", "combined")
+LEVELS = (1, 2, 3)
+CANVAS_SIZE = (800, 600) # Largeur, hauteur de l'image synthétique
+CORNER_JITTER_PX = 1.5 # Écart type du bruit ajouté aux coins (erreur du détecteur)
+
+# Paramètres des dégradations par niveau (indice 0 : aucune dégradation)
+PERSPECTIVE_STRENGTH = (0.02, 0.06, 0.12, 0.18) # Déplacement des coins, en fraction de la taille de la carte
+BLUR_SIGMA = (0.0, 1.0, 2.0, 3.5)
+GLARE_INTENSITY = (0.0, 0.35, 0.6, 0.85)
+JPEG_QUALITY = (95, 50, 25, 10)
+COLOUR_GAIN = (0.0, 0.08, 0.16, 0.25) # Écart maximal des gains par canal
+
+SIMULATED_FLIPPED_BITS = (2, 4, 6, 8, 10, 12, 14) # Bits du pHash inversés par requête simulée
+POLICY_BATCH_SIZE = 512 # Requêtes par matrice de distances pendant la comparaison des politiques
+FAILED_WARP_DISTANCE = 65 # Distance attribuée à une requête dont le redressement a échoué (jamais reconnue)
+
+
+def load_reference_cards(fixtures_dir, known_ids):
+    """Retourne la liste (id de carte, image BGR) des références dont l'id existe dans la base."""
+    reference_cards = []
+    for image_path in sorted(glob.glob(os.path.join(fixtures_dir, "*"))):
+        card_id, extension = os.path.splitext(os.path.basename(image_path))
+        if extension.lower() not in IMAGE_EXTENSIONS:
+            continue
+        if card_id not in known_ids:
+            print(f"Référence ignorée (id absent de la base) : {image_path}")
+            continue
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"Référence illisible ignorée : {image_path}")
+            continue
+        reference_cards.append((card_id, image))
+    return reference_cards
+
+
+def render_on_canvas(card_image, rng, strength):
+    """Colle la carte en perspective sur un fond texturé ; retourne (image, coins réels 4x2)."""
+    canvas_width, canvas_height = CANVAS_SIZE
+    canvas = rng.normal(rng.uniform(60, 200), 12, (canvas_height, canvas_width, 3)).clip(0, 255).astype(np.uint8)
+    canvas = cv2.GaussianBlur(canvas, (0, 0), 3)
+
+    card_height = int(canvas_height * rng.uniform(0.6, 0.75))
+    card_width = int(card_height * card_image.shape[1] / card_image.shape[0])
+    left = (canvas_width - card_width) / 2 + rng.uniform(-0.1, 0.1) * canvas_width
+    top = (canvas_height - card_height) / 2
+    quad = np.array([[left, top], [left + card_width, top],
+                     [left + card_width, top + card_height], [left, top + card_height]], dtype=np.float32)
+    quad += rng.uniform(-strength, strength, (4, 2)).astype(np.float32) * [card_width, card_height]
+
+    source_corners = np.array([[0, 0], [card_image.shape[1] - 1, 0],
+                               [card_image.shape[1] - 1, card_image.shape[0] - 1], [0, card_image.shape[0] - 1]],
+                              dtype=np.float32)
+    transform_matrix = cv2.getPerspectiveTransform(source_corners, quad)
+    cv2.warpPerspective(card_image, transform_matrix, (canvas_width, canvas_height), dst=canvas,
+                        borderMode=cv2.BORDER_TRANSPARENT)
+    return canvas, quad
+
+
+def apply_blur(image, rng, level):
+    return cv2.GaussianBlur(image, (0, 0), BLUR_SIGMA[level]) if BLUR_SIGMA[level] else image
+
+
+def apply_glare(image, quad, rng, level):
+    """Ajoute un reflet : tache blanche elliptique à bord doux, placée sur la carte."""
+    if not GLARE_INTENSITY[level]:
+        return image
+    height, width = image.shape[:2]
+    center = quad.mean(axis=0) + rng.uniform(-0.25, 0.25, 2) * (quad.max(axis=0) - quad.min(axis=0))
+    axes = (quad.max(axis=0) - quad.min(axis=0)) * rng.uniform(0.15, 0.35, 2)
+    glare_mask = np.zeros((height, width), dtype=np.float32)
+    cv2.ellipse(glare_mask, (int(center[0]), int(center[1])), (int(axes[0]), int(axes[1])),
+                rng.uniform(0, 180), 0, 360, 1.0, -1)
+    glare_mask = cv2.GaussianBlur(glare_mask, (0, 0), max(axes.min() / 3, 1)) * GLARE_INTENSITY[level]
+    glared = image.astype(np.float32) * (1 - glare_mask[..., None]) + 255 * glare_mask[..., None]
+    return glared.clip(0, 255).astype(np.uint8)
+
+
+def apply_jpeg(image, rng, level):
+    _, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY[level]])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+def apply_colour(image, rng, level):
+    """Dérive de balance des blancs et de luminosité (gains aléatoires par canal)."""
+    if not COLOUR_GAIN[level]:
+        return image
+    gains = 1 + rng.uniform(-COLOUR_GAIN[level], COLOUR_GAIN[level], 3)
+    return (image.astype(np.float32) * gains).clip(0, 255).astype(np.uint8)
+
+
+def synthesize_query(card_image, distortion, level, rng):
+    """
+    Produit une image de requête dégradée et les coins que fournirait le détecteur.
+
+    Returns:
+        tuple: (image BGR, coins 4x2 bruités)
+    """
+    perspective_level = level if distortion in ("perspective", "combined") else 0
+    image, quad = render_on_canvas(card_image, rng, PERSPECTIVE_STRENGTH[perspective_level])
+    if distortion in ("blur", "combined"):
+        image = apply_blur(image, rng, level)
+    if distortion in ("glare", "combined"):
+        image = apply_glare(image, quad, rng, level)
+    if distortion in ("colour", "combined"):
+        image = apply_colour(image, rng, level)
+    if distortion in ("jpeg", "combined"):
+        image = apply_jpeg(image, rng, level)
+    detected_corners = quad + rng.normal(0, CORNER_JITTER_PX, quad.shape).astype(np.float32)
+    return image, detected_corners
+
+
+def build_queries(reference_cards, distortions=DISTORTIONS, levels=LEVELS, variants=1, seed=0):
+    """Retourne la liste des requêtes : dict id attendu, dégradation, niveau, image et coins."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for card_id, card_image in reference_cards:
+        for distortion in distortions:
+            for level in (levels if distortion != "none" else (0,)):
+                for _ in range(variants):
+                    image, corners = synthesize_query(card_image, distortion, level, rng)
+                    queries.append({"card_id": card_id, "distortion": distortion, "level": level,
+                                    "image": image, "corners": corners})
+    return queries
+
+
+def _warp_query(query):
+    """Redresse la carte de la requête (comme le scanner) et la convertit en image PIL (None si échec)."""
+    warped_card = warp_card_to_standard_ratio(query["image"], query["corners"])
+    if warped_card is None:
+        return None
+    return Image.fromarray(cv2.cvtColor(warped_card, cv2.COLOR_BGR2RGB))
+
+
+def prepare_backends(hashed_data, backends):
+    """Construit une fois, pour chaque backend, la structure passée à `find_matching_card`."""
+    prepared = {}
+    for backend in backends:
+        if backend == "python":
+            prepared[backend] = (hashed_data, "python", False)
+        elif backend in ("numpy", "numpy+cascade"):
+            prepared[backend] = (HashMatrix.from_hashed_data(hashed_data), "numpy", backend == "numpy+cascade")
+        elif backend == "index":
+            prepared[backend] = (MultiIndexHash.from_hashed_data(hashed_data), "index", False)
+        else:
+            raise ValueError(f"Backend inconnu : {backend}")
+    return prepared
+
+
+def _percentile_ms(samples, percentile):
+    return float(np.percentile(samples, percentile) * 1000) if samples else 0.0
+
+
+def run_benchmark(hashed_data, queries, backends=BACKENDS, thresholds=THRESHOLDS):
+    """
+    Exécute toutes les requêtes pour chaque backend et chaque seuil.
+
+    Une requête dont le redressement échoue compte comme un échec de détection : elle reste
+    dans le total des requêtes, n'est jamais identifiée et n'est pas soumise aux backends.
+
+    Returns:
+        dict: "results" (une entrée par backend et seuil), "per_distortion" (distance pHash médiane
+              à la bonne carte et rappel à chaque seuil, par dégradation et niveau) et "per_card"
+              (même mesures par carte de référence, avec la part des requêtes dont le pHash le plus
+              proche est la bonne carte et la carte le plus souvent trouvée à sa place).
+    """
+    prepared_backends = prepare_backends(hashed_data, backends)
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    row_by_id = {card_id: row for row, card_id in enumerate(hash_matrix.ids)}
+
+    # Redressement et distances pHash communs à tous les backends
+    warped_queries = []
+    warp_seconds = []
+    for query in queries:
+        started_at = time.perf_counter()
+        query["warped"] = _warp_query(query)
+        if query["warped"] is None:
+            query["true_distance"] = query["open_set_distance"] = FAILED_WARP_DISTANCE
+            continue
+        warped_queries.append(query)
+        warp_seconds.append(time.perf_counter() - started_at)
+        query_distances = hamming_distances(hash_to_uint64(imagehash.phash(query["warped"])), hash_matrix.hashes)
+        query["true_distance"] = int(query_distances[row_by_id[query["card_id"]]])
+        query["nearest_id"] = hash_matrix.ids[int(np.argmin(query_distances))]
+        # Carte inconnue : la plus proche une fois la bonne carte retirée de la base
+        query_distances[row_by_id[query["card_id"]]] = 65
+        query["open_set_distance"] = int(query_distances.min())
+
+    results = []
+    for backend, (backend_data, backend_name, cascade) in prepared_backends.items():
+        for threshold in thresholds:
+            correct = false_accepts = 0
+            latencies = []
+            for query, warp_duration in zip(warped_queries, warp_seconds):
+                started_at = time.perf_counter()
+                matched_card = find_matching_card(query["warped"], backend_data, max_hamming_distance=threshold,
+                                                  backend=backend_name, cascade=cascade)
+                latencies.append(warp_duration + time.perf_counter() - started_at)
+                if matched_card["id"] == query["card_id"]:
+                    correct += 1
+                elif matched_card["id"] != "Not ID":
+                    false_accepts += 1
+            open_set_false_accepts = sum(query["open_set_distance"] <= threshold for query in queries)
+            results.append({
+                "backend": backend,
+                "threshold": threshold,
+                "queries": len(queries),
+                "detection_failures": len(queries) - len(warped_queries),
+                "top1_accuracy": correct / len(queries),
+                "false_accept_rate": false_accepts / len(queries),
+                "open_set_false_accept_rate": open_set_false_accepts / len(queries),
+                "latency_p50_ms": _percentile_ms(latencies, 50),
+                "latency_p95_ms": _percentile_ms(latencies, 95),
+            })
+
+    by_distortion = {}
+    for query in queries:
+        key = f"{query['distortion']}/{query['level']}"
+        by_distortion.setdefault(key, []).append(query["true_distance"])
+    per_distortion = {
+        key: {"queries": len(true_distances),
+              "median_true_distance": float(np.median(true_distances)),
+              "recall_at_threshold": {str(threshold): float(np.mean(np.array(true_distances) <= threshold))
+                                      for threshold in thresholds}}
+        for key, true_distances in by_distortion.items()
+    }
+
+    per_card = {}
+    for card_id in dict.fromkeys(query["card_id"] for query in queries):
+        card_queries = [query for query in queries if query["card_id"] == card_id]
+        true_distances = np.array([query["true_distance"] for query in card_queries])
+        confusions = Counter(query["nearest_id"] for query in card_queries
+                             if query.get("nearest_id") not in (None, card_id))
+        per_card[card_id] = {
+            "queries": len(card_queries),
+            "median_true_distance": float(np.median(true_distances)),
+            "nearest_is_correct_rate": sum(query.get("nearest_id") == card_id for query in card_queries) / len(card_queries),
+            "most_common_confusion": confusions.most_common(1)[0][0] if confusions else None,
+            "recall_at_threshold": {str(threshold): float(np.mean(true_distances <= threshold)) for threshold in thresholds},
+        }
+    return {"results": results, "per_distortion": per_distortion, "per_card": per_card}
+
+
+def with_min_separation(hashed_data):
+    """
+    Copie de la base avec la séparation minimale de chaque carte, calculée par l'audit de la base
+    (le JSON de référence ne la contient pas).
+    """
+    if all("min_separation" in card_entry for card_entry in hashed_data):
+        return hashed_data
+    min_separation = audit_hashes(HashMatrix.from_hashed_data(hashed_data))["min_separation"]
+    return [dict(card_entry, min_separation=separation)
+            for card_entry, separation in zip(hashed_data, min_separation.tolist())]
+
+
+def _policy_matrix(hashed_data, radius_parameters):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    hash_matrix.acceptance_radii = compute_acceptance_radii(hash_matrix.min_separation, *radius_parameters)
+    return hash_matrix
+
+
+def build_simulated_queries(hashed_data, card_count, flipped_bits=SIMULATED_FLIPPED_BITS, seed=0):
+    """
+    Requêtes simulées dans l'espace des hachages : pour `card_count` cartes tirées au hasard,
+    le pHash de référence avec k bits inversés au hasard, pour chaque k de `flipped_bits`.
+    """
+    rng = np.random.default_rng(seed)
+    sampled_rows = rng.choice(len(hashed_data), size=min(card_count, len(hashed_data)), replace=False)
+    queries = []
+    for row in sampled_rows.tolist():
+        card_entry = hashed_data[row]
+        reference_hash = int(card_entry["hash"], 16)
+        for bit_count in flipped_bits:
+            flip_mask = 0
+            for bit in rng.choice(64, size=bit_count, replace=False).tolist():
+                flip_mask |= 1 << bit
+            queries.append({"card_id": card_entry["id"], "name": card_entry["name"],
+                            "hash": uint64_to_hex(reference_hash ^ flip_mask), "label": f"bits/{bit_count}"})
+    return queries
+
+
+def _match_policy(queries, hash_matrix, threshold, adaptive, min_margin):
+    results = []
+    for start in range(0, len(queries), POLICY_BATCH_SIZE):
+        results.extend(match_fingerprints_batch(
+            [{"hash": query["hash"]} for query in queries[start:start + POLICY_BATCH_SIZE]], hash_matrix,
+            max_hamming_distance=threshold, min_margin=min_margin, adaptive_thresholds=adaptive))
+    return results
+
+
+def compare_acceptance_policies(hashed_data, queries, thresholds=THRESHOLDS, min_margin=MIN_CONFIDENCE_MARGIN,
+                                radius_parameters=(ADAPTIVE_RADIUS_OFFSET, ADAPTIVE_RADIUS_MIN, ADAPTIVE_RADIUS_MAX)):
+    """
+    Compare le seuil global et les rayons d'acceptation par carte sur des pHash de requête.
+
+    Args:
+        hashed_data (list): Base avec le champ "min_separation" (voir `with_min_separation`).
+        queries (list): Dictionnaires {"card_id", "name", "hash"} (pHash hexadécimal de la requête).
+        thresholds (list): Seuils globaux ; avec les rayons adaptatifs, le seuil global ne sert plus
+                           qu'à décider quelles requêtes rejetées passent par la vérification secondaire.
+        radius_parameters (tuple): (décalage, rayon minimal, rayon maximal) des rayons d'acceptation.
+
+    Returns:
+        list: Une entrée par politique ("global" ou "adaptatif") et par seuil.
+    """
+    closed_set_matrix = _policy_matrix(hashed_data, radius_parameters)
+    # Hors base : toutes les cartes portant le nom d'une carte requête sont retirées
+    query_names = {query["name"] for query in queries}
+    open_set_matrix = _policy_matrix(
+        [card_entry for card_entry in hashed_data if card_entry["name"] not in query_names], radius_parameters)
+
+    comparison = []
+    for adaptive in (False, True):
+        for threshold in thresholds:
+            started_at = time.perf_counter()
+            closed_set_results = _match_policy(queries, closed_set_matrix, threshold, adaptive, min_margin)
+            elapsed = time.perf_counter() - started_at
+            open_set_results = _match_policy(queries, open_set_matrix, threshold, adaptive, min_margin)
+            correct = sum(result["accepted"] and result["best"]["id"] == query["card_id"]
+                          for query, result in zip(queries, closed_set_results))
+            false_accepts = sum(result["accepted"] and result["best"]["id"] != query["card_id"]
+                                for query, result in zip(queries, closed_set_results))
+            comparison.append({
+                "policy": "adaptatif" if adaptive else "global",
+                "threshold": threshold,
+                "queries": len(queries),
+                "top1_accuracy": correct / len(queries),
+                "false_accept_rate": false_accepts / len(queries),
+                "open_set_false_accept_rate": sum(result["accepted"] for result in open_set_results) / len(queries),
+                "verification_rate": sum(result["verification_required"] for result in closed_set_results) / len(queries),
+                "matching_us_per_query": elapsed / len(queries) * 1e6,
+            })
+    return comparison
+
+
+def print_policy_comparison(comparison, title):
+    print(f"\n{title}")
+    print(f"{'politique':<10} {'seuil':>5} {'requêtes':>8} {'top-1':>7} {'faux acc.':>9} {'hors base':>9} "
+          f"{'à vérifier':>10} {'µs/req.':>8}")
+    for row in comparison:
+        print(f"{row['policy']:<10} {row['threshold']:>5} {row['queries']:>8} {row['top1_accuracy']:7.1%} "
+              f"{row['false_accept_rate']:9.1%} {row['open_set_false_accept_rate']:9.1%} "
+              f"{row['verification_rate']:10.1%} {row['matching_us_per_query']:8.1f}")
+
+
+def print_report(report):
+    print(f"\n{'backend':<15} {'seuil':>5} {'requêtes':>8} {'top-1':>7} {'faux acc.':>9} "
+          f"{'hors base':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for result in report["results"]:
+        print(f"{result['backend']:<15} {result['threshold']:>5} {result['queries']:>8} "
+              f"{result['top1_accuracy']:7.1%} {result['false_accept_rate']:9.1%} "
+              f"{result['open_set_false_accept_rate']:9.1%} {result['latency_p50_ms']:8.2f} {result['latency_p95_ms']:8.2f}")
+    if report["results"] and report["results"][0]["detection_failures"]:
+        print(f"Redressements échoués (requêtes comptées comme non identifiées) : "
+              f"{report['results'][0]['detection_failures']}")
+
+    thresholds = list(next(iter(report["per_distortion"].values()))["recall_at_threshold"]) if report["per_distortion"] else []
+    print(f"\n{'dégradation':<15} {'requêtes':>8} {'dist. méd.':>10}  " + " ".join(f"{'<=' + t:>6}" for t in thresholds))
+    for key, measures in report["per_distortion"].items():
+        recalls = " ".join(f"{measures['recall_at_threshold'][t]:6.0%}" for t in thresholds)
+        print(f"{key:<15} {measures['queries']:>8} {measures['median_true_distance']:10.1f}  {recalls}")
+
+    print(f"\n{'carte':<15} {'requêtes':>8} {'dist. méd.':>10} {'plus proche':>11}  confusion principale")
+    for card_id, measures in report["per_card"].items():
+        print(f"{card_id:<15} {measures['queries']:>8} {measures['median_true_distance']:10.1f} "
+              f"{measures['nearest_is_correct_rate']:11.0%}  {measures['most_common_confusion'] or '-'}")
+    missed_cards = [card_id for card_id, measures in report["per_card"].items() if measures["nearest_is_correct_rate"] < 0.5]
+    if missed_cards:
+        print(f"Cartes de référence le plus souvent confondues : {', '.join(missed_cards)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précision et latence de l'identification sur des requêtes synthétiques.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Dossier des images de référence (<id de carte>.png).")
+    parser.add_argument("--database", default=HASHED_CARDS_JSON_PATH, help="Base de hachages JSON.")
+    parser.add_argument("--backend", action="append", choices=BACKENDS, help="Backend à mesurer (répétable).")
+    parser.add_argument("--threshold", type=int, action="append", help="Seuil de Hamming (répétable).")
+    parser.add_argument("--distortion", action="append", choices=DISTORTIONS, help="Dégradation (répétable).")
+    parser.add_argument("--variants", type=int, default=1, help="Requêtes tirées par carte, dégradation et niveau.")
+    parser.add_argument("--seed", type=int, default=0, help="Graine du générateur aléatoire.")
+    parser.add_argument("--output", help="Écrire le rapport en JSON dans ce fichier.")
+    parser.add_argument("--simulate", type=int, metavar="N",
+                        help="Comparer seuil global et rayons adaptatifs sur N cartes de la base (requêtes simulées).")
+    parser.add_argument("--radius-offset", type=int, default=ADAPTIVE_RADIUS_OFFSET,
+                        help="Rayon d'acceptation = séparation minimale + décalage.")
+    parser.add_argument("--radius-min", type=int, default=ADAPTIVE_RADIUS_MIN, help="Rayon d'acceptation minimal.")
+    parser.add_argument("--radius-max", type=int, default=ADAPTIVE_RADIUS_MAX, help="Rayon d'acceptation maximal.")
+    args = parser.parse_args()
+
+    hashed_data = load_hashed_data(args.database)
+    if not hashed_data:
+        sys.exit(1)
+    thresholds = sorted(args.threshold or THRESHOLDS)
+    hashed_data_with_separation = with_min_separation(hashed_data)
+    radius_parameters = (args.radius_offset, args.radius_min, args.radius_max)
+    report = {}
+    if args.simulate:
+        simulated_queries = build_simulated_queries(hashed_data, args.simulate, seed=args.seed)
+        report["simulated_policies"] = compare_acceptance_policies(hashed_data_with_separation, simulated_queries,
+                                                                   thresholds, radius_parameters=radius_parameters)
+        print_policy_comparison(report["simulated_policies"],
+                                f"Requêtes simulées : {args.simulate} cartes x {len(SIMULATED_FLIPPED_BITS)} niveaux "
+                                f"de bits inversés {SIMULATED_FLIPPED_BITS}")
+
+    reference_cards = load_reference_cards(args.fixtures, {card_entry["id"] for card_entry in hashed_data})
+    if not reference_cards and not args.simulate:
+        print(f"Aucune image de référence utilisable dans '{args.fixtures}' "
+              "(un fichier par carte, nommé d'après son id dans la base).")
+        sys.exit(1)
+    if reference_cards:
+        queries = build_queries(reference_cards, args.distortion or DISTORTIONS, variants=args.variants, seed=args.seed)
+        print(f"\n{len(reference_cards)} cartes de référence, {len(queries)} requêtes synthétiques.")
+        report.update(run_benchmark(hashed_data, queries, args.backend or BACKENDS, thresholds))
+        print_report(report)
+        names_by_id = {card_entry["id"]: card_entry["name"] for card_entry in hashed_data}
+        image_queries = [{"card_id": query["card_id"], "name": names_by_id[query["card_id"]],
+                          "hash": str(imagehash.phash(query["warped"]))} for query in queries
+                         if query["warped"] is not None]
+        report["image_policies"] = compare_acceptance_policies(hashed_data_with_separation, image_queries, thresholds,
+                                                               radius_parameters=radius_parameters)
+        print_policy_comparison(report["image_policies"], "Requêtes d'images : seuil global / rayons adaptatifs")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRapport enregistré dans '{args.output}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
 import json
+import logging
 from PIL import Image
 import imagehash # Bibliothèque pour le hachage perceptuel
-import os
+
+from hash_matcher import HashMatrix, compute_fingerprints
+from hash_index import MultiIndexHash
+from scanner_metrics import metrics
+from scanner_logging import get_logger, configure_logging, RateLimitedLogger
+
+logger = get_logger(__name__)
+rate_limited_logger = RateLimitedLogger(logger)
 
 HASHED_CARDS_JSON_PATH = "pokemon_card_hashes.json" # Doit correspondre au fichier de la Partie 1
+TOP_K_MATCHES = 5 # Nombre de candidats retournés par find_top_matches
+MIN_CONFIDENCE_MARGIN = 2 # Écart minimal (en bits) avec le premier candidat d'un autre nom pour accepter
 
 def load_hashed_data(json_path):
     """Charge les données de hachage depuis le fichier JSON."""
@@ -15,28 +25,36 @@ def load_hashed_data(json_path):
             card_entry['hash_obj'] = imagehash.hex_to_hash(card_entry['hash'])
         return hashed_data
     except FileNotFoundError:
-        print(f"Erreur : Le fichier JSON de hachage '{json_path}' n'a pas été trouvé.")
-        print("Veuillez d'abord exécuter le script de hachage de la base de données.")
+        logger.error("Le fichier JSON de hachage '%s' n'a pas été trouvé. "
+                     "Veuillez d'abord exécuter le script de hachage de la base de données.", json_path)
         return None
     except json.JSONDecodeError:
-        print(f"Erreur : Impossible de décoder le fichier JSON '{json_path}'. Est-il valide ?")
+        logger.error("Impossible de décoder le fichier JSON '%s'. Est-il valide ?", json_path)
         return None
     except Exception as e:
-        print(f"Une erreur s'est produite lors du chargement des données de hachage : {e}")
+        logger.error("Une erreur s'est produite lors du chargement des données de hachage : %s", e)
         return None
 
 
-def find_matching_card(input_image, hashed_data, max_hamming_distance=10):
+def find_matching_card(input_image, hashed_data, max_hamming_distance=10, backend="python", cascade=False, scope=None):
     """
     Trouve la carte la plus correspondante dans les données hachées pour une image d'entrée.
 
     Args:
         input_image_path (str): Chemin vers l'image de la carte à identifier.
-        hashed_data (list): Liste des dictionnaires de cartes hachées.
+        hashed_data (list | HashMatrix): Liste des dictionnaires de cartes hachées, ou une
+                                         HashMatrix déjà construite (recommandé avec backend="numpy"
+                                         pour ne pas reconstruire le tableau à chaque appel).
         max_hamming_distance (int): La distance de Hamming maximale pour considérer une correspondance.
                                      Ajustez cette valeur en fonction de la robustesse souhaitée.
                                      Une valeur plus faible est plus stricte.
                                      Pour pHash, des valeurs entre 0 et 10 sont généralement raisonnables.
+        backend (str): "python" (boucle sur les ImageHash), "numpy" (XOR + popcount vectorisé)
+                       ou "index" (index multi-bandes sous-linéaire, voir hash_index.py).
+                       Une HashMatrix ou un MultiIndexHash passé dans hashed_data impose le backend correspondant.
+        cascade (bool): Avec le backend "numpy", re-classe les meilleurs candidats pHash à l'aide des
+                        empreintes secondaires (dHash, aHash, couleur) présentes dans la base.
+        scope (SearchScope): Limite la recherche à certaines extensions / séries (voir search_partitions.py).
     Returns:
         dict: Le dictionnaire de la carte correspondante ou None si aucune correspondance satisfaisante n'est trouvée.
     """
@@ -44,7 +62,38 @@ def find_matching_card(input_image, hashed_data, max_hamming_distance=10):
 
     input_hash = imagehash.phash(input_image) # Calcule le pHash de l'image d'entrée
 
+    if scope:
+        if backend == "python" and not isinstance(hashed_data, (HashMatrix, MultiIndexHash)):
+            hashed_data = [card_entry for card_entry in hashed_data if scope.contains(card_entry)]
+        else:
+            # L'index multi-bandes couvre toute la base : une partition est parcourue par le backend vectorisé
+            if isinstance(hashed_data, MultiIndexHash):
+                hashed_data = hashed_data.matrix
+            hashed_data = scope.apply(hashed_data)
+            backend = "numpy"
 
+    if backend == "index" or isinstance(hashed_data, MultiIndexHash):
+        if isinstance(hashed_data, HashMatrix):
+            hashed_data = MultiIndexHash(hashed_data)
+        elif not isinstance(hashed_data, MultiIndexHash):
+            hashed_data = MultiIndexHash.from_hashed_data(hashed_data)
+        best_index, smallest_distance, candidates_examined = hashed_data.nearest(input_hash, max_hamming_distance)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Candidats examinés", extra={"fields": {"examined": candidates_examined, "total": len(hashed_data)}})
+        best_match = hashed_data.entry(best_index) if best_index is not None else None
+        return _report_match(best_match, smallest_distance, max_hamming_distance)
+    elif backend == "numpy" or isinstance(hashed_data, HashMatrix):
+        if not isinstance(hashed_data, HashMatrix):
+            hashed_data = HashMatrix.from_hashed_data(hashed_data)
+        if cascade and hashed_data.secondary_hashes:
+            best_index, smallest_distance = hashed_data.cascade_match(compute_fingerprints(input_image),
+                                                                      max_hamming_distance)
+        else:
+            best_index, smallest_distance = hashed_data.best_match(input_hash, max_hamming_distance)
+        best_match = hashed_data.entry(best_index) if best_index is not None else None
+        return _report_match(best_match, smallest_distance, max_hamming_distance)
+    elif backend != "python":
+        raise ValueError(f"Backend de correspondance inconnu : {backend}")
 
     best_match = None
     smallest_distance = float('inf')
@@ -52,7 +101,7 @@ def find_matching_card(input_image, hashed_data, max_hamming_distance=10):
     for card_entry in hashed_data:
         stored_hash_obj = card_entry.get('hash_obj')
         if not stored_hash_obj: # S'assure que hash_obj a été correctement chargé
-            print(f"Attention : Entrée de carte sans objet de hachage valide : {card_entry.get('name')}")
+            rate_limited_logger.warning("Entrée de carte sans objet de hachage valide", card_name=card_entry.get('name'))
             continue
 
         # Calcule la distance de Hamming
@@ -66,13 +115,236 @@ def find_matching_card(input_image, hashed_data, max_hamming_distance=10):
             # Afficher les détails de la comparaison pour le débogage
             # print(f"  Comparaison avec '{card_entry['name']}' (ID: {card_entry['id']}): Distance = {distance}")
 
+    return _report_match(best_match, smallest_distance, max_hamming_distance)
+
+
+def find_matching_cards(input_images, hashed_data, max_hamming_distance=10, cascade=False, scope=None):
+    """
+    Identifie un lot de cartes (par exemple toutes les cartes d'une page de classeur) en une seule passe.
+
+    Les N images sont hachées puis comparées à toute la base via une seule opération
+    matricielle N x len(base), au lieu de N parcours successifs avec `find_matching_card`.
+
+    Args:
+        input_images (list): Images PIL des cartes redressées.
+        hashed_data (list | HashMatrix): Données hachées, idéalement une HashMatrix déjà construite.
+        max_hamming_distance (int): La distance de Hamming maximale pour considérer une correspondance.
+        cascade (bool): Re-classe les meilleurs candidats pHash avec les empreintes secondaires de la base.
+        scope (SearchScope): Limite la recherche à certaines extensions / séries.
+
+    Returns:
+        list: Un dictionnaire de carte par image d'entrée, dans le même ordre que `input_images`
+              (le dictionnaire "Not found" pour les images sans correspondance satisfaisante).
+    """
+    if not isinstance(hashed_data, HashMatrix):
+        hashed_data = HashMatrix.from_hashed_data(hashed_data)
+    if scope:
+        hashed_data = scope.apply(hashed_data)
+
+    if cascade and hashed_data.secondary_hashes:
+        matches = hashed_data.cascade_matches([compute_fingerprints(input_image) for input_image in input_images],
+                                              max_hamming_distance)
+    else:
+        input_hashes = [imagehash.phash(input_image) for input_image in input_images]
+        matches = hashed_data.best_matches(input_hashes, max_hamming_distance)
+    results = []
+    for best_index, smallest_distance in matches:
+        best_match = hashed_data.entry(best_index) if best_index is not None else None
+        results.append(_report_match(best_match, smallest_distance, max_hamming_distance))
+    return results
+
+
+def find_top_matches(input_image, hashed_data, k=TOP_K_MATCHES, max_hamming_distance=10,
+                     min_margin=MIN_CONFIDENCE_MARGIN, cascade=False, scope=None, session_prior=None,
+                     adaptive_thresholds=False):
+    """
+    Retourne les k meilleures cartes candidates avec leurs distances et un score de confiance.
+
+    Le calcul repose sur un tri partiel (argpartition) du tableau de distances vectorisé :
+    il ne coûte pas plus cher que la recherche de la seule meilleure carte.
+
+    La marge est l'écart de score entre la meilleure carte et le premier candidat portant un
+    autre nom (les réimpressions d'une même carte ne rendent pas le résultat ambigu). Si tous les
+    candidats portent le même nom, l'écart avec le dernier candidat sert de borne inférieure.
+    La confiance vaut marge / (marge + distance + 1) : proche de 1 pour une correspondance
+    exacte et isolée, proche de 0 pour une correspondance lointaine ou ambiguë.
+
+    Args:
+        input_image (PIL.Image): Image de la carte redressée.
+        hashed_data (list | HashMatrix): Données hachées, idéalement une HashMatrix déjà construite.
+        k (int): Nombre de candidats à retourner.
+        max_hamming_distance (int): Distance maximale pour accepter la meilleure carte.
+        min_margin (float): Marge minimale pour accepter la meilleure carte.
+        cascade (bool | str): Classer les candidats avec le score combiné des empreintes secondaires.
+                              "auto" : pHash seul, puis vérification secondaire (cascade) des seules
+                              images dont la meilleure carte est trop proche d'une carte d'un autre
+                              nom (séparation minimale de la base, voir hash_audit.py).
+        scope (SearchScope): Limite la recherche à certaines extensions / séries (voir search_partitions.py).
+        session_prior (SessionPrior): Favorise les extensions déjà reconnues ; les cartes acceptées
+                                      y sont enregistrées.
+        adaptive_thresholds (bool): Accepter la meilleure carte selon son propre rayon d'acceptation
+                                    (déduit au chargement de la séparation minimale, large pour une carte
+                                    isolée, étroit dans une zone dense) plutôt que selon `max_hamming_distance`.
+                                    Une requête au-delà du rayon mais sous `max_hamming_distance` est
+                                    à vérifier par les empreintes secondaires, puis acceptée jusqu'au
+                                    plus grand des deux seuils. Base non auditée : seuil global.
+
+    Returns:
+        dict: {"matches": [carte + "distance" + "score", ...], "best": carte ou None, "distance",
+               "margin", "confidence", "accepted", "acceptance_threshold", "verification_required"}.
+               "best" n'est renseigné que si la correspondance est acceptée (distance et marge suffisantes).
+               "verification_required" indique qu'un résultat obtenu avec le pHash seul devrait
+               être confirmé par les empreintes secondaires.
+    """
+    return find_top_matches_batch([input_image], hashed_data, k, max_hamming_distance, min_margin, cascade,
+                                  scope, session_prior, adaptive_thresholds)[0]
+
+
+def find_top_matches_batch(input_images, hashed_data, k=TOP_K_MATCHES, max_hamming_distance=10,
+                           min_margin=MIN_CONFIDENCE_MARGIN, cascade=False, scope=None, session_prior=None,
+                           adaptive_thresholds=False):
+    """Version par lot de `find_top_matches` : une seule matrice de distances pour toutes les images."""
+    if not isinstance(hashed_data, HashMatrix):
+        hashed_data = HashMatrix.from_hashed_data(hashed_data)
+    if not input_images:
+        return []
+
+    use_cascade = cascade is True and bool(hashed_data.secondary_hashes)
+    with metrics.timer("hashing"):
+        queries_fingerprints = [compute_query_fingerprints(input_image, use_cascade) for input_image in input_images]
+    results = match_fingerprints_batch(queries_fingerprints, hashed_data, k, max_hamming_distance, min_margin,
+                                       use_cascade, scope, session_prior, adaptive_thresholds)
+    if cascade != "auto" or not hashed_data.secondary_hashes:
+        return results
+
+    # Vérification secondaire des seules cartes proches d'une carte d'un autre nom
+    to_verify = [index for index, result in enumerate(results) if result["verification_required"]]
+    if to_verify:
+        metrics.increment("secondary_verifications", len(to_verify))
+        with metrics.timer("hashing"):
+            verification_fingerprints = [compute_fingerprints(input_images[index]) for index in to_verify]
+        verified_results = match_fingerprints_batch(verification_fingerprints, hashed_data, k, max_hamming_distance,
+                                                    min_margin, True, scope, session_prior, adaptive_thresholds)
+        for index, verified_result in zip(to_verify, verified_results):
+            results[index] = verified_result
+    return results
+
+
+def compute_query_fingerprints(input_image, cascade=False):
+    """Empreintes d'une image requête : le pHash seul, ou toutes les empreintes pour la cascade."""
+    if cascade:
+        return compute_fingerprints(input_image)
+    return {"hash": str(imagehash.phash(input_image))}
+
+
+def match_fingerprints_batch(queries_fingerprints, hash_matrix, k=TOP_K_MATCHES, max_hamming_distance=10,
+                             min_margin=MIN_CONFIDENCE_MARGIN, cascade=False, scope=None, session_prior=None,
+                             adaptive_thresholds=False):
+    """
+    Partie correspondance de `find_top_matches_batch`, pour des empreintes déjà calculées
+    (voir `compute_query_fingerprints`) : une seule matrice de distances pour toutes les requêtes.
+    Permet de calculer les empreintes en parallèle puis de regrouper les correspondances (service HTTP).
+    """
+    if scope:
+        hash_matrix = scope.apply(hash_matrix)
+    if len(hash_matrix) == 0:
+        return [_top_matches_result([], max_hamming_distance, min_margin) for _ in queries_fingerprints]
+    if not queries_fingerprints:
+        return []
+    use_cascade = cascade and bool(hash_matrix.secondary_hashes)
+
+    with metrics.timer("matching"):
+        distances = hash_matrix.distance_matrix([query_fingerprints["hash"] for query_fingerprints in queries_fingerprints])
+        results = []
+        for phash_distances, query_fingerprints in zip(distances, queries_fingerprints):
+            candidates, candidate_distances, scores = hash_matrix.ranked_candidates(
+                phash_distances, k, query_fingerprints if use_cascade else None)
+            matches = []
+            for index, distance, score in zip(candidates.tolist(), candidate_distances.tolist(), scores.tolist()):
+                card_entry = hash_matrix.entry(index)
+                card_entry["distance"] = distance
+                card_entry["score"] = score
+                matches.append(card_entry)
+            if session_prior is not None:
+                matches = session_prior.apply(matches)
+            adaptive = adaptive_thresholds and bool(matches) and "acceptance_radius" in matches[0]
+            result = _top_matches_result(matches, _acceptance_threshold(matches, max_hamming_distance, adaptive,
+                                                                        use_cascade), min_margin)
+            result["verification_required"] = not use_cascade and _verification_required(
+                result, max_hamming_distance, min_margin, adaptive)
+            # Seules les identifications confirmées alimentent le biais de session
+            if session_prior is not None and result["accepted"] and not result["verification_required"]:
+                session_prior.observe(result["best"])
+            results.append(result)
+    metrics.increment("identifications", len(results))
+    metrics.increment("identifications_accepted", sum(result["accepted"] for result in results))
+    return results
+
+
+def _acceptance_threshold(matches, max_hamming_distance, adaptive, cascade):
+    """
+    Seuil de distance appliqué à la meilleure carte : `max_hamming_distance`, ou avec les seuils
+    adaptatifs le rayon d'acceptation de la carte (pHash seul), ou le plus grand des deux (cascade).
+    """
+    if not adaptive:
+        return max_hamming_distance
+    acceptance_radius = matches[0]["acceptance_radius"]
+    return max(acceptance_radius, max_hamming_distance) if cascade else acceptance_radius
+
+
+def _verification_required(result, max_hamming_distance, min_margin, adaptive_thresholds=False):
+    """
+    Vrai si le pHash seul ne suffit pas à écarter une carte d'un autre nom.
+
+    Avec un rayon d'acceptation propre à la carte (seuils adaptatifs), toute requête acceptable
+    mais non acceptée (au-delà du rayon, ou marge insuffisante) est à vérifier.
+
+    Sinon, une requête à distance d de la carte retenue, dont le plus proche voisin d'un autre nom
+    est à distance s ("min_separation"), est à au moins s - d de ce voisin (inégalité triangulaire).
+    Le voisin ne peut donc pas rivaliser si s - d >= d + min_margin, soit s >= 2d + min_margin.
+    Sans séparation connue (base non auditée), toute carte acceptable est à vérifier.
+    """
+    if not result["matches"] or result["distance"] > max(result["acceptance_threshold"], max_hamming_distance):
+        return False # Aucun candidat assez proche : la cascade ne l'accepterait pas non plus
+    if adaptive_thresholds:
+        return not result["accepted"]
+    separation = result["matches"][0].get("min_separation")
+    return separation is None or separation < 2 * result["distance"] + min_margin
+
+
+def _top_matches_result(matches, max_hamming_distance, min_margin):
+    if not matches:
+        return {"matches": [], "best": None, "distance": None, "margin": 0.0, "confidence": 0.0, "accepted": False,
+                "acceptance_threshold": max_hamming_distance, "verification_required": False}
+    best = matches[0]
+    runner_up = next((card_entry for card_entry in matches[1:] if card_entry["name"] != best["name"]), None)
+    if runner_up is None and len(matches) > 1:
+        runner_up = matches[-1]
+    margin = runner_up["score"] - best["score"] if runner_up is not None else float(64 - best["distance"])
+    confidence = margin / (margin + best["distance"] + 1)
+    accepted = best["distance"] <= max_hamming_distance and margin >= min_margin
+    return {
+        "matches": matches,
+        "best": best if accepted else None,
+        "distance": best["distance"],
+        "margin": margin,
+        "confidence": confidence,
+        "accepted": accepted,
+        "acceptance_threshold": max_hamming_distance,
+        "verification_required": False,
+    }
+
 
-    if best_match and smallest_distance <= max_hamming_distance:
-        print(f"\nMeilleure correspondance trouvée : '{best_match['name']}' (ID: {best_match['id']})")
-        print(f"Distance de Hamming : {smallest_distance}")
+def _report_match(best_match, smallest_distance, max_hamming_distance):
+    """Journalise le résultat (niveau DEBUG) et retourne la carte trouvée ou le dictionnaire "Not found"."""
+    if best_match and smallest_distance is not None and smallest_distance <= max_hamming_distance:
+        # Appelé pour chaque carte identifiée : niveau DEBUG, rien n'est formaté s'il est désactivé
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Meilleure correspondance trouvée", extra={"fields": {
+                "card_id": best_match['id'], "card_name": best_match['name'], "distance": int(smallest_distance)}})
         return best_match
     else:
-        print("\nAucune correspondance satisfaisante trouvée dans la base de données.")
+        logger.debug("Aucune correspondance satisfaisante trouvée dans la base de données.")
         to_return = {
                 "id": "Not ID",
                 "name": "Not found",
@@ -81,6 +353,7 @@ def find_matching_card(input_image, hashed_data, max_hamming_distance=10):
         return to_return
 
 if __name__ == "__main__":
+    configure_logging()
     # Charger les données de hachage
     all_hashed_cards = load_hashed_data(HASHED_CARDS_JSON_PATH)
 
@@ -92,7 +365,8 @@ if __name__ == "__main__":
         # Pour pHash, des valeurs de 0 à 5 sont des correspondances très fortes, 5-10 sont de bonnes correspondances.
         HAMMING_DISTANCE_THRESHOLD = 14
 
-        matched_card_info = find_matching_card(input_image_file, all_hashed_cards, max_hamming_distance=HAMMING_DISTANCE_THRESHOLD)
+        matched_card_info = find_matching_card(Image.open(input_image_file), all_hashed_cards, max_hamming_distance=HAMMING_DISTANCE_THRESHOLD)
+        print(f"Résultat : '{matched_card_info['name']}' (ID: {matched_card_info['id']})")
 
         # Si vous voulez tester avec une autre carte :
         # input_image_file_2 = "une_autre_carte.png"
@@ -0,0 +1,165 @@
+# card_tracker.py
+import threading
+
+import cv2
+import numpy as np
+
+MIN_IOU_FOR_ASSOCIATION = 0.3 # Recouvrement minimal entre deux quadrilatères pour les associer
+MOVEMENT_THRESHOLD_RATIO = 0.08 # Déplacement (fraction de la diagonale de la carte) déclenchant une ré-identification
+# Confiance (marge / (marge + distance + 1)) en dessous de laquelle une identification acceptée est refaite
+# régulièrement : 0.12 correspond à la marge minimale (2) au bord du seuil (distance 14) ;
+# une bonne correspondance typique (distance 10, marge 2) vaut 0.15
+LOW_CONFIDENCE_THRESHOLD = 0.12
+UNRELIABLE_RETRY_INTERVAL = 2 # Traitements avant de réessayer une piste rejetée ou peu fiable (immobile)
+MAX_UNRELIABLE_RETRY_INTERVAL = 32 # L'intervalle double à chaque nouvel échec, jusqu'à ce plafond
+MAX_MISSED_FRAMES = 5 # Nombre de traitements sans détection avant de supprimer une piste
+
+
+def _quad_points(corners):
+    return np.asarray(corners, dtype=np.float32).reshape(4, 2)
+
+
+def quad_iou(corners_a, corners_b):
+    """Intersection sur union de deux quadrilatères (tableaux de 4 coins), via leurs enveloppes convexes."""
+    # Les détections ne sont pas toujours convexes : aires et intersection sont celles des enveloppes convexes
+    hull_a, hull_b = cv2.convexHull(_quad_points(corners_a)), cv2.convexHull(_quad_points(corners_b))
+    area_a = cv2.contourArea(hull_a)
+    area_b = cv2.contourArea(hull_b)
+    if area_a <= 0 or area_b <= 0:
+        return 0.0
+    intersection_area, _ = cv2.intersectConvexConvex(hull_a, hull_b)
+    union_area = area_a + area_b - intersection_area
+    return float(intersection_area / union_area) if union_area > 0 else 0.0
+
+
+def corner_displacement(corners_a, corners_b):
+    """Déplacement du centre entre deux quadrilatères, relatif à la diagonale de la boîte du premier."""
+    quad_a, quad_b = _quad_points(corners_a), _quad_points(corners_b)
+    x, y, width, height = cv2.boundingRect(quad_a)
+    diagonal = max(np.hypot(width, height), 1.0)
+    return float(np.linalg.norm(quad_a.mean(axis=0) - quad_b.mean(axis=0)) / diagonal)
+
+
+class CardTrack:
+    """Une carte suivie d'un traitement à l'autre, avec son identification en cache."""
+
+    def __init__(self, track_id, corners):
+        self.track_id = track_id
+        self.corners = corners
+        self.identified_corners = None # Position lors de la dernière identification
+        self.match_result = None
+        self.missed_frames = 0
+        self.frames_since_identification = 0 # Traitements où la piste était visible depuis la dernière identification
+        self.unreliable_identifications = 0 # Identifications rejetées ou peu fiables consécutives
+
+    def is_reliable(self, low_confidence_threshold=LOW_CONFIDENCE_THRESHOLD):
+        """Vrai si l'identification en cache est acceptée avec une confiance suffisante."""
+        return (self.match_result is not None and bool(self.match_result.get("accepted"))
+                and self.match_result.get("confidence", 0.0) >= low_confidence_threshold)
+
+    def retry_interval(self):
+        """Traitements à attendre avant de réessayer une piste immobile non fiable (recul exponentiel)."""
+        exponent = min(max(self.unreliable_identifications - 1, 0), 16)
+        return min(UNRELIABLE_RETRY_INTERVAL * 2 ** exponent, MAX_UNRELIABLE_RETRY_INTERVAL)
+
+    def needs_identification(self, movement_threshold=MOVEMENT_THRESHOLD_RATIO,
+                             low_confidence_threshold=LOW_CONFIDENCE_THRESHOLD):
+        """
+        Vrai si la piste est nouvelle ou s'est déplacée depuis son identification. Une piste immobile
+        rejetée ou peu fiable n'est réessayée qu'après `retry_interval()` traitements : une carte qui
+        ne sera jamais reconnue (carte absente de la base, reflet) ne coûte pas une identification par image.
+        """
+        if self.match_result is None or self.identified_corners is None:
+            return True
+        if corner_displacement(self.identified_corners, self.corners) > movement_threshold:
+            return True
+        if self.is_reliable(low_confidence_threshold):
+            return False
+        return self.frames_since_identification >= self.retry_interval()
+
+
+class CardTracker:
+    """
+    Associe les quadrilatères détectés d'une image à l'autre (recouvrement IoU, appariement glouton)
+    et conserve l'identification de chaque piste : seules les pistes nouvelles ou déplacées sont
+    ré-identifiées, les pistes rejetées ou peu fiables de moins en moins souvent. Sur une page de
+    classeur immobile, le travail d'identification tend vers zéro.
+    """
+
+    def __init__(self, min_iou=MIN_IOU_FOR_ASSOCIATION, max_missed_frames=MAX_MISSED_FRAMES):
+        self.min_iou = min_iou
+        self.max_missed_frames = max_missed_frames
+        self.tracks = []
+        self._next_track_id = 1
+        self.identifications_requested = 0
+        self.identifications_skipped = 0
+        # Les workers du pipeline partagent le tracker : à tenir pendant update / tracks_to_identify / store_identification
+        self.lock = threading.Lock()
+
+    def update(self, detected_corners_list):
+        """
+        Met à jour les pistes avec les détections de l'image courante.
+
+        Returns:
+            list: Les pistes visibles dans cette image, dans l'ordre des détections.
+        """
+        # Appariement glouton par IoU décroissante
+        candidate_pairs = []
+        for detection_index, corners in enumerate(detected_corners_list):
+            for track_index, track in enumerate(self.tracks):
+                iou = quad_iou(track.corners, corners)
+                if iou >= self.min_iou:
+                    candidate_pairs.append((iou, detection_index, track_index))
+        candidate_pairs.sort(reverse=True)
+
+        matched_tracks = {}
+        used_tracks = set()
+        for _, detection_index, track_index in candidate_pairs:
+            if detection_index in matched_tracks or track_index in used_tracks:
+                continue
+            matched_tracks[detection_index] = self.tracks[track_index]
+            used_tracks.add(track_index)
+
+        visible_tracks = []
+        for detection_index, corners in enumerate(detected_corners_list):
+            track = matched_tracks.get(detection_index)
+            if track is None:
+                track = CardTrack(self._next_track_id, corners)
+                self._next_track_id += 1
+                self.tracks.append(track)
+            track.corners = corners
+            track.missed_frames = 0
+            track.frames_since_identification += 1
+            visible_tracks.append(track)
+
+        for track_index, track in enumerate(self.tracks):
+            if track_index not in used_tracks and track not in visible_tracks:
+                track.missed_frames += 1
+        self.tracks = [track for track in self.tracks if track.missed_frames <= self.max_missed_frames]
+        return visible_tracks
+
+    def tracks_to_identify(self, visible_tracks):
+        """Filtre les pistes dont l'identification en cache doit être refaite, et met à jour les compteurs."""
+        to_identify = [track for track in visible_tracks if track.needs_identification()]
+        self.identifications_requested += len(to_identify)
+        self.identifications_skipped += len(visible_tracks) - len(to_identify)
+        return to_identify
+
+    def invalidate_identifications(self):
+        """Force la ré-identification de toutes les pistes (ex. après le rechargement de la base)."""
+        with self.lock:
+            for track in self.tracks:
+                track.match_result = None
+                track.identified_corners = None
+                track.unreliable_identifications = 0
+
+    @staticmethod
+    def store_identification(track, match_result, corners=None):
+        """
+        Enregistre l'identification d'une piste. `corners` : position à laquelle la carte a été
+        identifiée (par défaut, la position courante de la piste).
+        """
+        track.match_result = match_result
+        track.identified_corners = track.corners if corners is None else corners
+        track.frames_since_identification = 0
+        track.unreliable_identifications = 0 if track.is_reliable() else track.unreliable_identifications + 1
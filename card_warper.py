@@ -2,6 +2,12 @@
 import cv2
 import numpy as np
 
+from scanner_metrics import metrics
+from scanner_logging import get_logger, RateLimitedLogger
+
+# Appelé pour chaque carte détectée : les erreurs répétées sont limitées en débit
+rate_limited_logger = RateLimitedLogger(get_logger(__name__))
+
 # Dimensions standard pour la carte redressée (en pixels)
 # Le ratio est 6.3cm (largeur) / 8.8cm (hauteur)
 POKEMON_CARD_STD_WIDTH = 250  # Largeur cible en pixels
@@ -42,13 +48,13 @@ def warp_card_to_standard_ratio(image, corners_on_original_image):
         numpy.ndarray: L'image de la carte redressée, ou None en cas d'erreur.
     """
     if image is None or corners_on_original_image is None or len(corners_on_original_image) != 4:
-        print("Erreur : Entrées invalides pour warp_card_to_standard_ratio.")
+        rate_limited_logger.warning("Entrées invalides pour warp_card_to_standard_ratio.")
         return None
 
     try:
         ordered_corners = reorder_corners(corners_on_original_image.astype(np.float32))
     except ValueError as e:
-        print(f"Erreur lors de la réorganisation des coins : {e}")
+        rate_limited_logger.warning("Erreur lors de la réorganisation des coins", error=str(e))
         return None
 
 
@@ -74,17 +80,18 @@ def warp_card_to_standard_ratio(image, corners_on_original_image):
     ], dtype="float32")
 
     try:
-        transform_matrix = cv2.getPerspectiveTransform(ordered_corners, pts_dst)
-        warped_image = cv2.warpPerspective(image, transform_matrix, (target_w, target_h))
+        with metrics.timer("warping"):
+            transform_matrix = cv2.getPerspectiveTransform(ordered_corners, pts_dst)
+            warped_image = cv2.warpPerspective(image, transform_matrix, (target_w, target_h))
         return warped_image
     except Exception as e:
-        print(f"Erreur lors de la transformation de perspective : {e}")
+        rate_limited_logger.warning("Erreur lors de la transformation de perspective", error=str(e))
         return None
 
 if __name__ == "__main__":
     # Test de la fonction de redressement
     # Vous aurez besoin d'une image et des coins d'une carte détectée par card_detector_cv.py
-    from detect_card import detect_card_contours # Pour tester
+    from detect_card import detect_card_boxes # Pour tester
     import os
 
     test_image_path = "data_for_testing/binder1.png" # Ou une image avec une seule carte bien visible
@@ -94,7 +101,7 @@ if __name__ == "__main__":
     if image_to_test is not None:
         print(f"Détection des cartes dans '{test_image_path}' pour le test de redressement...")
         # Utiliser une faible hauteur de redimensionnement pour un traitement plus rapide si l'image est grande
-        detected_corners_list, _ = detect_card_contours(image_to_test, resize_height=600)
+        detected_corners_list = detect_card_boxes(image_to_test, resize_height=600)
 
         if detected_corners_list:
             print(f"{len(detected_corners_list)} carte(s) détectée(s). Redressement de la première...")
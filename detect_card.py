@@ -1,34 +1,76 @@
+import time
+
 import cv2
 import numpy as np
 
-def detect_card_boxes(image,resize_height):
+MIN_CONTOUR_AREA = 50 # Aire minimale (en pixels de l'image redimensionnée) d'un contour de carte
+MAX_CONTOUR_AREA_RATIO = 0.8 # Aire maximale, en fraction de l'image redimensionnée
+
+class StageTimer:
+    """
+    Chronomètre les étapes successives d'un traitement dans le dict `timings` (millisecondes).
+    Avec `timings=None`, `lap` ne fait rien : aucun coût quand la mesure n'est pas demandée.
+    """
+
+    def __init__(self, timings=None):
+        self.timings = timings
+        self._last = time.perf_counter() if timings is not None else None
+
+    def lap(self, stage):
+        """Attribue le temps écoulé depuis le dernier appel à l'étape `stage`."""
+        if self.timings is None:
+            return
+        now = time.perf_counter()
+        self.timings[stage] = self.timings.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+
+def detect_card_boxes(image, resize_height=1000, return_debug=False, timings=None):
+    """
+    Détecte les quadrilatères de cartes dans une image, sans aucun affichage.
 
+    Args:
+        image (numpy.ndarray): L'image d'entrée (couleur BGR), non modifiée.
+        resize_height (int): Hauteur de l'image pendant le traitement. None pour ne pas redimensionner.
+        return_debug (bool): Retourner aussi les images intermédiaires (pour `show_detected_cards`).
+        timings (dict): Si fourni, reçoit la durée de chaque étape en millisecondes
+                        (resize, grayscale, contrast, canny, find_contours, filtering).
 
-    orig = image.copy()
+    Returns:
+        list: Les coins de chaque carte détectée (tableaux 4x2 float32) à l'échelle de l'image originale.
+        dict: Seulement si `return_debug` : image redimensionnée, niveaux de gris, bords, contours
+              (à l'échelle redimensionnée) et facteur d'échelle.
+    """
+    timer = StageTimer(timings)
     height, width = image.shape[:2]
-    
+
     # Resize for faster processing
-    
-    scale = resize_height / height
-    image = cv2.resize(image, (int(width * scale), resize_height))
+    scale = 1.0
+    if resize_height and resize_height != height:
+        scale = resize_height / height
+        image = cv2.resize(image, (int(width * scale), resize_height))
+    timer.lap("resize")
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    timer.lap("grayscale")
 
     # Enhance contrast
     gray = cv2.equalizeHist(gray)
+    timer.lap("contrast")
 
     # Edge detection
     edged = cv2.Canny(gray, 100, 150)
+    timer.lap("canny")
 
-    # Find contours
-    contours, _ = cv2.findContours(edged.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # Find contours (findContours ne modifie plus l'image source depuis OpenCV 4.2 : pas de copie)
+    contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    timer.lap("find_contours")
 
-    min_area = 50
-    max_area = 0.8 * image.shape[0] * image.shape[1]
+    max_area = MAX_CONTOUR_AREA_RATIO * image.shape[0] * image.shape[1]
     card_contours = []
 
     for cnt in contours:
         area = cv2.contourArea(cnt)
-        if area < min_area or area > max_area:
+        if area < MIN_CONTOUR_AREA or area > max_area:
             continue
 
         # Approximate the contour to polygon
@@ -39,20 +81,54 @@ def detect_card_boxes(image,resize_height):
         if len(approx) == 4:
             card_contours.append(approx)
 
-    #return card_contours
+    # Coins ramenés à l'échelle de l'image originale
+    card_corners_list = [approx.reshape(4, 2).astype(np.float32) / scale for approx in card_contours]
+    timer.lap("filtering")
+
+    if not return_debug:
+        return card_corners_list
+    debug = {
+        "resized": image,
+        "gray": gray,
+        "edged": edged,
+        "contours": card_contours,
+        "scale": scale,
+    }
+    return card_corners_list, debug
+
 
-    # Draw the detected contours
+def draw_detected_cards(image, card_corners_list, color=(0, 255, 0), thickness=3):
+    """Retourne une copie de `image` avec les contours des cartes détectées."""
     output = image.copy()
-    cv2.drawContours(output, card_contours, -1, (0, 255, 0), 3)
+    cv2.drawContours(output, [corners.astype(np.int32) for corners in card_corners_list], -1, color, thickness)
+    return output
+
+
+def show_detected_cards(image, card_corners_list, debug=None, wait=True):
+    """
+    Affiche les cartes détectées dans des fenêtres OpenCV (outil de mise au point, jamais appelé par le pipeline).
 
-    # Show results
-    cv2.imshow("Original Image", image)
+    Args:
+        image (numpy.ndarray): L'image originale.
+        card_corners_list (list): Résultat de `detect_card_boxes`.
+        debug (dict): Artefacts de `detect_card_boxes(..., return_debug=True)`, affichés s'ils sont fournis.
+        wait (bool): Attendre une touche puis fermer les fenêtres.
+    """
+    output = draw_detected_cards(image, card_corners_list)
+    if debug is not None:
+        # Afficher à la taille de traitement plutôt qu'à la taille originale
+        output = cv2.resize(output, (debug["resized"].shape[1], debug["resized"].shape[0]))
+        cv2.imshow("Original Image", debug["resized"])
+        cv2.imshow("Edges", debug["edged"])
     cv2.imshow("Detected Cards", output)
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
+    if wait:
+        cv2.waitKey(0)
+        cv2.destroyAllWindows()
 
 # Example usage
 if __name__ == "__main__":
     image_path = "data_for_testing/test.jpg"  # Replace with your image path
     image = cv2.imread(image_path)
-    detect_card_boxes(image,1000)
\ No newline at end of file
+    card_corners_list, debug = detect_card_boxes(image, 1000, return_debug=True)
+    print(f"{len(card_corners_list)} carte(s) détectée(s).")
+    show_detected_cards(image, card_corners_list, debug)
@@ -3,6 +3,8 @@ import cv2
 import numpy as np
 import os # Pour le test
 
+from detect_card import StageTimer
+
 # Ratios et tolérances comme dans card_detector_cv.py
 POKEMON_CARD_ASPECT_RATIO_PORTRAIT = 6.3 / 8.8
 POKEMON_CARD_ASPECT_RATIO_LANDSCAPE = 8.8 / 6.3
@@ -59,13 +61,15 @@ def calculate_convexity_ratio(contour):
         return 0
 
 
-def detect_enhanced_card_contours(image_bgr, resize_height=700):
+def detect_enhanced_card_contours(image_bgr, resize_height=700, timings=None):
     """
     Détecte les contours de cartes potentielles dans une image en utilisant des techniques améliorées.
 
     Args:
         image_bgr (numpy.ndarray): L'image d'entrée (couleur BGR).
         resize_height (int): Hauteur pour redimensionner l'image pour traitement. None pour ne pas redimensionner.
+        timings (dict): Si fourni, reçoit la durée de chaque étape en millisecondes
+                        (resize, grayscale, blur, canny, morphology, find_contours, filtering, debug_draw).
 
     Returns:
         list: Une liste de tableaux de coins (chaque tableau a 4 points [x, y])
@@ -76,6 +80,7 @@ def detect_enhanced_card_contours(image_bgr, resize_height=700):
         print("Erreur : Image d'entrée non valide.")
         return [], None
 
+    timer = StageTimer(timings)
     orig_h, orig_w = image_bgr.shape[:2]
     processed_image = image_bgr.copy() # Image qui sera modifiée pour le traitement
     scale = 1.0
@@ -84,13 +89,17 @@ def detect_enhanced_card_contours(image_bgr, resize_height=700):
         scale = resize_height / orig_h
         processing_width = int(orig_w * scale)
         processed_image = cv2.resize(image_bgr, (processing_width, resize_height))
+    timer.lap("resize")
 
     # 1. Pré-traitement
     gray = cv2.cvtColor(processed_image, cv2.COLOR_BGR2GRAY)
+    timer.lap("grayscale")
     blurred = cv2.GaussianBlur(gray, (5, 5), 0) # Un léger flou initial
+    timer.lap("blur")
 
     # 2. Détection des bords (Canny est un bon point de départ)
     edged = cv2.Canny(blurred, 30, 100) # Seuil bas pour attraper les bords faibles
+    timer.lap("canny")
 
     # 3. Opération Morphologique de Fermeture (Closing)
     # L'article utilise un disque de rayon 7. Un élément elliptique de taille 11x11 ou 15x15 pourrait s'en approcher.
@@ -99,12 +108,14 @@ def detect_enhanced_card_contours(image_bgr, resize_height=700):
     kernel_closing_size = 11 # Doit être impair. Ex: 7, 9, 11, 15. À tester.
     kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_closing_size, kernel_closing_size))
     closed_edges = cv2.morphologyEx(edged, cv2.MORPH_CLOSE, kernel, iterations=2) # iterations=2 pour une fermeture plus forte
+    timer.lap("morphology")
 
     # 4. Binarisation (Canny et closing produisent déjà une image binaire, mais on peut ré-appliquer si besoin)
     # Pour cet exemple, 'closed_edges' est déjà binaire.
 
     # 5. Trouver les contours sur l'image après fermeture
     contours, _ = cv2.findContours(closed_edges.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    timer.lap("find_contours")
 
     # Filtrage des contours
     min_area_ratio = 0.008 # % de l'aire de l'image traitée
@@ -160,6 +171,7 @@ def detect_enhanced_card_contours(image_bgr, resize_height=700):
         scaled_back_corners = (approx_corners / scale).astype(np.int32)
         detected_card_scaled_corners.append(scaled_back_corners)
         debug_contours_to_draw.append(approx_corners)
+    timer.lap("filtering")
 
 
     # Dessiner les contours finaux sur une image de débogage
@@ -167,6 +179,7 @@ def detect_enhanced_card_contours(image_bgr, resize_height=700):
     cv2.drawContours(output_debug_image, debug_contours_to_draw, -1, (0, 255, 0), 2)
     # Afficher aussi l'image des bords fermés pour le débogage
     # cv2.imshow("Closed Edges (for debug)", closed_edges)
+    timer.lap("debug_draw")
 
     return detected_card_scaled_corners, output_debug_image
 
@@ -0,0 +1,221 @@
+# hash_audit.py
+"""
+Audit des doublons et quasi-doublons de la base de hachages de référence.
+
+Toutes les distances de Hamming entre paires de cartes sont calculées par blocs de lignes
+(XOR + popcount vectorisés, un bloc de `block_size` x N distances à la fois, mémoire bornée),
+répartis sur plusieurs threads : les opérations NumPy utilisées libèrent le GIL, les blocs sont
+donc calculés en parallèle sur tous les cœurs sans copier la base. On ne garde de chaque bloc
+que le plus proche voisin de chaque carte et les paires sous le rayon d'audit.
+
+Le rapport donne :
+    - les grappes de collisions : composantes connexes des paires à distance <= rayon ;
+      une grappe est "conflictuelle" si elle mélange des cartes de noms différents
+      (les réimpressions d'une même carte sous le même nom ne gênent pas l'identification) ;
+    - pour chaque carte, sa "séparation minimale" : la distance au plus proche pHash d'une carte
+      de nom différent. La conversion au format binaire (hash_database.py) l'écrit dans la colonne
+      "min_separation" du fichier généré, jamais dans le JSON de référence ; l'identificateur s'en
+      sert pour décider quand une vérification secondaire est nécessaire
+      (voir `find_top_matches_batch` avec cascade="auto") et en déduit au chargement le rayon
+      d'acceptation de chaque carte (voir `hash_matcher.compute_acceptance_radii`, identificateur
+      avec adaptive_thresholds=True).
+
+    python hash_audit.py pokemon_card_hashes.json --radius 4 --report audit.json
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from hash_matcher import HashMatrix, popcount64, uint64_to_hex
+
+HASHED_CARDS_JSON_PATH = "pokemon_card_hashes.json"
+AUDIT_BLOCK_SIZE = 1024 # Lignes de la matrice de distances calculées à la fois (1024 x 18 000 octets)
+AUDIT_RADIUS = 4 # Distance maximale (bits) entre deux cartes d'une même grappe de quasi-doublons
+NO_NEIGHBOUR_DISTANCE = 64 # Séparation d'une carte sans voisin de nom différent
+
+
+def _audit_block(hashes, name_codes, start, stop, radius):
+    """Plus proches voisins et paires (i < j) à distance <= `radius` pour les lignes [start, stop)."""
+    distances = popcount64(np.bitwise_xor(hashes[start:stop, None], hashes[None, :]))
+    rows = np.arange(stop - start)
+    # Une carte n'est pas sa propre voisine
+    distances[rows, rows + start] = NO_NEIGHBOUR_DISTANCE + 1
+
+    near_rows, near_columns = np.nonzero(distances <= radius)
+    upper = near_columns > near_rows + start
+    pairs = (near_rows[upper] + start, near_columns[upper], distances[near_rows[upper], near_columns[upper]])
+
+    nearest_indices = np.argmin(distances, axis=1)
+    nearest_distances = distances[rows, nearest_indices]
+
+    distances[name_codes[start:stop, None] == name_codes[None, :]] = NO_NEIGHBOUR_DISTANCE + 1
+    separation_indices = np.argmin(distances, axis=1)
+    separations = np.minimum(distances[rows, separation_indices], NO_NEIGHBOUR_DISTANCE)
+    return start, nearest_indices, nearest_distances, separation_indices, separations, pairs
+
+
+def audit_hashes(hash_matrix, radius=AUDIT_RADIUS, block_size=AUDIT_BLOCK_SIZE, workers=None):
+    """
+    Calcule la structure des distances de Hamming entre toutes les paires de cartes.
+
+    Args:
+        hash_matrix (HashMatrix): Base de hachages.
+        radius (int): Les paires à distance <= `radius` sont conservées (grappes de quasi-doublons).
+        block_size (int): Nombre de lignes par bloc ; la mémoire de travail vaut environ
+                          2 x block_size x len(hash_matrix) octets par thread.
+        workers (int): Nombre de threads (par défaut : nombre de cœurs).
+
+    Returns:
+        dict: Tableaux alignés sur la base "nearest_index" / "nearest_distance" (plus proche carte,
+              quel que soit son nom), "separation_index" / "min_separation" (plus proche carte de nom
+              différent, -1 s'il n'y en a pas) et "pairs" : tableau (P x 3) de (i, j, distance), i < j.
+    """
+    hashes = np.ascontiguousarray(hash_matrix.hashes, dtype=np.uint64)
+    card_count = len(hashes)
+    _, name_codes = np.unique(np.array(list(hash_matrix.names), dtype=str), return_inverse=True)
+    nearest_index = np.full(card_count, -1, dtype=np.int64)
+    nearest_distance = np.full(card_count, NO_NEIGHBOUR_DISTANCE, dtype=np.uint8)
+    separation_index = np.full(card_count, -1, dtype=np.int64)
+    min_separation = np.full(card_count, NO_NEIGHBOUR_DISTANCE, dtype=np.uint8)
+    pair_parts = []
+
+    block_starts = range(0, card_count, block_size)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = [pool.submit(_audit_block, hashes, name_codes, start, min(start + block_size, card_count), radius)
+                   for start in block_starts]
+        for future in futures:
+            start, block_nearest, block_nearest_distances, block_separation, block_separations, pairs = future.result()
+            stop = start + len(block_nearest)
+            nearest_index[start:stop] = block_nearest
+            nearest_distance[start:stop] = np.minimum(block_nearest_distances, NO_NEIGHBOUR_DISTANCE)
+            separation_index[start:stop] = block_separation
+            min_separation[start:stop] = block_separations
+            pair_parts.append(np.column_stack(pairs).astype(np.int64))
+
+    if card_count <= 1:
+        nearest_index[:] = -1
+    separation_index[min_separation >= NO_NEIGHBOUR_DISTANCE] = -1
+    pairs = np.concatenate(pair_parts) if pair_parts else np.empty((0, 3), dtype=np.int64)
+    return {
+        "nearest_index": nearest_index,
+        "nearest_distance": nearest_distance,
+        "separation_index": separation_index,
+        "min_separation": min_separation,
+        "pairs": pairs,
+    }
+
+
+def collision_clusters(card_count, pairs):
+    """
+    Regroupe les cartes reliées par les paires (composantes connexes, union-find).
+
+    Returns:
+        list: Listes d'index de cartes (au moins 2 par grappe), la plus grande grappe en premier.
+    """
+    parents = np.arange(card_count)
+
+    def find(index):
+        root = index
+        while parents[root] != root:
+            root = parents[root]
+        while parents[index] != root: # Compression des chemins
+            parents[index], index = root, parents[index]
+        return root
+
+    for first, second, _ in pairs.tolist():
+        first_root, second_root = find(first), find(second)
+        if first_root != second_root:
+            parents[max(first_root, second_root)] = min(first_root, second_root)
+
+    members_by_root = {}
+    for index in np.unique(pairs[:, :2]).tolist():
+        members_by_root.setdefault(find(index), []).append(index)
+    return sorted(members_by_root.values(), key=lambda members: (-len(members), members[0]))
+
+
+def build_audit_report(hash_matrix, audit, radius=AUDIT_RADIUS):
+    """Rapport JSON-sérialisable : statistiques globales, grappes et cartes les moins séparées."""
+    pairs = audit["pairs"]
+    min_separation = audit["min_separation"]
+    clusters = []
+    for members in collision_clusters(len(hash_matrix), pairs):
+        names = {hash_matrix.names[index] for index in members}
+        clusters.append({
+            "size": len(members),
+            "distinct_names": len(names),
+            "conflicting": len(names) > 1,
+            "cards": [{"id": hash_matrix.ids[index], "name": hash_matrix.names[index],
+                       "hash": uint64_to_hex(hash_matrix.hashes[index])} for index in members],
+        })
+    clusters.sort(key=lambda cluster: (not cluster["conflicting"], -cluster["size"]))
+
+    separation_values, separation_counts = np.unique(min_separation, return_counts=True)
+    least_separated = np.argsort(min_separation, kind="stable")[:50]
+    return {
+        "cards": len(hash_matrix),
+        "distinct_hashes": int(len(np.unique(np.asarray(hash_matrix.hashes)))),
+        "radius": radius,
+        "exact_duplicate_pairs": int(np.count_nonzero(pairs[:, 2] == 0)),
+        "near_duplicate_pairs": int(len(pairs)),
+        "clusters": len(clusters),
+        "conflicting_clusters": sum(cluster["conflicting"] for cluster in clusters),
+        "cards_in_conflicting_clusters": sum(cluster["size"] for cluster in clusters if cluster["conflicting"]),
+        "min_separation_histogram": dict(zip(map(str, separation_values.tolist()), separation_counts.tolist())),
+        "least_separated_cards": [
+            {"id": hash_matrix.ids[index], "name": hash_matrix.names[index],
+             "min_separation": int(min_separation[index]),
+             "closest_other_card": hash_matrix.ids[audit["separation_index"][index]]
+             if audit["separation_index"][index] >= 0 else None}
+            for index in least_separated.tolist()
+        ],
+        "collision_clusters": clusters,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Audit des doublons et quasi-doublons de la base de hachages.")
+    parser.add_argument("database", nargs="?", default=HASHED_CARDS_JSON_PATH, help="Base de hachages JSON.")
+    parser.add_argument("--radius", type=int, default=AUDIT_RADIUS,
+                        help="Distance maximale entre deux cartes d'une même grappe.")
+    parser.add_argument("--block-size", type=int, default=AUDIT_BLOCK_SIZE, help="Lignes par bloc de calcul.")
+    parser.add_argument("--workers", type=int, help="Nombre de threads (par défaut : nombre de cœurs).")
+    parser.add_argument("--report", help="Écrire le rapport complet (grappes, séparations) en JSON dans ce fichier.")
+    parser.add_argument("--show", type=int, default=10, help="Nombre de grappes conflictuelles affichées.")
+    args = parser.parse_args()
+
+    with open(args.database, 'r') as f:
+        hash_matrix = HashMatrix.from_hashed_data(json.load(f))
+    started_at = time.perf_counter()
+    audit = audit_hashes(hash_matrix, args.radius, args.block_size, args.workers)
+    elapsed = time.perf_counter() - started_at
+    report = build_audit_report(hash_matrix, audit, args.radius)
+
+    print(f"{report['cards']} cartes, {report['distinct_hashes']} pHash distincts "
+          f"({len(hash_matrix) ** 2 / 1e6:.0f} M distances en {elapsed:.2f} s)")
+    print(f"Paires identiques : {report['exact_duplicate_pairs']}, paires à <= {args.radius} bits : "
+          f"{report['near_duplicate_pairs']}")
+    print(f"Grappes : {report['clusters']}, dont {report['conflicting_clusters']} mêlant des noms différents "
+          f"({report['cards_in_conflicting_clusters']} cartes)")
+    for cluster in [cluster for cluster in report["collision_clusters"] if cluster["conflicting"]][:args.show]:
+        print("  " + ", ".join(f"{card['name']} ({card['id']})" for card in cluster["cards"][:6])
+              + (" ..." if cluster["size"] > 6 else ""))
+    cumulative = 0
+    print("Séparation minimale (distance au plus proche pHash d'un autre nom) :")
+    for separation, count in report["min_separation_histogram"].items():
+        cumulative += count
+        if int(separation) > 16:
+            break
+        print(f"  <= {int(separation):2d} bits : {cumulative:6d} cartes ({cumulative / report['cards']:.1%})")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Rapport écrit dans '{args.report}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# hash_cache.py
+import hashlib
+import json
+import os
+
+from hash_matcher import SECONDARY_HASH_FUNCTIONS
+from scanner_logging import get_logger
+
+HASH_CACHE_PATH = "pokemon_card_hash_cache.json"
+
+logger = get_logger(__name__)
+
+
+def content_digest(image_bytes):
+    """Empreinte SHA-256 du contenu téléchargé (pour détecter une image inchangée sans la re-hacher)."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class HashCache:
+    """
+    Cache local des hachages, indexé par id de carte et valide tant que l'URL de l'image ne change pas.
+
+    Chaque entrée conserve l'URL, les en-têtes ETag / Last-Modified renvoyés par le serveur,
+    l'empreinte SHA-256 du contenu et les hachages perceptuels calculés, pour ne retélécharger et re-hacher
+    que les cartes nouvelles ou modifiées.
+    """
+
+    def __init__(self, path=HASH_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.entries = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.warning("Cache de hachages illisible (%s), il sera reconstruit : %s", e, path)
+
+    def get(self, card_id, image_url):
+        """
+        Retourne l'entrée du cache pour cette carte si elle correspond toujours à la même URL
+        et contient toutes les empreintes actuellement calculées par le builder.
+        """
+        cached = self.entries.get(card_id)
+        if not cached or cached.get("image_url") != image_url:
+            return None
+        fingerprints = cached.get("fingerprints") or {}
+        if "hash" not in fingerprints or any(name not in fingerprints for name in SECONDARY_HASH_FUNCTIONS):
+            return None
+        return cached
+
+    def conditional_headers(self, cached):
+        """En-têtes de requête conditionnelle permettant au serveur de répondre 304 Not Modified."""
+        headers = {}
+        if cached and cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def update(self, card_id, image_url, fingerprints, etag=None, last_modified=None, digest=None):
+        self.entries[card_id] = {
+            "image_url": image_url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "digest": digest,
+            "fingerprints": fingerprints,
+        }
+
+    def save(self):
+        """Écrit le cache de façon atomique (fichier temporaire puis renommage)."""
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,211 @@
+# hash_database.py
+"""
+Format binaire compact pour la base de hachages, chargé par np.memmap.
+
+Disposition du fichier (petit-boutiste, sections alignées sur 8 octets) :
+    - En-tête : magic (8 octets), version (uint32), nombre de sections (uint32), nombre de cartes (uint64)
+    - Table des sections : pour chaque section, nom (16 octets ASCII), type (uint32),
+      réservé (uint32), offset (uint64) et longueur en octets (uint64)
+    - Sections :
+        * type colonne uint64 : un entier par carte ("phash", empreintes secondaires "dhash", "ahash", "colorhash"
+          et "min_separation", calculée par l'audit de la base à la conversion : voir hash_audit.py)
+        * type table de chaînes : (nombre de cartes + 1) offsets uint64, puis les chaînes UTF-8 concaténées
+          ("id", "name", et les partitions "set_id" et, si elle est connue, "series")
+
+Le chargement ne construit aucun objet par carte : les hashes restent dans le fichier mappé
+et les chaînes (id, nom) ne sont décodées qu'à la demande.
+"""
+import json
+import os
+import struct
+import sys
+
+import numpy as np
+
+from hash_audit import audit_hashes
+from hash_matcher import HashMatrix, SECONDARY_HASH_FUNCTIONS
+from scanner_logging import get_logger
+
+HASH_DATABASE_MAGIC = b"PKHASHDB"
+HASH_DATABASE_VERSION = 1
+
+SECTION_UINT64 = 1
+SECTION_STRINGS = 2
+
+_HEADER = struct.Struct("<8sIIQ")
+_SECTION_ENTRY = struct.Struct("<16sIIQQ")
+_ALIGNMENT = 8
+
+logger = get_logger(__name__)
+
+
+class StringTable:
+    """Table de chaînes indexée par offsets, lue directement depuis le fichier mappé."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def _pad(length):
+    return (-length) % _ALIGNMENT
+
+
+def _encode_string_table(strings):
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    offsets[1:] = np.cumsum([len(value) for value in encoded], dtype=np.uint64)
+    return offsets.tobytes() + b"".join(encoded)
+
+
+def write_hash_database(output_path, hashes, sections_of_strings, uint64_columns=None):
+    """
+    Écrit un fichier binaire de base de hachages.
+
+    Args:
+        output_path (str): Chemin du fichier binaire à créer (écrit de façon atomique : un lecteur qui
+                           a déjà mappé l'ancien fichier continue de le lire sans erreur).
+        hashes (numpy.ndarray): Les pHash des cartes (uint64).
+        sections_of_strings (dict): Nom de section -> liste de chaînes (une par carte), ex. {"id": [...], "name": [...]}.
+        uint64_columns (dict): Colonnes uint64 supplémentaires (ex. empreintes secondaires), une valeur par carte.
+    """
+    card_count = len(hashes)
+    sections = [("phash", SECTION_UINT64, np.asarray(hashes, dtype="<u8").tobytes())]
+    for name, column in (uint64_columns or {}).items():
+        if len(column) != card_count:
+            raise ValueError(f"La colonne '{name}' contient {len(column)} entrées au lieu de {card_count}.")
+        sections.append((name, SECTION_UINT64, np.asarray(column, dtype="<u8").tobytes()))
+    for name, strings in sections_of_strings.items():
+        if len(strings) != card_count:
+            raise ValueError(f"La section '{name}' contient {len(strings)} entrées au lieu de {card_count}.")
+        sections.append((name, SECTION_STRINGS, _encode_string_table(strings)))
+
+    table_size = _HEADER.size + _SECTION_ENTRY.size * len(sections)
+    offset = table_size + _pad(table_size)
+    section_entries = []
+    for name, kind, payload in sections:
+        section_entries.append(_SECTION_ENTRY.pack(name.encode("ascii"), kind, 0, offset, len(payload)))
+        offset += len(payload) + _pad(len(payload))
+
+    # Nom temporaire propre au processus : plusieurs processus peuvent convertir la même base
+    temporary_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temporary_path, "wb") as f:
+        f.write(_HEADER.pack(HASH_DATABASE_MAGIC, HASH_DATABASE_VERSION, len(sections), card_count))
+        for section_entry in section_entries:
+            f.write(section_entry)
+        f.write(b"\0" * _pad(table_size))
+        for _, _, payload in sections:
+            f.write(payload)
+            f.write(b"\0" * _pad(len(payload)))
+    os.replace(temporary_path, output_path)
+
+
+def convert_json_to_binary(json_path, output_path, audit=True):
+    """
+    Convertit le fichier JSON de hachages (ex. pokemon_card_hashes.json) au format binaire.
+
+    Avec `audit`, la séparation minimale de chaque carte (voir hash_audit.py) est calculée et
+    écrite dans la colonne "min_separation" du fichier binaire : cette donnée dérivée n'est jamais
+    stockée dans le JSON de référence, et elle est recalculée à chaque régénération du binaire.
+    """
+    with open(json_path, 'r') as f:
+        hashed_data = json.load(f)
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    sections_of_strings = {
+        "id": hash_matrix.ids,
+        "name": hash_matrix.names,
+        "set_id": hash_matrix.set_ids,
+    }
+    if hash_matrix.series is not None:
+        sections_of_strings["series"] = hash_matrix.series
+    uint64_columns = dict(hash_matrix.secondary_hashes)
+    # Toujours recalculée (un ancien JSON annoté peut porter des séparations périmées)
+    min_separation = audit_hashes(hash_matrix)["min_separation"] if audit else hash_matrix.min_separation
+    if min_separation is not None:
+        uint64_columns["min_separation"] = min_separation
+    write_hash_database(output_path, hash_matrix.hashes, sections_of_strings, uint64_columns=uint64_columns)
+    return len(hashed_data)
+
+
+def read_hash_database_sections(binary_path):
+    """
+    Mappe le fichier en mémoire et retourne (nombre de cartes, dict nom de section -> données).
+
+    Les colonnes uint64 sont des vues sur le fichier mappé, les tables de chaînes des StringTable.
+    """
+    mapped = np.memmap(binary_path, dtype=np.uint8, mode="r")
+    if len(mapped) < _HEADER.size:
+        raise ValueError(f"Fichier de base de hachages tronqué : {binary_path}")
+    magic, version, section_count, card_count = _HEADER.unpack(mapped[:_HEADER.size].tobytes())
+    if magic != HASH_DATABASE_MAGIC:
+        raise ValueError(f"'{binary_path}' n'est pas une base de hachages binaire.")
+    if version > HASH_DATABASE_VERSION:
+        raise ValueError(f"Version de base de hachages non supportée : {version}")
+
+    sections = {}
+    for section_index in range(section_count):
+        entry_start = _HEADER.size + section_index * _SECTION_ENTRY.size
+        raw_name, kind, _, offset, length = _SECTION_ENTRY.unpack(
+            mapped[entry_start:entry_start + _SECTION_ENTRY.size].tobytes())
+        name = raw_name.rstrip(b"\0").decode("ascii")
+        payload = mapped[offset:offset + length]
+        if kind == SECTION_UINT64:
+            sections[name] = payload.view("<u8")
+        elif kind == SECTION_STRINGS:
+            offsets_size = (card_count + 1) * 8
+            sections[name] = StringTable(payload[:offsets_size].view("<u8"), payload[offsets_size:])
+        # Les types de section inconnus sont ignorés pour rester compatible avec les versions futures
+    return card_count, sections
+
+
+def load_hash_database(binary_path):
+    """Charge une base binaire sous forme de HashMatrix, sans construire d'objet par carte."""
+    _, sections = read_hash_database_sections(binary_path)
+    secondary_hashes = {name: sections[name] for name in SECONDARY_HASH_FUNCTIONS if name in sections}
+    # "set_id" et "series" sont absentes des fichiers écrits avant le partitionnement :
+    # l'extension est alors déduite des ids à la première utilisation. Les rayons d'acceptation
+    # sont recalculés depuis "min_separation" (une section "accept_radius" d'un ancien fichier est ignorée)
+    return HashMatrix(sections["phash"], sections["id"], sections["name"], secondary_hashes,
+                      sections.get("set_id"), sections.get("series"), sections.get("min_separation"))
+
+
+def load_hash_matrix(path, binary_path=None):
+    """
+    Charge la base de hachages sous forme de HashMatrix.
+
+    Si `binary_path` est fourni, la version binaire est utilisée (et créée depuis le JSON `path`
+    si elle n'existe pas ou est plus ancienne que le JSON ; sans JSON, le binaire seul est chargé) ;
+    sinon le JSON est lu directement.
+    """
+    if binary_path:
+        binary_is_stale = os.path.exists(path) and (
+            not os.path.exists(binary_path) or os.path.getmtime(binary_path) < os.path.getmtime(path))
+        if binary_is_stale:
+            logger.info("Conversion de '%s' vers le format binaire '%s'...", path, binary_path)
+            convert_json_to_binary(path, binary_path)
+        return load_hash_database(binary_path)
+    with open(path, 'r') as f:
+        return HashMatrix.from_hashed_data(json.load(f))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage : python hash_database.py <entrée.json> <sortie.bin>")
+        sys.exit(1)
+    converted_count = convert_json_to_binary(sys.argv[1], sys.argv[2])
+    print(f"{converted_count} cartes converties vers '{sys.argv[2]}'.")
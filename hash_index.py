@@ -0,0 +1,143 @@
+# hash_index.py
+from itertools import combinations
+
+import numpy as np
+
+from hash_matcher import HashMatrix, hash_to_uint64, hamming_distances
+
+HASH_BITS = 64
+
+
+def _masks_within_radius(band_bits, radius):
+    """Tous les masques de `band_bits` bits ayant au plus `radius` bits à 1 (0 compris)."""
+    masks = [0]
+    for weight in range(1, radius + 1):
+        for bit_positions in combinations(range(band_bits), weight):
+            mask = 0
+            for bit in bit_positions:
+                mask |= 1 << bit
+            masks.append(mask)
+    return np.array(masks, dtype=np.uint64)
+
+
+class MultiIndexHash:
+    """
+    Index multi-bandes (multi-index hashing) pour des recherches de Hamming sous-linéaires.
+
+    Le pHash de 64 bits est découpé en `num_bands` bandes (4 x 16 bits par défaut), chacune
+    indexée par une table triée. Principe des tiroirs : si deux hashes sont à distance <= r,
+    au moins une bande diffère d'au plus floor(r / num_bands) bits. On ne sonde donc que les
+    valeurs de bande proches de la requête, puis on vérifie la distance complète des candidats.
+    """
+
+    def __init__(self, hash_matrix, num_bands=4):
+        if HASH_BITS % num_bands != 0:
+            raise ValueError(f"Le nombre de bandes doit diviser {HASH_BITS} : {num_bands}")
+        self.matrix = hash_matrix
+        self.num_bands = num_bands
+        self.band_bits = HASH_BITS // num_bands
+        self._band_mask = np.uint64((1 << self.band_bits) - 1)
+        self._probe_masks = {}
+
+        # Pour chaque bande : valeurs triées et indices des cartes correspondants
+        self._sorted_band_values = []
+        self._sorted_band_indices = []
+        for band in range(num_bands):
+            band_values = self._band_values(hash_matrix.hashes, band)
+            order = np.argsort(band_values, kind="stable")
+            self._sorted_band_values.append(band_values[order])
+            self._sorted_band_indices.append(order)
+
+    @classmethod
+    def from_hashed_data(cls, hashed_data, num_bands=4):
+        """Construit l'index à partir de la liste retournée par `load_hashed_data`."""
+        return cls(HashMatrix.from_hashed_data(hashed_data), num_bands=num_bands)
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def entry(self, index):
+        return self.matrix.entry(index)
+
+    def _band_values(self, hashes, band):
+        shift = np.uint64(band * self.band_bits)
+        return np.right_shift(hashes, shift) & self._band_mask
+
+    def _masks(self, sub_radius):
+        if sub_radius not in self._probe_masks:
+            self._probe_masks[sub_radius] = _masks_within_radius(self.band_bits, sub_radius)
+        return self._probe_masks[sub_radius]
+
+    def _candidates(self, query, sub_radius, min_sub_radius=0):
+        """Indices des cartes dont au moins une bande est à une distance comprise entre min_sub_radius et sub_radius."""
+        masks = self._masks(sub_radius)
+        if min_sub_radius > 0:
+            masks = masks[len(self._masks(min_sub_radius - 1)):]
+        found = []
+        for band in range(self.num_bands):
+            query_band = self._band_values(np.array([query], dtype=np.uint64), band)[0]
+            probes = np.bitwise_xor(masks, query_band)
+            sorted_values = self._sorted_band_values[band]
+            starts = np.searchsorted(sorted_values, probes, side="left")
+            lengths = np.searchsorted(sorted_values, probes, side="right") - starts
+            hit = lengths > 0
+            if not hit.any():
+                continue
+            # Concaténation vectorisée des plages [start, end) de la table triée
+            starts, lengths = starts[hit], lengths[hit]
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+            positions = offsets + np.arange(lengths.sum())
+            found.append(self._sorted_band_indices[band][positions])
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.unique(np.concatenate(found))
+
+    def range_search(self, query_hash, radius):
+        """
+        Retourne toutes les cartes à une distance de Hamming <= `radius`.
+
+        Returns:
+            tuple: (liste de (index, distance) triée par distance puis par index,
+                    nombre de candidats examinés)
+        """
+        query = hash_to_uint64(query_hash)
+        candidates = self._candidates(query, radius // self.num_bands)
+        if len(candidates) == 0:
+            return [], 0
+        distances = hamming_distances(query, self.matrix.hashes[candidates])
+        within = distances <= radius
+        results = sorted(zip(distances[within].tolist(), candidates[within].tolist()))
+        return [(index, distance) for distance, index in results], len(candidates)
+
+    def nearest(self, query_hash, max_hamming_distance=10):
+        """
+        Cherche la carte la plus proche à une distance <= `max_hamming_distance`.
+
+        Le rayon de sondage par bande est augmenté progressivement : après avoir sondé jusqu'au
+        rayon s, toute carte à distance <= num_bands * (s + 1) - 1 a forcément été vue, ce qui
+        permet de s'arrêter dès que le meilleur candidat passe sous cette borne.
+        En cas d'égalité, la carte de plus petit index est retenue (comme le parcours linéaire).
+
+        Returns:
+            tuple: (index ou None, distance ou None, nombre de candidats examinés)
+        """
+        query = hash_to_uint64(query_hash)
+        max_sub_radius = max_hamming_distance // self.num_bands
+        candidates_examined = 0
+        best_index, best_distance = None, None
+
+        for sub_radius in range(max_sub_radius + 1):
+            candidates = self._candidates(query, sub_radius, min_sub_radius=sub_radius)
+            if len(candidates) > 0:
+                candidates_examined += len(candidates)
+                distances = hamming_distances(query, self.matrix.hashes[candidates])
+                position = int(np.lexsort((candidates, distances))[0])
+                distance, index = int(distances[position]), int(candidates[position])
+                if best_distance is None or (distance, index) < (best_distance, best_index):
+                    best_index, best_distance = index, distance
+
+            guaranteed_radius = min(self.num_bands * (sub_radius + 1) - 1, max_hamming_distance)
+            if best_distance is not None and best_distance <= guaranteed_radius:
+                return best_index, best_distance, candidates_examined
+
+        return None, best_distance, candidates_examined
@@ -0,0 +1,396 @@
+# hash_matcher.py
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import imagehash # Bibliothèque pour le hachage perceptuel
+
+# Empreintes secondaires calculées en plus du pHash, avec leur poids dans le re-classement en cascade.
+# Les distances sont normalisées par le nombre de bits de chaque empreinte (64 pour dHash/aHash,
+# 14 x 3 = 42 pour le hachage couleur par défaut) puis ramenées à l'échelle des 64 bits du pHash.
+SECONDARY_HASH_FUNCTIONS = {
+    "dhash": imagehash.dhash,
+    "ahash": imagehash.average_hash,
+    "colorhash": imagehash.colorhash,
+}
+SECONDARY_HASH_BITS = {"dhash": 64, "ahash": 64, "colorhash": 42}
+SECONDARY_HASH_WEIGHTS = {"dhash": 1.0, "ahash": 0.5, "colorhash": 1.0}
+CASCADE_SHORTLIST_SIZE = 16 # Nombre de candidats pHash re-classés par les empreintes secondaires
+RESTRICTED_CACHE_SIZE = 32 # Sous-matrices de partitions conservées (les moins récemment utilisées sont libérées)
+# Rayon d'acceptation par carte : séparation minimale + décalage, borné (voir benchmark_identification.py --simulate).
+# Calculé au chargement depuis la séparation minimale : jamais stocké dans la base
+ADAPTIVE_RADIUS_OFFSET = 0
+ADAPTIVE_RADIUS_MIN = 6
+ADAPTIVE_RADIUS_MAX = 18
+
+# Table de popcount par octet, utilisée si np.bitwise_count n'est pas disponible (NumPy < 2.0)
+_POPCOUNT_TABLE_8BIT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hash_to_uint64(hash_value):
+    """Convertit un pHash (ImageHash ou chaîne hexadécimale de 16 caractères) en entier 64 bits."""
+    if isinstance(hash_value, imagehash.ImageHash):
+        hash_value = str(hash_value)
+    return np.uint64(int(hash_value, 16))
+
+
+def uint64_to_hex(value):
+    """Convertit un entier 64 bits en chaîne hexadécimale au format de imagehash (16 caractères)."""
+    return f"{int(value):016x}"
+
+
+def card_set_id(card_id):
+    """Extension d'une carte déduite de son id ("base1-4" -> "base1", "sv3pt5-151" -> "sv3pt5")."""
+    return card_id.rsplit("-", 1)[0]
+
+
+def compute_fingerprints(pil_image):
+    """
+    Calcule toutes les empreintes d'une image : le pHash ("hash", comme dans le JSON) et les
+    empreintes secondaires (dHash, aHash, hachage couleur), sous forme de chaînes hexadécimales.
+    """
+    fingerprints = {"hash": str(imagehash.phash(pil_image))}
+    for name, hash_function in SECONDARY_HASH_FUNCTIONS.items():
+        fingerprints[name] = str(hash_function(pil_image))
+    return fingerprints
+
+
+def compute_acceptance_radii(min_separation, offset=ADAPTIVE_RADIUS_OFFSET, min_radius=ADAPTIVE_RADIUS_MIN,
+                             max_radius=ADAPTIVE_RADIUS_MAX):
+    """
+    Rayons d'acceptation par carte, déduits de la densité de la base autour de chaque carte.
+
+    Une requête proche d'une carte isolée (séparation élevée) ne peut être confondue qu'avec une
+    carte absente de la base : on peut l'accepter plus loin que le seuil global. Dans une zone
+    dense, une requête un peu éloignée est aussi proche d'une carte d'un autre nom : le rayon se
+    resserre et les requêtes au-delà passent par la vérification secondaire.
+
+    Returns:
+        numpy.ndarray: Rayon (uint8) de chaque carte : séparation + `offset`, borné à [min_radius, max_radius].
+    """
+    radii = np.asarray(min_separation, dtype=np.int16) + offset
+    return np.clip(radii, min_radius, max_radius).astype(np.uint8)
+
+
+def popcount64(values):
+    """Compte les bits à 1 de chaque élément d'un tableau uint64 (retourne un tableau d'entiers)."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # Repli : vue octet par octet et somme des popcounts de chaque octet
+    as_bytes = values.view(np.uint8).reshape(values.shape + (8,))
+    return _POPCOUNT_TABLE_8BIT[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def hamming_distances(query_hash, hashes):
+    """Distances de Hamming entre un hash requête (uint64) et un tableau de hashes uint64."""
+    return popcount64(np.bitwise_xor(hashes, np.uint64(query_hash)))
+
+
+class HashMatrix:
+    """
+    Base de hachages compacte : tous les pHash sont rangés dans un tableau uint64 contigu
+    pour calculer toutes les distances de Hamming en une seule passe vectorisée (XOR + popcount).
+
+    Les champs `ids` et `names` sont des séquences indexables de même longueur que `hashes`.
+    `secondary_hashes` associe à chaque empreinte secondaire disponible ("dhash", "ahash",
+    "colorhash") un tableau uint64 aligné sur `hashes`, utilisé par la recherche en cascade.
+
+    La base est partitionnée par extension (`set_ids`, déduits du préfixe des ids s'ils ne sont pas
+    fournis) et par série (`series`, optionnelle). `restrict` retourne une sous-matrice limitée à
+    certaines partitions : la recherche n'y calcule que les distances des cartes retenues.
+
+    `min_separation` (optionnel, voir hash_audit.py) donne pour chaque carte la distance au plus
+    proche pHash d'une carte de nom différent. `acceptance_radii`, le rayon d'acceptation de chaque
+    carte, en est déduit à la construction (`compute_acceptance_radii` et constantes ADAPTIVE_RADIUS_*)
+    s'il n'est pas fourni.
+    """
+
+    def __init__(self, hashes, ids, names, secondary_hashes=None, set_ids=None, series=None, min_separation=None,
+                 acceptance_radii=None):
+        self.hashes = hashes
+        self.ids = ids
+        self.names = names
+        self.secondary_hashes = secondary_hashes or {}
+        self.set_ids = set_ids
+        self.series = series
+        self.min_separation = min_separation
+        if acceptance_radii is None and min_separation is not None:
+            acceptance_radii = compute_acceptance_radii(min_separation)
+        self.acceptance_radii = acceptance_radii
+        self._partition_columns = None
+        self._partition_names = None
+        self._restricted = OrderedDict() # (extensions, séries) -> sous-matrice, de la moins à la plus récente
+        self._restricted_lock = threading.Lock()
+
+    @classmethod
+    def from_hashed_data(cls, hashed_data):
+        """Construit la matrice à partir de la liste retournée par `load_hashed_data`."""
+        hashes = _hex_column(hashed_data, 'hash')
+        ids = [card_entry['id'] for card_entry in hashed_data]
+        names = [card_entry['name'] for card_entry in hashed_data]
+        # Une empreinte secondaire n'est utilisable que si toutes les cartes la possèdent
+        secondary_hashes = {
+            name: _hex_column(hashed_data, name)
+            for name in SECONDARY_HASH_FUNCTIONS
+            if hashed_data and all(name in card_entry for card_entry in hashed_data)
+        }
+        set_ids = [card_entry.get('set_id') or card_set_id(card_entry['id']) for card_entry in hashed_data]
+        # Les anciens fichiers JSON ne contiennent pas la série
+        series = None
+        if any(card_entry.get('series') for card_entry in hashed_data):
+            series = [card_entry.get('series') or "" for card_entry in hashed_data]
+        min_separation = None
+        if hashed_data and all('min_separation' in card_entry for card_entry in hashed_data):
+            min_separation = np.array([card_entry['min_separation'] for card_entry in hashed_data], dtype=np.uint8)
+        return cls(hashes, ids, names, secondary_hashes, set_ids, series, min_separation)
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def entry(self, index):
+        """
+        Retourne le dictionnaire de carte (même format que le JSON) pour l'index donné.
+        Seule cette ligne est décodée (les tables de chaînes mappées ne sont pas parcourues).
+        """
+        card_id = self.ids[index]
+        card_entry = {
+            "id": card_id,
+            "name": self.names[index],
+            "hash": uint64_to_hex(self.hashes[index]),
+            "set_id": str(self.set_ids[index]) if self.set_ids is not None else card_set_id(card_id),
+        }
+        if self.series is not None:
+            card_entry["series"] = str(self.series[index])
+        if self.min_separation is not None:
+            card_entry["min_separation"] = int(self.min_separation[index])
+        if self.acceptance_radii is not None:
+            card_entry["acceptance_radius"] = int(self.acceptance_radii[index])
+        return card_entry
+
+    def partition_columns(self):
+        """
+        Colonnes (extension, série) sous forme de tableaux NumPy de chaînes, construites une seule
+        fois. La série vaut None si la base ne la contient pas.
+        """
+        if self._partition_columns is None:
+            set_ids = self.set_ids if self.set_ids is not None else [card_set_id(card_id) for card_id in self.ids]
+            series = np.array(list(self.series), dtype=str) if self.series is not None else None
+            self._partition_columns = (np.array(list(set_ids), dtype=str), series)
+        return self._partition_columns
+
+    def partition_names(self):
+        """Noms (ensembles) des extensions et des séries présentes dans la base, calculés une seule fois."""
+        if self._partition_names is None:
+            set_id_column, series_column = self.partition_columns()
+            self._partition_names = (frozenset(np.unique(set_id_column).tolist()),
+                                     frozenset(np.unique(series_column).tolist()) if series_column is not None else None)
+        return self._partition_names
+
+    def partitions(self, by="set_id"):
+        """Nombre de cartes par partition : {extension: nombre} ou, avec by="series", {série: nombre}."""
+        set_id_column, series_column = self.partition_columns()
+        column = series_column if by == "series" else set_id_column
+        if column is None:
+            return {}
+        values, counts = np.unique(column, return_counts=True)
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def partition_indices(self, set_ids=None, series=None):
+        """Index (croissants) des cartes appartenant à l'une des extensions et à l'une des séries données."""
+        set_id_column, series_column = self.partition_columns()
+        mask = np.ones(len(self), dtype=bool)
+        if set_ids:
+            mask &= np.isin(set_id_column, list(set_ids))
+        if series:
+            if series_column is None:
+                raise ValueError("La base de hachages ne contient pas la série des cartes.")
+            mask &= np.isin(series_column, list(series))
+        return np.flatnonzero(mask)
+
+    def restrict(self, set_ids=None, series=None):
+        """
+        Sous-matrice limitée aux extensions `set_ids` et/ou aux séries `series` (sans filtre : la
+        matrice elle-même). Les colonnes de hashes sont copiées une fois, de façon contiguë, puis
+        la sous-matrice est conservée pour les appels suivants : le coût d'une recherche devient
+        proportionnel au nombre de cartes des partitions retenues. Seules les `RESTRICTED_CACHE_SIZE`
+        sous-matrices les plus récemment utilisées sont conservées.
+
+        Raises:
+            ValueError: Si une extension ou une série demandée n'existe pas dans la base.
+        """
+        if not set_ids and not series:
+            return self
+        key = (frozenset(set_ids or ()), frozenset(series or ()))
+        with self._restricted_lock:
+            restricted = self._restricted.get(key)
+            if restricted is not None:
+                self._restricted.move_to_end(key)
+                return restricted
+        known_set_ids, known_series = self.partition_names()
+        unknown_set_ids = key[0] - known_set_ids
+        if unknown_set_ids:
+            raise ValueError(f"Extensions inconnues dans la base : {', '.join(sorted(unknown_set_ids))}")
+        if key[1] and known_series is not None and key[1] - known_series:
+            raise ValueError(f"Séries inconnues dans la base : {', '.join(sorted(key[1] - known_series))}")
+        indices = self.partition_indices(set_ids, series)
+        set_id_column, series_column = self.partition_columns()
+        restricted = HashMatrix(
+            np.ascontiguousarray(self.hashes[indices]),
+            _IndexedView(self.ids, indices),
+            _IndexedView(self.names, indices),
+            {name: np.ascontiguousarray(column[indices]) for name, column in self.secondary_hashes.items()},
+            set_id_column[indices],
+            series_column[indices] if series_column is not None else None,
+            self.min_separation[indices] if self.min_separation is not None else None,
+            self.acceptance_radii[indices] if self.acceptance_radii is not None else None,
+        )
+        with self._restricted_lock:
+            self._restricted[key] = restricted
+            while len(self._restricted) > RESTRICTED_CACHE_SIZE:
+                self._restricted.popitem(last=False)
+        return restricted
+
+    def distances(self, query_hash):
+        """Distances de Hamming entre un hash requête et toutes les cartes de la base."""
+        return hamming_distances(hash_to_uint64(query_hash), self.hashes)
+
+    def distance_matrix(self, query_hashes):
+        """
+        Distances de Hamming entre N hashes requêtes et toutes les cartes de la base,
+        calculées en une seule opération matricielle (tableau N x len(self)).
+        """
+        queries = np.array([hash_to_uint64(query_hash) for query_hash in query_hashes], dtype=np.uint64)
+        return popcount64(np.bitwise_xor(queries[:, None], self.hashes[None, :]))
+
+    def best_matches(self, query_hashes, max_hamming_distance=10):
+        """Version par lot de `best_match` : une liste de (index, distance) dans l'ordre des requêtes."""
+        if len(query_hashes) == 0:
+            return []
+        if len(self.hashes) == 0:
+            return [(None, None)] * len(query_hashes)
+        distances = self.distance_matrix(query_hashes)
+        best_indices = np.argmin(distances, axis=1)
+        smallest_distances = distances[np.arange(len(best_indices)), best_indices]
+        results = []
+        for best_index, smallest_distance in zip(best_indices.tolist(), smallest_distances.tolist()):
+            if smallest_distance <= max_hamming_distance:
+                results.append((best_index, smallest_distance))
+            else:
+                results.append((None, smallest_distance))
+        return results
+
+    def cascade_match(self, query_fingerprints, max_hamming_distance=10, shortlist_size=CASCADE_SHORTLIST_SIZE):
+        """
+        Recherche en cascade : le pHash (vectorisé sur toute la base) sélectionne au plus
+        `shortlist_size` candidats à distance <= `max_hamming_distance`, puis seuls ces candidats
+        sont re-classés par un score combinant le pHash et les empreintes secondaires disponibles.
+        Cela départage les collisions et quasi-égalités du pHash sans comparer toutes les empreintes
+        à toute la base.
+
+        Args:
+            query_fingerprints (dict): Résultat de `compute_fingerprints` pour l'image requête.
+
+        Returns:
+            tuple: (index ou None, distance pHash de la carte retenue ou meilleure distance pHash)
+        """
+        if len(self.hashes) == 0:
+            return None, None
+        return self._cascade_rerank(self.distances(query_fingerprints["hash"]), query_fingerprints,
+                                    max_hamming_distance, shortlist_size)
+
+    def cascade_matches(self, queries_fingerprints, max_hamming_distance=10, shortlist_size=CASCADE_SHORTLIST_SIZE):
+        """Version par lot de `cascade_match` : une seule matrice de distances pHash pour toutes les requêtes."""
+        if len(queries_fingerprints) == 0:
+            return []
+        if len(self.hashes) == 0:
+            return [(None, None)] * len(queries_fingerprints)
+        distances = self.distance_matrix([query_fingerprints["hash"] for query_fingerprints in queries_fingerprints])
+        return [self._cascade_rerank(phash_distances, query_fingerprints, max_hamming_distance, shortlist_size)
+                for phash_distances, query_fingerprints in zip(distances, queries_fingerprints)]
+
+    def _cascade_rerank(self, phash_distances, query_fingerprints, max_hamming_distance, shortlist_size):
+        candidates, candidate_distances, _ = self.ranked_candidates(
+            phash_distances, shortlist_size, query_fingerprints, shortlist_size)
+        accepted = np.flatnonzero(candidate_distances <= max_hamming_distance)
+        if len(accepted) == 0:
+            return None, int(phash_distances.min())
+        return int(candidates[accepted[0]]), int(candidate_distances[accepted[0]])
+
+    def ranked_candidates(self, phash_distances, k, query_fingerprints=None, shortlist_size=CASCADE_SHORTLIST_SIZE):
+        """
+        Les k meilleurs candidats pour un tableau de distances pHash, par tri partiel (argpartition)
+        plutôt que par tri complet de la base.
+
+        Sans `query_fingerprints`, le score est la distance pHash. Avec `query_fingerprints` et des
+        empreintes secondaires dans la base, les max(k, shortlist_size) meilleurs candidats pHash sont
+        re-classés par le score combiné de la cascade (exprimé en bits de pHash).
+        Les égalités sont départagées par la distance pHash puis par l'ordre de la base.
+
+        Returns:
+            tuple: (indices, distances pHash, scores), triés du meilleur au moins bon.
+        """
+        use_secondary = bool(query_fingerprints) and bool(self.secondary_hashes)
+        candidate_count = min(max(k, shortlist_size) if use_secondary else k, len(phash_distances))
+        if candidate_count <= 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty, np.empty(0, dtype=np.float64)
+        candidates = np.argpartition(phash_distances, candidate_count - 1)[:candidate_count]
+        # Inclure toutes les cartes à égalité avec le dernier candidat, pour respecter l'ordre de la base
+        boundary_distance = phash_distances[candidates].max()
+        if np.count_nonzero(phash_distances <= boundary_distance) > candidate_count:
+            candidates = np.flatnonzero(phash_distances <= boundary_distance)
+
+        candidate_distances = phash_distances[candidates]
+        scores = candidate_distances.astype(np.float64)
+        if use_secondary:
+            for name, column in self.secondary_hashes.items():
+                if name not in query_fingerprints:
+                    continue
+                secondary_distances = hamming_distances(hash_to_uint64(query_fingerprints[name]), column[candidates])
+                scores += SECONDARY_HASH_WEIGHTS[name] * secondary_distances * (64.0 / SECONDARY_HASH_BITS[name])
+
+        # Meilleur score, puis plus petite distance pHash, puis premier index de la base
+        order = np.lexsort((candidates, candidate_distances, scores))[:k]
+        return candidates[order], candidate_distances[order], scores[order]
+
+    def best_match(self, query_hash, max_hamming_distance=10):
+        """
+        Retourne (index, distance) de la carte la plus proche, ou (None, distance) si la
+        meilleure distance dépasse `max_hamming_distance`. En cas d'égalité, la première
+        carte de la base est retenue, comme dans la boucle Python d'origine.
+        """
+        if len(self.hashes) == 0:
+            return None, None
+        distances = self.distances(query_hash)
+        best_index = int(np.argmin(distances))
+        smallest_distance = int(distances[best_index])
+        if smallest_distance <= max_hamming_distance:
+            return best_index, smallest_distance
+        return None, smallest_distance
+
+
+class _IndexedView:
+    """Vue en lecture d'une séquence (liste, StringTable...) limitée à certains index."""
+
+    def __init__(self, sequence, indices):
+        self._sequence = sequence
+        self._indices = indices
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, index):
+        return self._sequence[int(self._indices[index])]
+
+    def __iter__(self):
+        for index in self._indices:
+            yield self._sequence[int(index)]
+
+
+def _hex_column(hashed_data, key):
+    return np.fromiter(
+        (int(card_entry[key], 16) for card_entry in hashed_data),
+        dtype=np.uint64,
+        count=len(hashed_data),
+    )
@@ -0,0 +1,146 @@
+# hash_reloader.py
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+
+from hash_database import convert_json_to_binary, load_hash_database, load_hash_matrix
+from scanner_logging import get_logger
+
+POLL_INTERVAL_SECONDS = 2.0 # Fréquence de vérification du fichier de base
+STABLE_POLLS_BEFORE_RELOAD = 2 # Le fichier doit être inchangé sur N vérifications (écriture terminée)
+
+logger = get_logger(__name__)
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _convert_in_subprocess(json_path, binary_path):
+    """
+    Convertit le JSON au format binaire dans un processus séparé : l'analyse du JSON et l'audit
+    des séparations minimales (environ 2 s pour 18 000 cartes) ne tiennent pas le GIL du processus
+    qui sert les requêtes, qui ne subit donc pas de pic de latence.
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=convert_json_to_binary, args=(json_path, binary_path), name="hash-db-convert", daemon=True)
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"Échec de la conversion de '{json_path}' (code {process.exitcode}).")
+
+
+def warm_hash_matrix(hash_matrix):
+    """Parcourt les colonnes mappées en mémoire pour charger leurs pages avant la mise en service."""
+    for column in (hash_matrix.hashes, *hash_matrix.secondary_hashes.values()):
+        np.bitwise_xor.reduce(np.asarray(column))
+
+
+class ReloadingHashDatabase:
+    """
+    Base de hachages rechargée à chaud quand son fichier JSON change (double tampon).
+
+    Un thread surveille le fichier ; quand il a changé et que l'écriture est terminée, la nouvelle
+    base est construite entièrement à côté de l'ancienne (conversion binaire dans un processus
+    séparé, chargement mappé en mémoire, préchauffage des pages), puis `current` est remplacé par
+    une seule affectation. Les lecteurs lisent `current` une fois par requête : une requête en cours
+    garde la base avec laquelle elle a commencé, et aucune ne voit de table à moitié chargée.
+    En cas d'erreur (JSON invalide...), l'ancienne base reste en service.
+    """
+
+    def __init__(self, json_path, binary_path=None, poll_interval=POLL_INTERVAL_SECONDS, on_reload=None):
+        self.json_path = json_path
+        self.binary_path = binary_path
+        self.poll_interval = poll_interval
+        self.on_reload = on_reload
+        self.current = load_hash_matrix(json_path, binary_path)
+        self.previous = None
+        self.generation = 1
+        self.reload_count = 0
+        self.reload_errors = 0
+        self.last_reload_seconds = None
+        self._loaded_signature = _file_signature(json_path)
+        self._pending_signature = None
+        self._stable_polls = 0
+        self._stop = threading.Event()
+        self._reload_lock = threading.Lock()
+        self._thread = None
+
+    def __len__(self):
+        return len(self.current)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name="hash-db-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.poll_interval + 1.0)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check_for_update()
+            except Exception:
+                logger.exception("Erreur lors de la surveillance de '%s'", self.json_path)
+
+    def check_for_update(self):
+        """
+        Vérifie le fichier et recharge la base s'il a changé et n'est plus en cours d'écriture.
+
+        Returns:
+            bool: Vrai si une nouvelle base a été mise en service.
+        """
+        signature = _file_signature(self.json_path)
+        if signature is None or signature == self._loaded_signature:
+            self._pending_signature, self._stable_polls = None, 0
+            return False
+        if signature != self._pending_signature:
+            self._pending_signature, self._stable_polls = signature, 1
+        else:
+            self._stable_polls += 1
+        if self._stable_polls < STABLE_POLLS_BEFORE_RELOAD:
+            return False
+        return self.reload(signature)
+
+    def reload(self, signature=None):
+        """Construit la nouvelle base puis l'échange avec la base courante."""
+        with self._reload_lock:
+            signature = signature or _file_signature(self.json_path)
+            started_at = time.perf_counter()
+            try:
+                if self.binary_path:
+                    _convert_in_subprocess(self.json_path, self.binary_path)
+                    new_hash_matrix = load_hash_database(self.binary_path)
+                else:
+                    new_hash_matrix = load_hash_matrix(self.json_path)
+                warm_hash_matrix(new_hash_matrix)
+            except Exception as e:
+                self.reload_errors += 1
+                # Ne pas réessayer en boucle sur le même fichier invalide
+                self._loaded_signature = signature
+                logger.error("Rechargement de '%s' impossible, l'ancienne base reste en service : %s",
+                             self.json_path, e)
+                return False
+
+            self.previous, self.current = self.current, new_hash_matrix
+            self._loaded_signature = signature
+            self._pending_signature, self._stable_polls = None, 0
+            self.generation += 1
+            self.reload_count += 1
+            self.last_reload_seconds = time.perf_counter() - started_at
+        logger.info("Base de hachages rechargée", extra={"fields": {
+            "cards": len(new_hash_matrix), "generation": self.generation,
+            "duration_ms": round(self.last_reload_seconds * 1000, 1)}})
+        if self.on_reload is not None:
+            self.on_reload(new_hash_matrix)
+        return True
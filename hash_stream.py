@@ -0,0 +1,118 @@
+# hash_stream.py
+import json
+import os
+import sys
+import time
+
+HASH_STREAM_PATH = "pokemon_card_hashes_from_db.jsonl"
+CHECKPOINT_EVERY_N_CARDS = 200 # Nombre de cartes entre deux synchronisations sur disque
+CHECKPOINT_EVERY_SECONDS = 10.0 # Délai maximal entre deux synchronisations sur disque
+
+
+class HashStreamWriter:
+    """
+    Écrit les cartes hachées au fil de l'eau dans un fichier JSON Lines (une carte par ligne, en ajout).
+
+    Le fichier est synchronisé sur disque (flush + fsync) toutes les `checkpoint_every` cartes ou
+    `checkpoint_seconds` secondes : un arrêt brutal ne perd au plus que le dernier intervalle.
+    """
+
+    def __init__(self, path=HASH_STREAM_PATH, resume=False, checkpoint_every=CHECKPOINT_EVERY_N_CARDS,
+                 checkpoint_seconds=CHECKPOINT_EVERY_SECONDS):
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_seconds = checkpoint_seconds
+        self.written_count = 0
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        if resume:
+            _truncate_partial_last_line(path)
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def write(self, hashed_card):
+        self._file.write(json.dumps(hashed_card, ensure_ascii=False) + "\n")
+        self.written_count += 1
+        self._since_checkpoint += 1
+        if (self._since_checkpoint >= self.checkpoint_every
+                or time.monotonic() - self._last_checkpoint >= self.checkpoint_seconds):
+            self.checkpoint()
+
+    def checkpoint(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+
+    def close(self):
+        if not self._file.closed:
+            self.checkpoint()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _truncate_partial_last_line(path):
+    """Supprime une éventuelle dernière ligne incomplète (écriture interrompue) avant de reprendre."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as f:
+        content = f.read()
+        if content and not content.endswith(b"\n"):
+            f.truncate(content.rfind(b"\n") + 1)
+
+
+def read_hash_stream(path=HASH_STREAM_PATH):
+    """Lit les cartes d'un fichier JSON Lines en ignorant les lignes incomplètes ou invalides."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def read_streamed_card_ids(path=HASH_STREAM_PATH):
+    """Ensemble des ids de cartes déjà présents dans le flux (pour le mode --resume)."""
+    return {hashed_card['id'] for hashed_card in read_hash_stream(path)}
+
+
+def compact_hash_stream(stream_path, output_json_path, merge_existing=False):
+    """
+    Compacte le flux JSON Lines en un fichier JSON au format lu par `load_hashed_data`.
+
+    Une carte présente plusieurs fois garde sa dernière valeur. Avec `merge_existing`, les cartes
+    du fichier de sortie existant absentes du flux sont conservées. L'écriture est atomique.
+
+    Returns:
+        int: Le nombre de cartes écrites.
+    """
+    hashed_cards_by_id = {}
+    if merge_existing and os.path.exists(output_json_path):
+        with open(output_json_path, 'r') as f:
+            for card_entry in json.load(f):
+                hashed_cards_by_id[card_entry['id']] = card_entry
+    for hashed_card in read_hash_stream(stream_path):
+        hashed_cards_by_id[hashed_card['id']] = hashed_card
+
+    temporary_path = f"{output_json_path}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(list(hashed_cards_by_id.values()), f, indent=4)
+    os.replace(temporary_path, output_json_path)
+    return len(hashed_cards_by_id)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage : python hash_stream.py <flux.jsonl> <sortie.json>")
+        sys.exit(1)
+    compacted_count = compact_hash_stream(sys.argv[1], sys.argv[2])
+    print(f"{compacted_count} cartes compactées vers '{sys.argv[2]}'.")
@@ -0,0 +1,348 @@
+# identification_service.py
+"""
+Service HTTP local d'identification de cartes, avec la base de hachages chargée une seule fois.
+
+Points d'entrée :
+    POST /identify        Corps : l'image brute (JPEG, PNG...). Photo complète : détection ->
+                          redressement -> identification de chaque carte.
+    POST /identify?crop=1 Corps : une carte déjà recadrée et redressée, identifiée directement.
+                          Paramètres optionnels sets=base1,base2 et series=Base : recherche limitée
+                          à ces extensions / séries (voir search_partitions.py).
+    GET  /health          État du service et taille de la base.
+    GET  /metrics         Métriques au format texte Prometheus (voir scanner_metrics.py).
+
+Les empreintes sont calculées dans le thread de chaque requête ; les correspondances des requêtes
+simultanées sont regroupées par un `MatchBatcher` en une seule passe vectorisée sur la base.
+
+    python identification_service.py --port 8765
+    curl --data-binary @data_for_testing/binder1.png http://127.0.0.1:8765/identify
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from detect_card import detect_card_boxes
+from card_warper import warp_card_to_standard_ratio
+from card_identifier import compute_query_fingerprints, match_fingerprints_batch, TOP_K_MATCHES
+from hash_reloader import ReloadingHashDatabase
+from search_partitions import SearchScope
+from scanner_metrics import metrics
+from scanner_logging import get_logger, configure_logging, RateLimitedLogger
+
+HASHED_CARDS_JSON_PATH = "pokemon_card_hashes.json"
+HASHED_CARDS_BINARY_PATH = "pokemon_card_hashes.bin"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+RESIZE_HEIGHT_FOR_DETECTION = 1000
+HAMMING_THRESHOLD = 14
+MIN_CONFIDENCE_MARGIN = 2
+USE_CASCADE = True
+ADAPTIVE_THRESHOLDS = False # Rayons d'acceptation par carte (hash_audit.py) : optionnels, moins de top-1 que le seuil 14
+MAX_BATCH_SIZE = 64 # Requêtes (cartes) au plus par passe de correspondance
+MAX_BATCH_WAIT_MS = 2.0 # Attente maximale pour regrouper des requêtes simultanées
+MAX_REQUEST_BYTES = 20 * 1024 * 1024
+
+logger = get_logger(__name__)
+rate_limited_logger = RateLimitedLogger(logger)
+
+
+class MatchBatcher:
+    """
+    Regroupe les correspondances demandées par des threads concurrents.
+
+    Un thread unique prend la première demande en attente, y ajoute celles qui arrivent pendant
+    au plus `max_wait_ms` (ou jusqu'à `max_batch_size` cartes), puis calcule une seule matrice de
+    distances pour tout le lot. `hash_matrix` n'est lu qu'une fois par lot : il peut être remplacé
+    à chaud sans que le lot en cours mélange deux bases. Les demandes limitées à un même périmètre
+    (SearchScope) sont traitées ensemble, sur la sous-matrice de ce périmètre.
+    """
+
+    def __init__(self, hash_matrix, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS,
+                 k=TOP_K_MATCHES, max_hamming_distance=HAMMING_THRESHOLD, min_margin=MIN_CONFIDENCE_MARGIN,
+                 cascade=USE_CASCADE, adaptive_thresholds=ADAPTIVE_THRESHOLDS):
+        self.hash_matrix = hash_matrix
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.match_options = {"k": k, "max_hamming_distance": max_hamming_distance, "min_margin": min_margin,
+                              "cascade": cascade, "adaptive_thresholds": adaptive_thresholds}
+        self.batches = 0
+        self.batched_queries = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="match-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def cascade(self):
+        return self.match_options["cascade"] and bool(self.hash_matrix.secondary_hashes)
+
+    def submit(self, queries_fingerprints, scope=None):
+        """Met en file les empreintes d'une requête ; retourne un Future de la liste des résultats."""
+        future = Future()
+        if not queries_fingerprints:
+            future.set_result([])
+            return future
+        self._queue.put((queries_fingerprints, future, scope))
+        return future
+
+    def match(self, queries_fingerprints, timeout=None, scope=None):
+        return self.submit(queries_fingerprints, scope).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2.0)
+
+    def _collect_batch(self, first_item):
+        batch = [first_item]
+        query_count = len(first_item[0])
+        deadline = time.monotonic() + self.max_wait
+        while query_count < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None) # Arrêt traité après ce lot
+                break
+            batch.append(item)
+            query_count += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            first_item = self._queue.get()
+            if first_item is None:
+                return
+            batch = self._collect_batch(first_item)
+            hash_matrix = self.hash_matrix
+            batch_by_scope = {}
+            for item in batch:
+                scope = item[2]
+                batch_by_scope.setdefault(scope.key if scope else None, []).append(item)
+            for scope_batch in batch_by_scope.values():
+                self._match_batch(hash_matrix, scope_batch)
+
+    def _match_batch(self, hash_matrix, batch):
+        queries_fingerprints = [fingerprints for item in batch for fingerprints in item[0]]
+        try:
+            results = match_fingerprints_batch(queries_fingerprints, hash_matrix, scope=batch[0][2],
+                                               **self.match_options)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.batched_queries += len(queries_fingerprints)
+        metrics.increment("match_batches")
+        metrics.increment("match_batch_queries", len(queries_fingerprints))
+        offset = 0
+        for item_queries, future, _ in batch:
+            future.set_result(results[offset:offset + len(item_queries)])
+            offset += len(item_queries)
+
+
+def _serialize_match(match_result):
+    best = match_result["best"]
+    return {
+        "accepted": match_result["accepted"],
+        "best": {"id": best["id"], "name": best["name"], "set_id": best["set_id"]} if best else None,
+        "distance": match_result["distance"],
+        "acceptance_threshold": match_result["acceptance_threshold"],
+        "margin": round(float(match_result["margin"]), 3),
+        "confidence": round(float(match_result["confidence"]), 3),
+        "candidates": [{"id": card_entry["id"], "name": card_entry["name"], "distance": card_entry["distance"],
+                        "score": round(float(card_entry["score"]), 3)}
+                       for card_entry in match_result["matches"]],
+    }
+
+
+class IdentificationService:
+    """Pipeline d'identification partagé par toutes les requêtes HTTP."""
+
+    def __init__(self, hash_matrix, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS,
+                 resize_height=RESIZE_HEIGHT_FOR_DETECTION):
+        self.batcher = MatchBatcher(hash_matrix, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.resize_height = resize_height
+        self.started_at = time.time()
+        self.requests_served = 0
+        self.hash_database = None # ReloadingHashDatabase éventuelle, pour l'état du service
+
+    def swap_hash_matrix(self, hash_matrix):
+        """Met en service une nouvelle base : le lot de correspondances en cours garde l'ancienne."""
+        self.batcher.hash_matrix = hash_matrix
+
+    def identify(self, image_bytes, crop=False, scope=None):
+        """
+        Identifie les cartes d'une image encodée.
+
+        Args:
+            image_bytes (bytes): Contenu du fichier image.
+            crop (bool): L'image est une carte déjà recadrée : pas de détection ni de redressement.
+            scope (SearchScope): Limite la recherche à certaines extensions / séries.
+
+        Returns:
+            dict: {"cards": [{"quad": coins ou None, "match": ...}], "timings_ms": {...}}
+        """
+        timings = {}
+        started_at = time.perf_counter()
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Image illisible.")
+        timings["decode"] = time.perf_counter() - started_at
+
+        card_quads = []
+        pil_cards = []
+        if crop:
+            card_quads.append(None)
+            pil_cards.append(Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
+        else:
+            started_at = time.perf_counter()
+            with metrics.timer("detection"):
+                card_corners_list = detect_card_boxes(image, resize_height=self.resize_height)
+            timings["detect"] = time.perf_counter() - started_at
+            started_at = time.perf_counter()
+            for corners in card_corners_list:
+                warped_card = warp_card_to_standard_ratio(image, corners)
+                if warped_card is not None:
+                    card_quads.append(corners.tolist())
+                    pil_cards.append(Image.fromarray(cv2.cvtColor(warped_card, cv2.COLOR_BGR2RGB)))
+            timings["warp"] = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        cascade = self.batcher.cascade
+        with metrics.timer("hashing"):
+            queries_fingerprints = [compute_query_fingerprints(pil_card, cascade) for pil_card in pil_cards]
+        timings["hash"] = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        match_results = self.batcher.match(queries_fingerprints, scope=scope)
+        timings["match"] = time.perf_counter() - started_at
+
+        self.requests_served += 1
+        return {
+            "cards": [{"quad": quad, "match": _serialize_match(match_result)}
+                      for quad, match_result in zip(card_quads, match_results)],
+            "timings_ms": {stage: round(duration * 1000, 2) for stage, duration in timings.items()},
+        }
+
+    def health(self):
+        return {
+            "status": "ok",
+            "cards_in_database": len(self.batcher.hash_matrix),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests_served": self.requests_served,
+            "match_batches": self.batcher.batches,
+            "batched_queries": self.batcher.batched_queries,
+            "database_generation": self.hash_database.generation if self.hash_database else 1,
+            "database_reloads": self.hash_database.reload_count if self.hash_database else 0,
+        }
+
+
+class IdentificationRequestHandler(BaseHTTPRequestHandler):
+    server_version = "PokemonCardIdentifier/1.0"
+    protocol_version = "HTTP/1.1" # Connexions persistantes pour le client de charge
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, self.server.service.health())
+        elif path == "/metrics":
+            body = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "Ressource inconnue."})
+
+    def do_POST(self):
+        parsed_url = urlparse(self.path)
+        if parsed_url.path != "/identify":
+            self._send_json(404, {"error": "Ressource inconnue."})
+            return
+        content_length = int(self.headers.get("Content-Length") or 0)
+        if content_length <= 0 or content_length > MAX_REQUEST_BYTES:
+            self._send_json(400 if content_length <= 0 else 413, {"error": "Corps de requête absent ou trop volumineux."})
+            return
+        image_bytes = self.rfile.read(content_length)
+        query = parse_qs(parsed_url.query)
+        crop = query.get("crop", ["0"])[0] in ("1", "true", "yes")
+        scope = SearchScope(query.get("sets", [None])[0], query.get("series", [None])[0])
+        try:
+            with metrics.timer("request"):
+                response = self.server.service.identify(image_bytes, crop=crop, scope=scope or None)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            rate_limited_logger.error("Erreur lors de l'identification", error=str(e))
+            self._send_json(500, {"error": "Erreur interne."})
+            return
+        self._send_json(200, response)
+
+    def log_message(self, format, *args):
+        # Une ligne par requête : seulement en DEBUG
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), IdentificationRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP local d'identification de cartes Pokémon.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--database", default=HASHED_CARDS_JSON_PATH, help="Base de hachages JSON.")
+    parser.add_argument("--binary", default=HASHED_CARDS_BINARY_PATH, help="Version binaire (générée si absente).")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-batch-wait-ms", type=float, default=MAX_BATCH_WAIT_MS)
+    parser.add_argument("--no-reload", action="store_true",
+                        help="Ne pas recharger la base quand le fichier JSON change.")
+    args = parser.parse_args()
+    configure_logging()
+    metrics.enable()
+
+    hash_database = ReloadingHashDatabase(args.database, args.binary)
+    service = IdentificationService(hash_database.current, max_batch_size=args.max_batch_size,
+                                    max_wait_ms=args.max_batch_wait_ms)
+    service.hash_database = hash_database
+    if not args.no_reload:
+        hash_database.on_reload = service.swap_hash_matrix
+        hash_database.start()
+    server = create_server(service, args.host, args.port)
+    logger.info("Service d'identification prêt sur http://%s:%d (%d cartes en base).",
+                args.host, args.port, len(hash_database))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Arrêt du service...")
+    finally:
+        server.server_close()
+        service.batcher.close()
+        hash_database.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,299 @@
 # main_live_scanner.py
+import threading
+
 import cv2
 import numpy as np
 from PIL import Image # Pour convertir l'image OpenCV en PIL pour l'identificateur
 
 from detect_card import detect_card_boxes
 from card_warper import warp_card_to_standard_ratio
-from card_identifier import load_hashed_data, find_matching_card
+from card_identifier import find_top_matches_batch
+from hash_database import load_hash_matrix
+from hash_reloader import ReloadingHashDatabase
+from scanner_pipeline import open_frame_source, run_pipeline, PROCESSING_WORKERS
+from card_tracker import CardTracker
+from adaptive_scheduler import AdaptiveScheduler, TARGET_FPS, LATENCY_BUDGET_MS
+from overlay_renderer import OverlayRenderer
+from search_partitions import SearchScope, SessionPrior
+from scanner_metrics import metrics
+from scanner_logging import get_logger, configure_logging, RateLimitedLogger
 
 # --- Paramètres ---
 CAMERA_INDEX = 0 # Essayez 0, 1, etc. si votre webcam par défaut n'est pas la bonne
-RESIZE_HEIGHT_FOR_DETECTION = 1000 # Hauteur pour le traitement de détection
+RESIZE_HEIGHT_FOR_DETECTION = 1000 # Hauteur par défaut pour le traitement de détection (ajustée par le scheduler)
 HAMMING_THRESHOLD = 14
+USE_CASCADE = "auto" # Re-classer avec dHash/aHash/couleur les cartes trop proches d'une autre carte (True : toutes)
+MIN_CONFIDENCE_MARGIN = 2 # Rejeter les correspondances trop proches d'un candidat d'un autre nom
+ADAPTIVE_THRESHOLDS = False # Rayons d'acceptation par carte (hash_audit.py) : optionnels, moins de top-1 que le seuil 14
+MOTION_COMPENSATION = True # Décaler les annotations selon le mouvement estimé entre deux traitements
 HASHED_CARDS_JSON_PATH = "pokemon_card_hashes.json"
+HASHED_CARDS_BINARY_PATH = "pokemon_card_hashes.bin" # Généré depuis le JSON au premier lancement
+HOT_RELOAD = True # Recharger la base en arrière-plan quand le fichier JSON est régénéré
+SCAN_SET_IDS = None # Extensions scannées pendant la session (ex. ["base1", "base2"]), None pour toute la base
+SCAN_SERIES = None # Séries scannées pendant la session (ex. ["Base"]), None pour toutes
+USE_SESSION_PRIOR = True # Favoriser les extensions déjà reconnues pendant la session
 # --- Fin des Paramètres ---
 
-def main():
-    # Charger la base de données de hachages au démarrage
-    card_hash_database = load_hashed_data(HASHED_CARDS_JSON_PATH)
+logger = get_logger(__name__)
+rate_limited_logger = RateLimitedLogger(logger) # Messages émis à chaque image traitée
+
+def load_card_hash_database():
+    """Charge la base de hachages (format binaire mappé en mémoire), ou retourne None en cas d'erreur."""
+    # Format binaire mappé en mémoire : pas d'objet par carte, les pHash restent dans un tableau uint64
+    try:
+        card_hash_database = load_hash_matrix(HASHED_CARDS_JSON_PATH, HASHED_CARDS_BINARY_PATH)
+    except (OSError, ValueError) as e:
+        logger.error("Erreur lors du chargement de la base de hachages : %s", e)
+        return None
     if not card_hash_database:
-        print("Impossible de charger la base de données de hachages. Arrêt du scanner.")
-        return
+        return None
+    return card_hash_database
+
+
+def identify_cards_in_frame(frame, card_hash_database, tracker=None, resize_height=RESIZE_HEIGHT_FOR_DETECTION,
+                            scope=None, session_prior=None):
+    """
+    Détecte, redresse et identifie toutes les cartes d'une image.
+
+    Avec un `tracker` (CardTracker), les cartes sont suivies d'une image à l'autre et seules les
+    pistes nouvelles ou déplacées (et, de loin en loin, les pistes peu fiables) sont redressées et
+    ré-identifiées ; les autres réutilisent leur identification en cache. `resize_height` est la hauteur de traitement de la
+    détection (choisie dynamiquement par l'AdaptiveScheduler dans le scanner en direct).
+    `scope` (SearchScope) limite l'identification à certaines extensions / séries et
+    `session_prior` (SessionPrior) favorise les extensions déjà reconnues pendant la session.
+
+    Returns:
+        list: Tuples (coins de la carte à l'échelle de `frame`, résultat de `find_top_matches`).
+    """
+    # 1. Détecter les contours des cartes
+    # La fonction retourne les coins à l'échelle de `frame` (l'image originale de la caméra)
+    with metrics.timer("detection"):
+        detected_card_corners_list = detect_card_boxes(frame, resize_height=resize_height)
+    metrics.increment("frames_processed")
+    metrics.increment("cards_detected", len(detected_card_corners_list))
+
+    if scope:
+        card_hash_database = scope.apply(card_hash_database)
+    if tracker is None:
+        identified = _identify_card_quads(frame, list(enumerate(detected_card_corners_list)), card_hash_database,
+                                          session_prior)
+        return [(corners, match_result) for _, corners, match_result in identified]
+
+    # Les workers partagent le tracker : les coins à identifier sont copiés sous le verrou avec l'id
+    # de leur piste, et les résultats sont rattachés par id (une autre image peut déplacer la piste entre-temps)
+    with tracker.lock:
+        visible_tracks = tracker.update(detected_card_corners_list)
+        quads_to_identify = [(track.track_id, track.corners) for track in tracker.tracks_to_identify(visible_tracks)]
+    metrics.increment("tracker_identifications_skipped", len(visible_tracks) - len(quads_to_identify))
+    identified = _identify_card_quads(frame, quads_to_identify, card_hash_database, session_prior)
+    with tracker.lock:
+        tracks_by_id = {track.track_id: track for track in tracker.tracks}
+        for track_id, corners, match_result in identified:
+            track = tracks_by_id.get(track_id)
+            if track is not None:
+                tracker.store_identification(track, match_result, corners)
+        return [(track.corners, track.match_result) for track in visible_tracks if track.match_result is not None]
+
+
+def _identify_card_quads(frame, keyed_card_corners, card_hash_database, session_prior=None):
+    """
+    Redresse et identifie (en un seul lot) les cartes dont les coins sont donnés.
+
+    Args:
+        keyed_card_corners (list): Couples (clé, coins) ; la clé est rendue avec le résultat.
+
+    Returns:
+        list: Triplets (clé, coins, résultat de `find_top_matches`) des cartes redressées.
+    """
+    # 2. Redresser toutes les cartes détectées
+    warped_quads = []
+    pil_warped_cards = []
+    for key, corners in keyed_card_corners:
+        warped_card_cv = warp_card_to_standard_ratio(frame, corners)
+
+        if warped_card_cv is not None:
+            # Convertir l'image redressée (OpenCV BGR) en PIL Image (RGB)
+            try:
+                with metrics.timer("pil_conversion"):
+                    pil_warped_card = Image.fromarray(cv2.cvtColor(warped_card_cv, cv2.COLOR_BGR2RGB))
+            except Exception as e:
+                rate_limited_logger.warning("Erreur de conversion OpenCV vers PIL", error=str(e))
+                continue
+            warped_quads.append((key, corners))
+            pil_warped_cards.append(pil_warped_card)
+        # else:
+            # print("Échec du redressement d'une carte détectée.")
+
+    # 3. Identifier toutes les cartes en une seule passe sur la base
+    match_results = find_top_matches_batch(
+        pil_warped_cards,
+        card_hash_database,
+        max_hamming_distance=HAMMING_THRESHOLD,
+        min_margin=MIN_CONFIDENCE_MARGIN,
+        cascade=USE_CASCADE,
+        session_prior=session_prior,
+        adaptive_thresholds=ADAPTIVE_THRESHOLDS,
+    )
+    return [(key, corners, match_result) for (key, corners), match_result in zip(warped_quads, match_results)]
+
 
-    cap = cv2.VideoCapture(CAMERA_INDEX)
-    if not cap.isOpened():
-        print(f"Erreur : Impossible d'ouvrir la caméra (index {CAMERA_INDEX}).")
+def draw_identification_results(display_frame, identification_results):
+    """Dessine les contours et les noms des cartes identifiées sur `display_frame`."""
+    for corners, match_result in identification_results:
+        identified_card = match_result["best"]
+        # Dessiner le contour de la carte détectée
+        cv2.drawContours(display_frame, [corners.astype(np.int32)], -1, (0, 255, 0), 2)
+
+        text_to_display = "Inconnue"
+        text_color = (0, 0, 255) # Rouge pour inconnue
+        if match_result["matches"] and match_result["distance"] <= match_result["acceptance_threshold"]:
+            # Assez proche mais trop peu de marge avec un autre candidat : ne pas afficher un mauvais nom
+            text_to_display = "Ambigue"
+            text_color = (0, 165, 255) # Orange pour ambiguë
+
+        if identified_card:
+            text_to_display = f"{identified_card['name']} (ID: {identified_card['id']}) {match_result['confidence']:.0%}"
+            #text_to_display += f"\n{reason}" # Peut être trop long pour l'affichage
+            text_color = (255, 100, 0) # Bleu pour identifiée
+
+
+        # Afficher le texte près du coin supérieur gauche de la carte détectée
+        # (x,y) du premier coin (après réorganisation, ce sera le coin en haut à gauche)
+        # Pour plus de simplicité, utilisons la boîte englobante des coins pour positionner le texte
+        rect_x, rect_y, rect_w, rect_h = cv2.boundingRect(corners.astype(np.int32))
+
+        # Mettre le texte sur plusieurs lignes si nécessaire
+        y0, dy = rect_y - 10, 18 # Position initiale Y et espacement vertical
+        for i, line in enumerate(text_to_display.split('\n')):
+            y_pos = y0 + i * dy
+            # S'assurer que le texte ne sort pas en haut de l'écran
+            if y_pos < 15 : y_pos = 15 + i * dy
+
+            cv2.putText(display_frame, line, (rect_x, y_pos),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1, cv2.LINE_AA)
+
+
+def main(video_path=None, metrics_path=None, scope=None):
+    if metrics_path:
+        metrics.enable()
+    if scope is None:
+        scope = SearchScope(SCAN_SET_IDS, SCAN_SERIES)
+    # Charger la base de données de hachages au démarrage
+    try:
+        card_hash_database = ReloadingHashDatabase(HASHED_CARDS_JSON_PATH, HASHED_CARDS_BINARY_PATH)
+    except (OSError, ValueError) as e:
+        logger.error("Impossible de charger la base de données de hachages (%s). Arrêt du scanner.", e)
         return
+    if scope:
+        try:
+            scanned_card_count = len(scope.apply(card_hash_database.current))
+        except ValueError as e:
+            logger.error("Périmètre de scan invalide (%s). Arrêt du scanner.", e)
+            return
+        if not scanned_card_count:
+            logger.error("Aucune carte de la base dans le périmètre %s. Arrêt du scanner.", scope)
+            return
+        logger.info("Recherche limitée à une partie de la base", extra={"fields": {
+            "set_ids": scope.set_ids, "series": scope.series, "cards": scanned_card_count,
+            "total": len(card_hash_database)}})
+    session_prior = SessionPrior() if USE_SESSION_PRIOR else None
 
-    print("\nScanner en direct démarré. Appuyez sur 'q' pour quitter.")
-    print(f"Utilisation des seuils : Hamming <= {HAMMING_THRESHOLD}, Départage Perso <= {CUSTOM_TIEBREAK_THRESHOLD}")
-
-    frame_count = 0
-    processing_interval = 3 # Traiter une image sur N pour alléger (ex: 3 ou 5)
-
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Erreur : Impossible de lire l'image de la caméra.")
-            break
-
-        display_frame = frame.copy() # Copie pour l'affichage avec annotations
-        frame_count += 1
-
-        if frame_count % processing_interval == 0: # Traiter périodiquement
-            # 1. Détecter les contours des cartes
-            # La fonction retourne les coins à l'échelle de `frame` (l'image originale de la caméra)
-            detected_card_corners_list = detect_card_boxes(frame, resize_height=RESIZE_HEIGHT_FOR_DETECTION)
-            print(detected_card_corners_list)
-
-            for corners in detected_card_corners_list:
-                # 2. Redresser la carte
-                warped_card_cv = warp_card_to_standard_ratio(frame, corners)
-
-                if warped_card_cv is not None:
-                    # Convertir l'image redressée (OpenCV BGR) en PIL Image (RGB)
-                    try:
-                        pil_warped_card = Image.fromarray(cv2.cvtColor(warped_card_cv, cv2.COLOR_BGR2RGB))
-                    except Exception as e:
-                        print(f"Erreur de conversion OpenCV vers PIL: {e}")
-                        continue
-
-                    # 3. Identifier la carte
-                    identified_card = find_matching_card(
-                        pil_warped_card,
-                        card_hash_database,
-                        max_hamming_distance=HAMMING_THRESHOLD,
-                        #max_custom_distance_for_tiebreak=CUSTOM_TIEBREAK_THRESHOLD
-                    )
-
-                    # 4. Afficher les résultats sur `display_frame`
-                    # Dessiner le contour de la carte détectée
-                    cv2.drawContours(display_frame, [corners.astype(np.int32)], -1, (0, 255, 0), 2)
-
-                    text_to_display = "Inconnue"
-                    text_color = (0, 0, 255) # Rouge pour inconnue
-
-                    if identified_card:
-                        text_to_display = f"{identified_card['name']} (ID: {identified_card['id']})"
-                        #text_to_display += f"\n{reason}" # Peut être trop long pour l'affichage
-                        text_color = (255, 100, 0) # Bleu pour identifiée
-                        print(f"  Identifié: {identified_card['name']}")
-
-
-                    # Afficher le texte près du coin supérieur gauche de la carte détectée
-                    # (x,y) du premier coin (après réorganisation, ce sera le coin en haut à gauche)
-                    # Pour plus de simplicité, utilisons la boîte englobante des coins pour positionner le texte
-                    rect_x, rect_y, rect_w, rect_h = cv2.boundingRect(corners.astype(np.int32))
-                    
-                    # Mettre le texte sur plusieurs lignes si nécessaire
-                    y0, dy = rect_y - 10, 18 # Position initiale Y et espacement vertical
-                    for i, line in enumerate(text_to_display.split('\n')):
-                        y_pos = y0 + i * dy
-                        # S'assurer que le texte ne sort pas en haut de l'écran
-                        if y_pos < 15 : y_pos = 15 + i * dy
-
-                        cv2.putText(display_frame, line, (rect_x, y_pos),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, text_color, 1, cv2.LINE_AA)
-                # else:
-                    # print("Échec du redressement d'une carte détectée.")
+    source, source_fps = open_frame_source(CAMERA_INDEX, video_path)
+    if source is None:
+        if video_path:
+            logger.error("Impossible d'ouvrir la vidéo '%s'.", video_path)
         else:
-            # Si on ne traite pas, on peut quand même redessiner les dernières détections
-            # pour une sensation plus fluide, mais cela complexifie.
-            # Pour l'instant, on affiche juste le frame sans nouvelles détections.
-            pass
+            logger.error("Impossible d'ouvrir la caméra (index %s).", CAMERA_INDEX)
+        return
+
+    logger.info("Scanner en direct démarré. Appuyez sur 'q' pour quitter, sur espace pour forcer le traitement.",
+                extra={"fields": {"hamming_threshold": HAMMING_THRESHOLD, "min_margin": MIN_CONFIDENCE_MARGIN}})
+
+    # Suivi des cartes : une carte immobile n'est identifiée qu'une fois
+    tracker = CardTracker()
+    if HOT_RELOAD:
+        # Nouvelle base : les identifications en cache du tracker sont refaites avec elle
+        card_hash_database.on_reload = lambda hash_matrix: tracker.invalidate_identifications()
+        card_hash_database.start()
+    # Fréquence de traitement et hauteur de détection ajustées au coût mesuré de chaque traitement
+    scheduler = AdaptiveScheduler(target_fps=min(source_fps, TARGET_FPS), latency_budget_ms=LATENCY_BUDGET_MS,
+                                  workers=PROCESSING_WORKERS)
 
+    # Pipeline : un thread de capture garde la dernière image, un pool de workers la traite
+    # (détection, redressement, identification) et la boucle d'affichage tourne à la cadence de la caméra
+    # en dessinant le résultat le plus récent disponible.
+    # Les annotations du dernier résultat sont dessinées une seule fois dans un overlay réutilisé,
+    # puis recopiées (et décalées selon le mouvement de la caméra) sur chaque image affichée
+    overlay_renderer = OverlayRenderer(draw_identification_results, motion_compensation=MOTION_COMPENSATION)
+    force_processing = threading.Event()
+
+    def display(frame_id, frame, latest_result):
+        display_frame = overlay_renderer.compose(frame, frame_id, latest_result)
 
         cv2.imshow("Scanner de Cartes Pokémon en Direct", display_frame)
 
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'):
-            print("Arrêt du scanner...")
-            break
+            logger.info("Arrêt du scanner...")
+            return False
         elif key == ord(' '): # Barre d'espace pour forcer le traitement
-            print("Traitement forcé de l'image...")
-            frame_count = 0 # Pour que le prochain `if` soit vrai
-
+            logger.info("Traitement forcé de l'image...")
+            # Ré-identifier aussi les cartes immobiles déjà en cache dans le tracker
+            tracker.invalidate_identifications()
+            force_processing.set()
+        return True
 
-    cap.release()
+    pipeline_metrics = run_pipeline(
+        source,
+        # `current` est relu à chaque image : la base rechargée est utilisée dès l'image suivante
+        lambda frame: identify_cards_in_frame(frame, card_hash_database.current, tracker, scheduler.resize_height,
+                                              scope, session_prior),
+        on_display=display,
+        workers=PROCESSING_WORKERS,
+        realtime=video_path is not None,
+        fps=source_fps,
+        scheduler=scheduler,
+        force_processing=force_processing,
+    )
     cv2.destroyAllWindows()
+    card_hash_database.stop()
+
+    logger.info("Images traitées : %d (%.1f/s), abandonnées : %d, affichées : %.1f/s",
+                pipeline_metrics['frames_processed'], pipeline_metrics['processing_fps'],
+                pipeline_metrics['frames_dropped'], pipeline_metrics['display_fps'])
+    logger.info("Latence capture -> résultat : p50 %.0f ms, p95 %.0f ms",
+                pipeline_metrics['latency_p50_ms'], pipeline_metrics['latency_p95_ms'])
+    logger.info("Scheduler : une image sur %d traitée, détection à %d px, coût moyen %.0f ms",
+                pipeline_metrics['scheduler_processing_interval'], pipeline_metrics['scheduler_resize_height'],
+                pipeline_metrics['scheduler_average_cost_ms'])
+    logger.info("Identifications : %d effectuées, %d évitées grâce au suivi",
+                tracker.identifications_requested, tracker.identifications_skipped)
+    if session_prior is not None and session_prior.observation_count:
+        logger.info("Extensions les plus vues : %s", ", ".join(
+            f"{set_id} ({share:.0%})" for set_id, share in session_prior.top_sets()))
+    if metrics.enabled:
+        for line in metrics.summary_lines():
+            logger.info("Temps par étape : %s", line)
+    if metrics_path:
+        metrics.write(metrics_path)
+        logger.info("Métriques enregistrées dans '%s'.", metrics_path)
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Scanner de cartes Pokémon en direct.")
+    parser.add_argument("--video", help="Lire un fichier vidéo à la place de la webcam.")
+    parser.add_argument("--metrics", help="Mesurer chaque étape et écrire les métriques dans ce fichier "
+                                          "(texte Prometheus si l'extension est .prom, JSON sinon).")
+    parser.add_argument("--sets", help="Limiter la recherche à ces extensions (ids séparés par des virgules, ex. base1,base2).")
+    parser.add_argument("--series", help="Limiter la recherche à ces séries (séparées par des virgules, ex. Base).")
+    args = parser.parse_args()
+    configure_logging()
+
     # Vérifier si le fichier de hachage existe avant de démarrer
     import os
-    if not os.path.exists(HASHED_CARDS_JSON_PATH):
-         print(f"ERREUR CRITIQUE : Le fichier de base de données de hachages '{HASHED_CARDS_JSON_PATH}' est introuvable.")
-         print("Veuillez exécuter le script de hachage de la base de données d'abord.")
+    # Le JSON ou, à défaut, sa version binaire déjà générée suffit
+    if not os.path.exists(HASHED_CARDS_JSON_PATH) and not os.path.exists(HASHED_CARDS_BINARY_PATH):
+         logger.critical("Le fichier de base de données de hachages '%s' est introuvable. "
+                         "Veuillez exécuter le script de hachage de la base de données d'abord.", HASHED_CARDS_JSON_PATH)
     else:
-        main()
\ No newline at end of file
+        main(args.video, args.metrics, SearchScope(args.sets or SCAN_SET_IDS, args.series or SCAN_SERIES))
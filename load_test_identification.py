@@ -0,0 +1,122 @@
+# load_test_identification.py
+"""
+Client de charge pour identification_service.py : envoie des images en parallèle et mesure
+le débit et la latence (p50, p99) des réponses.
+
+    python load_test_identification.py data_for_testing/*.png --concurrency 8 --requests 200
+    python load_test_identification.py carte_recadree.png --crop --duration 30
+"""
+import argparse
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+def run_load_test(url, payloads, concurrency=4, total_requests=100, duration=None, crop=False):
+    """
+    Envoie les images de `payloads` à tour de rôle depuis `concurrency` threads.
+
+    Args:
+        url (str): Adresse du service.
+        payloads (list): Contenus des fichiers images à envoyer.
+        total_requests (int): Nombre total de requêtes (ignoré si `duration` est fourni).
+        duration (float): Durée du test en secondes.
+
+    Returns:
+        dict: Requêtes réussies et en erreur, débit, latences p50 / p99 / max (ms), cartes reçues.
+    """
+    endpoint = f"{url.rstrip('/')}/identify" + ("?crop=1" if crop else "")
+    latencies = []
+    errors = []
+    cards_received = [0]
+    lock = threading.Lock()
+    counter = iter(range(10 ** 12))
+    started_at = time.perf_counter()
+    deadline = started_at + duration if duration else None
+
+    def worker():
+        http_session = requests.Session()
+        while True:
+            with lock:
+                request_index = next(counter)
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    break
+            elif request_index >= total_requests:
+                break
+            payload = payloads[request_index % len(payloads)]
+            request_started_at = time.perf_counter()
+            try:
+                response = http_session.post(endpoint, data=payload, timeout=30,
+                                             headers={"Content-Type": "application/octet-stream"})
+                latency = time.perf_counter() - request_started_at
+                if response.status_code != 200:
+                    raise RuntimeError(f"statut {response.status_code}")
+                card_count = len(response.json()["cards"])
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(latency)
+                cards_received[0] += card_count
+        http_session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+
+    latencies_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests_ok": len(latencies),
+        "requests_failed": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "latency_max_ms": float(latencies_ms.max()),
+        "cards_received": cards_received[0],
+        "first_errors": errors[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client de charge du service d'identification.")
+    parser.add_argument("images", nargs="+", help="Images envoyées à tour de rôle.")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--concurrency", type=int, default=4, help="Requêtes simultanées.")
+    parser.add_argument("--requests", type=int, default=100, help="Nombre total de requêtes.")
+    parser.add_argument("--duration", type=float, help="Durée du test en secondes (remplace --requests).")
+    parser.add_argument("--crop", action="store_true", help="Les images sont des cartes déjà recadrées.")
+    args = parser.parse_args()
+
+    payloads = []
+    for image_path in args.images:
+        with open(image_path, 'rb') as f:
+            payloads.append(f.read())
+    try:
+        requests.get(f"{args.url.rstrip('/')}/health", timeout=5).raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Service injoignable sur {args.url} : {e}")
+        sys.exit(1)
+
+    results = run_load_test(args.url, payloads, args.concurrency, args.requests, args.duration, args.crop)
+    print(f"{results['requests_ok']} requêtes réussies, {results['requests_failed']} en erreur "
+          f"en {results['elapsed_s']:.1f} s")
+    print(f"Débit : {results['throughput_rps']:.1f} requêtes/s ({results['cards_received']} cartes identifiées)")
+    print(f"Latence : p50 {results['latency_p50_ms']:.1f} ms, p99 {results['latency_p99_ms']:.1f} ms, "
+          f"max {results['latency_max_ms']:.1f} ms")
+    for error in results["first_errors"]:
+        print(f"  Erreur : {error}")
+
+
+if __name__ == "__main__":
+    main()
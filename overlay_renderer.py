@@ -0,0 +1,91 @@
+# overlay_renderer.py
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+MOTION_ESTIMATION_WIDTH = 320 # Largeur des miniatures utilisées pour estimer le mouvement
+MIN_MOTION_PIXELS = 1.0 # En dessous de ce déplacement, l'overlay n'est pas décalé
+MIN_MOTION_RESPONSE = 0.1 # Confiance minimale de la corrélation de phase pour appliquer le décalage
+THUMBNAIL_HISTORY = 60 # Nombre d'images récentes dont on garde la miniature
+
+
+class OverlayRenderer:
+    """
+    Tampon des derniers résultats d'identification, redessinés sur chaque image affichée.
+
+    Les annotations (contours, noms, confiance) ne sont dessinées qu'une fois par nouveau résultat,
+    dans une image d'overlay réutilisable accompagnée de son masque ; chaque image affichée n'a plus
+    qu'à recevoir une copie masquée de l'overlay. Les étiquettes ne clignotent donc plus entre deux
+    traitements, quelle que soit la fréquence de traitement.
+
+    Avec `motion_compensation=True`, la translation entre l'image traitée et l'image affichée est
+    estimée par corrélation de phase sur des miniatures, et l'overlay est décalé en conséquence.
+    """
+
+    def __init__(self, draw_results, motion_compensation=True):
+        self.draw_results = draw_results
+        self.motion_compensation = motion_compensation
+        self.overlay = None
+        self.mask = None
+        self.result_frame_id = None
+        self._reference_thumbnail = None
+        self._thumbnails = OrderedDict()
+        self._thumbnail_scale = 1.0
+
+    def _thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        self._thumbnail_scale = min(1.0, MOTION_ESTIMATION_WIDTH / width)
+        small = cv2.resize(frame, (int(width * self._thumbnail_scale), int(height * self._thumbnail_scale)),
+                           interpolation=cv2.INTER_AREA)
+        return np.float32(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+
+    def _render(self, frame_shape, identification_results):
+        if self.overlay is None or self.overlay.shape != frame_shape:
+            self.overlay = np.zeros(frame_shape, dtype=np.uint8)
+            self.mask = np.zeros(frame_shape[:2], dtype=bool)
+        else:
+            self.overlay.fill(0)
+        self.draw_results(self.overlay, identification_results)
+        np.any(self.overlay != 0, axis=2, out=self.mask)
+
+    def compose(self, frame, frame_id, latest_result):
+        """
+        Retourne l'image à afficher : `frame` avec l'overlay du dernier résultat disponible.
+
+        Args:
+            frame (numpy.ndarray): Image capturée à afficher (non modifiée).
+            frame_id (int): Numéro de cette image dans le flux de capture.
+            latest_result (tuple): (frame_id, résultats, horodatage) du pool de traitement, ou None.
+        """
+        current_thumbnail = None
+        if self.motion_compensation:
+            current_thumbnail = self._thumbnail(frame)
+            self._thumbnails[frame_id] = current_thumbnail
+            while len(self._thumbnails) > THUMBNAIL_HISTORY:
+                self._thumbnails.popitem(last=False)
+
+        if latest_result is not None and latest_result[0] != self.result_frame_id:
+            self.result_frame_id, identification_results, _ = latest_result
+            self._render(frame.shape, identification_results)
+            self._reference_thumbnail = self._thumbnails.get(self.result_frame_id)
+
+        display_frame = frame.copy()
+        if self.overlay is None or not self.mask.any():
+            return display_frame
+
+        shift_x = shift_y = 0
+        if current_thumbnail is not None and self._reference_thumbnail is not None:
+            (motion_x, motion_y), response = cv2.phaseCorrelate(self._reference_thumbnail, current_thumbnail)
+            motion_x, motion_y = motion_x / self._thumbnail_scale, motion_y / self._thumbnail_scale
+            if response >= MIN_MOTION_RESPONSE and np.hypot(motion_x, motion_y) >= MIN_MOTION_PIXELS:
+                shift_x, shift_y = int(round(motion_x)), int(round(motion_y))
+
+        # Décalage entier par découpage : aucune nouvelle image d'overlay n'est allouée
+        height, width = frame.shape[:2]
+        if abs(shift_x) >= width or abs(shift_y) >= height:
+            return display_frame
+        destination = (slice(max(shift_y, 0), height + min(shift_y, 0)), slice(max(shift_x, 0), width + min(shift_x, 0)))
+        source = (slice(max(-shift_y, 0), height + min(-shift_y, 0)), slice(max(-shift_x, 0), width + min(-shift_x, 0)))
+        np.copyto(display_frame[destination], self.overlay[source], where=self.mask[source][..., None])
+        return display_frame
@@ -0,0 +1,138 @@
+# scanner_logging.py
+"""
+Journalisation structurée du projet (module standard `logging`).
+
+- Chaque module obtient son logger avec `get_logger(__name__)` (enfants de "pokemon_scanner").
+- Les points d'entrée appellent `configure_logging()` : niveau et format lus dans les variables
+  d'environnement POKEMON_SCANNER_LOG_LEVEL (INFO par défaut) et POKEMON_SCANNER_LOG_FORMAT
+  ("text" par défaut, ou "json" : un objet JSON par ligne).
+- Les champs structurés passent par `extra={"fields": {...}}` et sont ajoutés en `clé=valeur`
+  (ou en clés JSON).
+- Les messages émis à chaque image ou à chaque carte passent par un `RateLimitedLogger`, qui en
+  laisse passer au plus quelques-uns par intervalle et compte ceux qui ont été supprimés.
+
+Les messages utilisent le formatage différé de `logging` ("... %s", valeur) : rien n'est formaté
+si le niveau n'est pas actif.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+LOGGER_ROOT_NAME = "pokemon_scanner"
+LOG_LEVEL_ENV_VAR = "POKEMON_SCANNER_LOG_LEVEL"
+LOG_FORMAT_ENV_VAR = "POKEMON_SCANNER_LOG_FORMAT"
+RATE_LIMIT_INTERVAL_SECONDS = 5.0 # Fenêtre de la limite de débit des messages répétitifs
+RATE_LIMIT_BURST = 1 # Messages autorisés par fenêtre et par type de message
+
+
+def get_logger(name):
+    """Retourne le logger du module `name` (ex. get_logger(__name__))."""
+    if name == "__main__":
+        name = os.path.splitext(os.path.basename(sys.argv[0]))[0] or "main"
+    return logging.getLogger(f"{LOGGER_ROOT_NAME}.{name}")
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formate les enregistrements en texte `clé=valeur` ou en JSON, avec les champs structurés."""
+
+    def __init__(self, json_format=False):
+        super().__init__()
+        self.json_format = json_format
+
+    def format(self, record):
+        fields = getattr(record, "fields", None) or {}
+        logger_name = record.name[len(LOGGER_ROOT_NAME) + 1:] if record.name.startswith(LOGGER_ROOT_NAME + ".") else record.name
+        if self.json_format:
+            entry = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": logger_name,
+                "msg": record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry["exc"] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {logger_name}: {record.getMessage()}"
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure_logging(level=None, json_format=None):
+    """
+    Installe (une seule fois) le handler de la hiérarchie "pokemon_scanner" sur la sortie d'erreur.
+
+    Args:
+        level (str | int): Niveau minimal ; par défaut POKEMON_SCANNER_LOG_LEVEL ou INFO.
+        json_format (bool): Une ligne JSON par message ; par défaut selon POKEMON_SCANNER_LOG_FORMAT.
+    """
+    root_logger = logging.getLogger(LOGGER_ROOT_NAME)
+    if level is None:
+        level = os.environ.get(LOG_LEVEL_ENV_VAR, "INFO").upper()
+    if json_format is None:
+        json_format = os.environ.get(LOG_FORMAT_ENV_VAR, "text").lower() == "json"
+    root_logger.setLevel(level)
+    for handler in root_logger.handlers:
+        if getattr(handler, "_pokemon_scanner_handler", False):
+            handler.setFormatter(StructuredFormatter(json_format))
+            return root_logger
+    handler = logging.StreamHandler()
+    handler.setFormatter(StructuredFormatter(json_format))
+    handler._pokemon_scanner_handler = True
+    root_logger.addHandler(handler)
+    root_logger.propagate = False
+    return root_logger
+
+
+class RateLimitedLogger:
+    """
+    Enveloppe d'un logger pour les messages répétitifs (par image, par carte) : pour chaque
+    gabarit de message, au plus `burst` messages par fenêtre de `interval` secondes. Le nombre
+    de messages supprimés est ajouté au suivant (champ `suppressed`).
+
+    Le niveau est testé en premier : un message désactivé ne coûte ni verrou ni formatage.
+    """
+
+    def __init__(self, logger, interval=RATE_LIMIT_INTERVAL_SECONDS, burst=RATE_LIMIT_BURST):
+        self.logger = logger
+        self.interval = interval
+        self.burst = burst
+        self._windows = {} # gabarit -> [début de fenêtre, messages émis, messages supprimés]
+        self._lock = threading.Lock()
+
+    def log(self, level, msg, *args, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(msg)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window is not None else 0
+                window = self._windows[msg] = [now, 0, 0]
+            else:
+                suppressed = 0
+            if window[1] >= self.burst:
+                window[2] += 1
+                return
+            window[1] += 1
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self.logger.log(level, msg, *args, extra={"fields": fields})
+
+    def debug(self, msg, *args, **fields):
+        self.log(logging.DEBUG, msg, *args, **fields)
+
+    def info(self, msg, *args, **fields):
+        self.log(logging.INFO, msg, *args, **fields)
+
+    def warning(self, msg, *args, **fields):
+        self.log(logging.WARNING, msg, *args, **fields)
+
+    def error(self, msg, *args, **fields):
+        self.log(logging.ERROR, msg, *args, **fields)
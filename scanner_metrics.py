@@ -0,0 +1,201 @@
+# scanner_metrics.py
+"""
+Instrumentation légère du pipeline de scan : chronomètres par étape, compteurs, jauges
+(valeurs courantes, ex. décisions du scheduler) et histogrammes, exportables en texte Prometheus ou en JSON.
+
+La mesure est désactivée par défaut (ou activée avec la variable d'environnement
+POKEMON_SCANNER_METRICS=1, ou `metrics.enable()`). Désactivée, `metrics.timer(...)` retourne un
+chronomètre vide partagé et `metrics.increment(...)` retourne immédiatement : le coût se limite
+à un test de booléen par appel.
+
+    from scanner_metrics import metrics
+
+    with metrics.timer("matching"):
+        ...
+    metrics.increment("cards_detected", len(card_corners_list))
+    metrics.set_gauge("scheduler_processing_interval", 3)
+"""
+import bisect
+import json
+import os
+import threading
+import time
+
+METRICS_ENV_VAR = "POKEMON_SCANNER_METRICS"
+METRIC_PREFIX = "pokemon_scanner"
+# Bornes supérieures (secondes) des seaux des histogrammes de durée
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Histogramme cumulatif à seaux fixes (même sémantique que les histogrammes Prometheus)."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1) # Dernier seau : au-delà de la plus grande borne
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Quantile approché : borne supérieure du seau qui contient le q-ième échantillon."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.bucket_counts)),
+        }
+
+
+class _NullTimer:
+    """Chronomètre sans effet, retourné quand la mesure est désactivée."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, registry, name):
+        self._registry = registry
+        self._name = name
+        self._started_at = 0.0
+
+    def __enter__(self):
+        self._started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._registry.observe(self._name, time.perf_counter() - self._started_at)
+        return False
+
+
+class MetricsRegistry:
+    """Compteurs, jauges et histogrammes de durée, partagés entre threads."""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def timer(self, name):
+        """Context manager qui ajoute la durée du bloc (secondes) à l'histogramme `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def increment(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Remplace la valeur courante de la jauge `name` (lisible à tout moment, pas seulement en fin d'exécution)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """Retourne {"counters": {...}, "gauges": {...}, "durations_seconds": {nom: résumé de l'histogramme}}."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "durations_seconds": {name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """Exporte les métriques au format texte d'exposition Prometheus."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric_name = f"{METRIC_PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric_name} counter")
+                lines.append(f"{metric_name} {value}")
+            for name, value in sorted(self.gauges.items()):
+                metric_name = f"{METRIC_PREFIX}_{name}"
+                lines.append(f"# TYPE {metric_name} gauge")
+                lines.append(f"{metric_name} {value}")
+            if self.histograms:
+                metric_name = f"{METRIC_PREFIX}_stage_duration_seconds"
+                lines.append(f"# TYPE {metric_name} histogram")
+            for name, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric_name}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric_name}_bucket{{stage="{name}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric_name}_sum{{stage="{name}"}} {histogram.sum}')
+                lines.append(f'{metric_name}_count{{stage="{name}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Écrit les métriques dans `path` : texte Prometheus pour une extension .prom, JSON sinon."""
+        content = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        with open(path, 'w') as f:
+            f.write(content)
+
+    def summary_lines(self):
+        """Lignes lisibles (une par étape) pour un affichage en fin d'exécution."""
+        snapshot = self.snapshot()
+        lines = [f"{name}: {durations['count']} appels, p50 {durations['p50'] * 1000:.1f} ms, "
+                 f"p95 {durations['p95'] * 1000:.1f} ms, total {durations['sum']:.2f} s"
+                 for name, durations in sorted(snapshot["durations_seconds"].items())]
+        lines.extend(f"{name}: {value}" for name, value in sorted(snapshot["counters"].items()))
+        lines.extend(f"{name}: {value}" for name, value in sorted(snapshot["gauges"].items()))
+        return lines
+
+
+# Registre global du processus
+metrics = MetricsRegistry(enabled=os.environ.get(METRICS_ENV_VAR, "") not in ("", "0"))
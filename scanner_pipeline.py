@@ -0,0 +1,272 @@
+# scanner_pipeline.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from scanner_metrics import metrics
+from scanner_logging import get_logger, RateLimitedLogger
+
+rate_limited_logger = RateLimitedLogger(get_logger(__name__))
+
+PROCESSING_WORKERS = 2 # Nombre de frames traitées en parallèle (OpenCV relâche le GIL)
+LATENCY_WINDOW = 200 # Nombre de mesures conservées pour les percentiles de latence
+
+
+class LatestFrameCapture:
+    """
+    Thread de capture qui lit la source en continu et ne garde que la dernière image :
+    le tampon de la caméra ne s'accumule jamais, même si le traitement prend du retard.
+
+    `source` est tout objet exposant `read()` -> (ret, frame) et `release()` (cv2.VideoCapture).
+    Avec `realtime=True`, la lecture est cadencée sur `fps` : un fichier vidéo se comporte alors
+    comme une caméra (les images non consommées à temps sont perdues).
+    """
+
+    def __init__(self, source, realtime=False, fps=None):
+        self.source = source
+        self.frame_interval = 1.0 / fps if realtime and fps else 0.0
+        self.frames_captured = 0
+        self.finished = threading.Event()
+        self._latest = None
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        next_frame_time = time.monotonic()
+        while not self._stop.is_set():
+            ret, frame = self.source.read()
+            if not ret:
+                break
+            with self._condition:
+                self.frames_captured += 1
+                self._latest = (self.frames_captured, frame, time.monotonic())
+                self._condition.notify_all()
+            if self.frame_interval:
+                next_frame_time += self.frame_interval
+                delay = next_frame_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        self.finished.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def read_latest(self, after_frame_id=0, timeout=1.0):
+        """
+        Attend une image plus récente que `after_frame_id` et retourne (frame_id, frame, horodatage),
+        ou None si la source est terminée ou si le délai expire.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (self._latest is not None and self._latest[0] > after_frame_id) or self.finished.is_set(),
+                timeout=timeout)
+            if self._latest is not None and self._latest[0] > after_frame_id:
+                return self._latest
+            return None
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.source.release()
+
+
+class PipelineMetrics:
+    """Compteurs de débit et latence de bout en bout (capture -> résultat disponible) du pipeline."""
+
+    def __init__(self, latency_window=LATENCY_WINDOW):
+        self.started_at = time.monotonic()
+        self.frames_submitted = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0 # Images non soumises à cause de l'intervalle de traitement
+        self.frames_displayed = 0
+        self.latencies = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+
+    def record_processed(self, latency):
+        with self._lock:
+            self.frames_processed += 1
+            self.latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-9)
+            latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+            return {
+                "elapsed_s": elapsed,
+                "frames_submitted": self.frames_submitted,
+                "frames_processed": self.frames_processed,
+                "frames_dropped": self.frames_dropped,
+                "frames_skipped": self.frames_skipped,
+                "frames_displayed": self.frames_displayed,
+                "processing_fps": self.frames_processed / elapsed,
+                "display_fps": self.frames_displayed / elapsed,
+                "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+                "latency_p95_ms": float(np.percentile(latencies, 95) * 1000),
+            }
+
+
+class FrameProcessingPool:
+    """
+    Pool de traitement des images. Une image n'est acceptée que si un worker est libre : sinon elle
+    est abandonnée (comptée dans `frames_dropped`), car une image plus récente arrivera bientôt.
+    Seul le résultat de l'image la plus récente est conservé, même si les workers terminent dans le désordre.
+    """
+
+    def __init__(self, process_frame, workers=PROCESSING_WORKERS, pipeline_metrics=None, scheduler=None):
+        self.process_frame = process_frame
+        self.workers = workers
+        # Compteurs propres à ce pipeline ; `metrics` (scanner_metrics) reste le registre global exporté
+        self.pipeline_metrics = pipeline_metrics or PipelineMetrics()
+        self.scheduler = scheduler
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-worker")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latest_result = None # (frame_id, résultats, horodatage de capture)
+
+    def submit(self, frame_id, frame, captured_at):
+        """Soumet une image si un worker est libre ; retourne False si elle est abandonnée."""
+        with self._lock:
+            if self._in_flight >= self.workers:
+                self.pipeline_metrics.frames_dropped += 1
+                metrics.increment("frames_dropped")
+                return False
+            self._in_flight += 1
+            self.pipeline_metrics.frames_submitted += 1
+        self._executor.submit(self._process, frame_id, frame, captured_at)
+        return True
+
+    def _process(self, frame_id, frame, captured_at):
+        started_at = time.monotonic()
+        try:
+            results = self.process_frame(frame)
+        except Exception as e:
+            rate_limited_logger.error("Erreur lors du traitement d'une image", frame_id=frame_id, error=str(e))
+            results = None
+        processing_seconds = time.monotonic() - started_at
+        metrics.observe("frame_processing", processing_seconds)
+        if self.scheduler is not None:
+            self.scheduler.record(processing_seconds)
+        with self._lock:
+            self._in_flight -= 1
+            if results is not None and (self._latest_result is None or frame_id > self._latest_result[0]):
+                self._latest_result = (frame_id, results, captured_at)
+        if results is not None:
+            self.pipeline_metrics.record_processed(time.monotonic() - captured_at)
+
+    def latest_result(self):
+        """Retourne (frame_id, résultats, horodatage de capture) du traitement le plus récent, ou None."""
+        with self._lock:
+            return self._latest_result
+
+    def idle(self):
+        with self._lock:
+            return self._in_flight == 0
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+def open_frame_source(camera_index=0, video_path=None):
+    """Ouvre la webcam, ou un fichier vidéo à la place (pour les tests et mesures reproductibles)."""
+    source = cv2.VideoCapture(video_path if video_path else camera_index)
+    if not source.isOpened():
+        return None, None
+    fps = source.get(cv2.CAP_PROP_FPS) or 30.0
+    return source, fps
+
+
+def run_pipeline(source, process_frame, on_display=None, workers=PROCESSING_WORKERS, processing_interval=1,
+                 realtime=False, fps=None, scheduler=None, force_processing=None):
+    """
+    Exécute le pipeline capture -> traitement -> affichage jusqu'à la fin de la source.
+
+    Args:
+        source: Source d'images (cv2.VideoCapture ou équivalent).
+        process_frame (callable): Traitement d'une image (exécuté dans le pool de workers).
+        on_display (callable): Appelé à chaque nouvelle image capturée avec
+                               (frame_id, frame, dernier résultat ou None) ; retourne False pour arrêter.
+                               Sans `on_display`, le pipeline tourne sans interface.
+        processing_interval (int): N'essaie de traiter qu'une image capturée sur N.
+        realtime (bool): Cadencer la lecture sur `fps` (fichier vidéo simulant une caméra).
+        scheduler (AdaptiveScheduler): Si fourni, décide de l'intervalle de traitement à partir du coût
+                                       mesuré de chaque traitement (remplace `processing_interval`).
+        force_processing (threading.Event): Si fourni et levé (ex. touche espace), la prochaine image
+                                            capturée est traitée quel que soit l'intervalle ; l'événement
+                                            est baissé dès qu'un worker l'a acceptée.
+
+    Returns:
+        dict: Les métriques finales (voir `PipelineMetrics.snapshot`), plus celles du scheduler.
+    """
+    pipeline_metrics = PipelineMetrics()
+    capture = LatestFrameCapture(source, realtime=realtime, fps=fps).start()
+    pool = FrameProcessingPool(process_frame, workers=workers, pipeline_metrics=pipeline_metrics,
+                               scheduler=scheduler)
+    last_frame_id = 0
+    last_submitted_frame_id = 0
+    try:
+        while True:
+            latest = capture.read_latest(after_frame_id=last_frame_id)
+            if latest is None:
+                if capture.finished.is_set():
+                    break
+                continue
+            frame_id, frame, captured_at = latest
+            last_frame_id = frame_id
+            forced = force_processing is not None and force_processing.is_set()
+            if forced:
+                process = True
+            elif scheduler is not None:
+                process = scheduler.should_process(frame_id - last_submitted_frame_id)
+            else:
+                process = frame_id % processing_interval == 0
+            if not process:
+                pipeline_metrics.frames_skipped += 1
+                metrics.increment("frames_skipped")
+            elif pool.submit(frame_id, frame, captured_at):
+                last_submitted_frame_id = frame_id
+                if forced:
+                    force_processing.clear()
+            pipeline_metrics.frames_displayed += 1
+            if on_display is not None and on_display(frame_id, frame, pool.latest_result()) is False:
+                break
+    finally:
+        capture.stop()
+        pool.shutdown()
+    final_metrics = pipeline_metrics.snapshot()
+    if scheduler is not None:
+        final_metrics.update(scheduler.metrics())
+    return final_metrics
+
+
+if __name__ == "__main__":
+    # Mesure sans interface sur un fichier vidéo : python scanner_pipeline.py video.mp4
+    # (POKEMON_SCANNER_METRICS=1 pour ajouter le temps de chaque étape)
+    import sys
+    from live_scanner import load_card_hash_database, identify_cards_in_frame
+    from adaptive_scheduler import AdaptiveScheduler
+
+    if len(sys.argv) != 2:
+        print("Usage : python scanner_pipeline.py <fichier vidéo>")
+        sys.exit(1)
+    card_hash_database = load_card_hash_database()
+    video_source, video_fps = open_frame_source(video_path=sys.argv[1])
+    if card_hash_database is None or video_source is None:
+        sys.exit(1)
+    frame_scheduler = AdaptiveScheduler(target_fps=video_fps, workers=PROCESSING_WORKERS)
+    final_metrics = run_pipeline(
+        video_source,
+        lambda frame: identify_cards_in_frame(frame, card_hash_database, resize_height=frame_scheduler.resize_height),
+        realtime=True, fps=video_fps, scheduler=frame_scheduler)
+    for metric_name, metric_value in final_metrics.items():
+        print(f"{metric_name}: {metric_value:.2f}" if isinstance(metric_value, float) else f"{metric_name}: {metric_value}")
+    for line in metrics.summary_lines():
+        print(line)
@@ -0,0 +1,132 @@
+# search_partitions.py
+"""
+Recherche limitée à certaines partitions de la base (extensions, séries) et biais de session.
+
+- `SearchScope` restreint une requête, ou toute une session de scan, à un sous-ensemble
+  d'extensions et/ou de séries. La recherche se fait sur la sous-matrice correspondante
+  (`HashMatrix.restrict`) : scanner une seule extension ne compare la requête qu'à ses cartes,
+  ce qui coûte proportionnellement moins cher et écarte les faux positifs des autres extensions.
+- `SessionPrior` favorise les extensions déjà reconnues pendant la session : un petit bonus,
+  proportionnel à la part de l'extension dans les cartes acceptées récemment, est retranché du
+  score des candidats. Il départage des candidats presque à égalité sans jamais exclure une carte.
+"""
+import threading
+
+from hash_matcher import HashMatrix, card_set_id
+
+SESSION_PRIOR_MAX_BONUS = 1.5 # Bonus maximal (en bits de score) pour une extension qui domine la session
+SESSION_PRIOR_DECAY = 0.95 # Poids conservé par les observations passées à chaque nouvelle carte acceptée
+SESSION_PRIOR_MIN_OBSERVATIONS = 3 # Aucun biais tant que la session n'a pas accepté assez de cartes
+
+
+def parse_partition_list(value):
+    """Convertit "base1, base2" (ou une liste) en tuple de noms de partitions, None si vide."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    names = tuple(name.strip() for name in value if name and name.strip())
+    return names or None
+
+
+class SearchScope:
+    """
+    Ensemble de partitions dans lequel chercher : les cartes d'une des extensions `set_ids`
+    et d'une des séries `series` (un critère vide n'est pas filtré).
+    """
+
+    def __init__(self, set_ids=None, series=None):
+        self.set_ids = parse_partition_list(set_ids)
+        self.series = parse_partition_list(series)
+
+    def __bool__(self):
+        return bool(self.set_ids or self.series)
+
+    def __repr__(self):
+        return f"SearchScope(set_ids={self.set_ids}, series={self.series})"
+
+    @property
+    def key(self):
+        """Clé hachable identifiant le périmètre (pour regrouper les requêtes de même périmètre)."""
+        return frozenset(self.set_ids or ()), frozenset(self.series or ())
+
+    def apply(self, hash_matrix):
+        """Retourne la sous-matrice du périmètre (la matrice elle-même si le périmètre est vide)."""
+        if not self:
+            return hash_matrix
+        if not isinstance(hash_matrix, HashMatrix):
+            hash_matrix = HashMatrix.from_hashed_data(hash_matrix)
+        return hash_matrix.restrict(self.set_ids, self.series)
+
+    def contains(self, card_entry):
+        """Vrai si le dictionnaire de carte (format du JSON) appartient au périmètre."""
+        if self.set_ids and (card_entry.get("set_id") or card_set_id(card_entry["id"])) not in self.set_ids:
+            return False
+        if self.series and card_entry.get("series") not in self.series:
+            return False
+        return True
+
+
+class SessionPrior:
+    """
+    Biais automatique vers les extensions déjà vues pendant la session.
+
+    Chaque carte acceptée est comptée pour son extension ; les comptes décroissent d'un facteur
+    `decay` à chaque observation, pour suivre un changement de classeur. Le bonus d'une extension
+    vaut `max_bonus` x sa part des observations. Partagé entre threads.
+    """
+
+    def __init__(self, max_bonus=SESSION_PRIOR_MAX_BONUS, decay=SESSION_PRIOR_DECAY,
+                 min_observations=SESSION_PRIOR_MIN_OBSERVATIONS):
+        self.max_bonus = max_bonus
+        self.decay = decay
+        self.min_observations = min_observations
+        self.observation_count = 0
+        self._weights = {} # extension -> poids décroissant
+        self._total_weight = 0.0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.observation_count = 0
+            self._weights.clear()
+            self._total_weight = 0.0
+
+    def observe(self, card_entry):
+        """Enregistre une carte acceptée (dictionnaire avec "set_id" ou "id")."""
+        set_id = card_entry.get("set_id") or card_set_id(card_entry["id"])
+        with self._lock:
+            for other_set_id in self._weights:
+                self._weights[other_set_id] *= self.decay
+            self._weights[set_id] = self._weights.get(set_id, 0.0) + 1.0
+            self._total_weight = self._total_weight * self.decay + 1.0
+            self.observation_count += 1
+
+    def bonus(self, set_id):
+        """Bonus (en bits de score) accordé aux cartes de l'extension `set_id`."""
+        if self.observation_count < self.min_observations or not self._total_weight:
+            return 0.0
+        return self.max_bonus * self._weights.get(set_id, 0.0) / self._total_weight
+
+    def top_sets(self, count=5):
+        """Les extensions les plus vues récemment : liste de (extension, part des observations)."""
+        with self._lock:
+            if not self._total_weight:
+                return []
+            shares = sorted(((weight / self._total_weight, set_id) for set_id, weight in self._weights.items()),
+                            reverse=True)
+        return [(set_id, share) for share, set_id in shares[:count]]
+
+    def apply(self, matches):
+        """
+        Retranche le bonus de chaque candidat de son "score" (champ "prior_bonus" ajouté) et
+        re-trie les candidats : meilleur score, puis plus petite distance pHash.
+        """
+        if self.observation_count < self.min_observations:
+            return matches
+        for card_entry in matches:
+            prior_bonus = self.bonus(card_entry["set_id"])
+            if prior_bonus:
+                card_entry["score"] -= prior_bonus
+                card_entry["prior_bonus"] = prior_bonus
+        return sorted(matches, key=lambda card_entry: (card_entry["score"], card_entry["distance"]))
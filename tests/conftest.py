@@ -0,0 +1,52 @@
+# tests/conftest.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Les modules du projet sont à la racine du dépôt
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+SYNTHETIC_CARD_COUNT = 300
+SYNTHETIC_SET_IDS = ("base1", "base2", "sm9", "sv3pt5", "swsh1")
+
+
+def make_hashed_data(card_count=SYNTHETIC_CARD_COUNT, seed=0):
+    """
+    Base de hachages synthétique au format du JSON : hashes aléatoires, plus des réimpressions
+    (même nom, hash proche) et des quasi-collisions (nom différent, hash proche) pour l'audit.
+    """
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2 ** 64, card_count, dtype=np.uint64)
+    names = [f"Carte {index}" for index in range(card_count)]
+    for index in range(0, card_count - 1, 10):
+        flipped_bits = rng.choice(64, size=int(rng.integers(1, 5)), replace=False)
+        hashes[index + 1] = hashes[index] ^ np.uint64(sum(1 << int(bit) for bit in flipped_bits))
+        if index % 20 == 0:
+            names[index + 1] = names[index] # Réimpression : même nom
+    hashed_data = []
+    for index in range(card_count):
+        set_id = SYNTHETIC_SET_IDS[index % len(SYNTHETIC_SET_IDS)]
+        hashed_data.append({
+            "id": f"{set_id}-{index}",
+            "name": names[index],
+            "series": "Sun & Moon" if set_id.startswith("sm") else "Other",
+            "hash": f"{int(hashes[index]):016x}",
+            "dhash": f"{int(rng.integers(0, 2 ** 63)):016x}",
+            "ahash": f"{int(rng.integers(0, 2 ** 63)):016x}",
+            "colorhash": f"{int(rng.integers(0, 2 ** 42)):011x}",
+        })
+    return hashed_data
+
+
+@pytest.fixture()
+def hashed_data():
+    return make_hashed_data()
+
+
+def hamming(first_hex, second_hex):
+    """Distance de Hamming de référence, en Python pur."""
+    return bin(int(first_hex, 16) ^ int(second_hex, 16)).count("1")
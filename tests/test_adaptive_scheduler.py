@@ -0,0 +1,49 @@
+# tests/test_adaptive_scheduler.py
+"""Décisions du scheduler adaptatif et leur export dans scanner_metrics."""
+import pytest
+
+from adaptive_scheduler import MAX_PROCESSING_INTERVAL, SAMPLES_BEFORE_RESIZE_CHANGE, AdaptiveScheduler
+from scanner_metrics import metrics
+
+
+@pytest.fixture()
+def enabled_metrics():
+    enabled = metrics.enabled
+    metrics.enable()
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+    metrics.enable(enabled)
+
+
+def test_interval_follows_processing_cost():
+    scheduler = AdaptiveScheduler(target_fps=30, workers=2)
+    scheduler.record(0.1)
+    assert scheduler.processing_interval == 2 # ceil(0.1 x 30 / 2)
+    assert not scheduler.should_process(1) and scheduler.should_process(2)
+    for _ in range(50):
+        scheduler.record(5.0)
+    assert scheduler.processing_interval == MAX_PROCESSING_INTERVAL
+
+
+def test_resize_height_changes_after_consecutive_samples():
+    scheduler = AdaptiveScheduler(latency_budget_ms=100)
+    for _ in range(SAMPLES_BEFORE_RESIZE_CHANGE - 1):
+        scheduler.record(0.3)
+    assert scheduler.resize_height == scheduler.resize_height_levels[0]
+    scheduler.record(0.3)
+    assert scheduler.resize_height == scheduler.resize_height_levels[1]
+    for _ in range(SAMPLES_BEFORE_RESIZE_CHANGE):
+        scheduler.record(0.01)
+    assert scheduler.resize_height == scheduler.resize_height_levels[0]
+    assert scheduler.metrics()["scheduler_resize_changes"] == 2
+
+
+def test_decisions_are_exported_as_gauges(enabled_metrics):
+    scheduler = AdaptiveScheduler(target_fps=30, workers=3)
+    assert enabled_metrics.snapshot()["gauges"]["scheduler_workers"] == 3
+    scheduler.record(0.2)
+    gauges = enabled_metrics.snapshot()["gauges"]
+    assert gauges["scheduler_processing_interval"] == 2
+    assert gauges["scheduler_average_cost_ms"] == pytest.approx(200.0)
+    assert "pokemon_scanner_scheduler_processing_interval 2" in enabled_metrics.to_prometheus()
@@ -0,0 +1,24 @@
+# tests/test_adaptive_thresholds.py
+"""Rayons d'acceptation par carte, déduits au chargement de la séparation minimale."""
+import numpy as np
+
+from hash_matcher import HashMatrix, compute_acceptance_radii
+
+
+def test_acceptance_radii_are_clipped_separations():
+    assert compute_acceptance_radii([0, 6, 10, 17, 40]).tolist() == [6, 6, 10, 17, 18]
+    assert compute_acceptance_radii([10], offset=-2, min_radius=4, max_radius=12).tolist() == [8]
+
+
+def test_hash_matrix_derives_radii_from_min_separation():
+    hash_matrix = HashMatrix(np.zeros(3, dtype=np.uint64), ["a-1", "a-2", "a-3"], ["A", "B", "C"],
+                             min_separation=np.array([2, 12, 64], dtype=np.uint8))
+    assert hash_matrix.acceptance_radii.tolist() == [6, 12, 18]
+    assert hash_matrix.entry(1)["acceptance_radius"] == 12
+    assert hash_matrix.restrict(set_ids=["a"]).acceptance_radii.tolist() == [6, 12, 18]
+
+
+def test_no_radii_without_min_separation(hashed_data):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    assert hash_matrix.acceptance_radii is None
+    assert "acceptance_radius" not in hash_matrix.entry(0)
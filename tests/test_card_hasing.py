@@ -0,0 +1,172 @@
+# tests/test_card_hasing.py
+"""
+Pipeline de téléchargement et de hachage contre un serveur HTTP local (http.server), sans accès réseau,
+et lecture par lots de la base de cartes sur une base SQLite de substitution.
+"""
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from card_hasing import Base, PokemonCard, PokemonSet, hash_all_cards_from_db, hash_card_records, iter_card_records
+from hash_matcher import compute_fingerprints
+from hash_stream import HashStreamWriter, read_hash_stream
+
+CARD_COUNT = 6
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """Sert le dossier de test ; "/flaky/<fichier>" répond 503 à la première requête, puis normalement."""
+
+    flaky_requests = {}
+    flaky_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/flaky/"):
+            with self.flaky_lock:
+                attempts = self.flaky_requests[self.path] = self.flaky_requests.get(self.path, 0) + 1
+            if attempts == 1:
+                self.send_error(503)
+                return
+            self.path = self.path[len("/flaky"):]
+        super().do_GET()
+
+
+@pytest.fixture()
+def image_server(tmp_path):
+    """Écrit des images de cartes synthétiques et les sert en HTTP ; retourne (url de base, chemins)."""
+    rng = np.random.default_rng(0)
+    image_paths = []
+    for index in range(CARD_COUNT):
+        pixels = rng.integers(0, 256, (88, 63, 3), dtype=np.uint8)
+        image_path = tmp_path / f"card{index}.png"
+        Image.fromarray(pixels).resize((250, 349)).save(image_path)
+        image_paths.append(image_path)
+    QuietHandler.flaky_requests = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", image_paths
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _hash_all(card_records, **options):
+    options = {"download_workers": 4, "hash_workers": 0, "requests_per_second_per_host": None,
+               "backoff_seconds": 0.0, **options}
+    return dict(hash_card_records(card_records, **options))
+
+
+@pytest.mark.parametrize("hash_workers", [0, 2])
+def test_pipeline_hashes_every_served_image(image_server, hash_workers):
+    base_url, image_paths = image_server
+    card_records = [(f"test1-{index}", f"Carte {index}", f"{base_url}/{image_path.name}")
+                    for index, image_path in enumerate(image_paths)]
+
+    results = _hash_all(card_records, hash_workers=hash_workers)
+
+    assert sorted(results) == list(range(len(card_records)))
+    for position, hashed_card in results.items():
+        card_id, card_name, _ = card_records[position]
+        expected = compute_fingerprints(Image.open(image_paths[position]))
+        assert hashed_card == {"id": card_id, "name": card_name, "set_id": "test1", **expected}
+
+
+def test_pipeline_skips_missing_images_and_records_without_url(image_server):
+    base_url, image_paths = image_server
+    card_records = [
+        ("test1-0", "Présente", f"{base_url}/{image_paths[0].name}"),
+        ("test1-1", "Absente", f"{base_url}/absente.png"),
+        ("test1-2", "Sans URL", None),
+        ("test1-3", "Présente aussi", f"{base_url}/{image_paths[3].name}", "test1", "Série de test"),
+    ]
+
+    results = _hash_all(card_records)
+
+    assert sorted(results) == [0, 3]
+    assert results[3]["series"] == "Série de test"
+
+
+def test_pipeline_retries_transient_errors(image_server):
+    base_url, image_paths = image_server
+    card_records = [(f"test1-{index}", f"Carte {index}", f"{base_url}/flaky/{image_path.name}")
+                    for index, image_path in enumerate(image_paths)]
+
+    results = _hash_all(card_records, max_retries=1)
+
+    assert sorted(results) == list(range(len(card_records)))
+    assert all(attempts == 2 for attempts in QuietHandler.flaky_requests.values())
+
+
+def test_pipeline_gives_up_after_max_retries(image_server):
+    base_url, image_paths = image_server
+    card_records = [("test1-0", "Carte 0", f"{base_url}/flaky/{image_paths[0].name}")]
+
+    assert _hash_all(card_records, max_retries=0) == {}
+
+
+@pytest.fixture()
+def card_database(tmp_path, image_server):
+    """
+    Base SQLite au schéma de la base de cartes : une extension connue, une carte d'une extension absente
+    de pokemon_sets et une carte sans extension. Retourne (engine, ids des cartes).
+    """
+    base_url, image_paths = image_server
+    engine = create_engine(f"sqlite:///{tmp_path / 'cartes.db'}")
+    Base.metadata.create_all(engine)
+    set_ids = ["test1", "test1", "test1", "test1", "promo", None]
+    card_ids = [f"{set_id or 'noset'}-{index}" for index, set_id in enumerate(set_ids)]
+    with sessionmaker(bind=engine)() as session:
+        session.add(PokemonSet(id="test1", name="Extension de test", series="Série de test"))
+        session.add_all(PokemonCard(id=card_id, name=f"Carte {index}", set_id=set_ids[index],
+                                    image_url_large=f"{base_url}/{image_paths[index].name}")
+                        for index, card_id in enumerate(card_ids))
+        session.commit()
+    yield engine, card_ids
+    engine.dispose()
+
+
+def test_card_records_are_read_in_batches_with_sets_outer_joined(card_database):
+    engine, card_ids = card_database
+    with sessionmaker(bind=engine)() as session:
+        card_records = list(iter_card_records(session, batch_size=2))
+
+    assert [card_record[0] for card_record in card_records] == sorted(card_ids)
+    series_by_id = {card_record[0]: card_record[4] for card_record in card_records}
+    assert series_by_id["test1-0"] == "Série de test"
+    # Cartes sans extension connue : conservées par la jointure externe, sans série
+    assert series_by_id["promo-4"] is None and series_by_id["noset-5"] is None
+
+
+def test_every_database_card_is_hashed_into_the_stream(card_database, tmp_path):
+    engine, card_ids = card_database
+    stream_path = str(tmp_path / "stream.jsonl")
+
+    assert hash_all_cards_from_db(engine, stream_path) == len(card_ids)
+
+    hashed_cards = {hashed_card["id"]: hashed_card for hashed_card in read_hash_stream(stream_path)}
+    assert sorted(hashed_cards) == sorted(card_ids)
+    assert (hashed_cards["test1-0"]["set_id"], hashed_cards["test1-0"]["series"]) == ("test1", "Série de test")
+    assert hashed_cards["promo-4"]["set_id"] == "promo" and "series" not in hashed_cards["promo-4"]
+    assert hashed_cards["noset-5"]["set_id"] == "noset"
+
+
+def test_resume_skips_cards_already_streamed(card_database, tmp_path):
+    engine, card_ids = card_database
+    stream_path = str(tmp_path / "stream.jsonl")
+    with HashStreamWriter(stream_path) as stream_writer:
+        stream_writer.write({"id": "test1-0", "name": "Carte 0", "hash": "0" * 16})
+
+    assert hash_all_cards_from_db(engine, stream_path, resume=True) == len(card_ids) - 1
+    assert sorted(hashed_card["id"] for hashed_card in read_hash_stream(stream_path)) == sorted(card_ids)
@@ -0,0 +1,107 @@
+# tests/test_card_tracker.py
+"""Suivi des cartes d'une image à l'autre et cache des identifications."""
+import numpy as np
+import pytest
+
+from card_tracker import (CardTracker, MAX_UNRELIABLE_RETRY_INTERVAL, UNRELIABLE_RETRY_INTERVAL, corner_displacement,
+                          quad_iou)
+
+ACCEPTED = {"accepted": True, "confidence": 0.4}
+LOW_CONFIDENCE = {"accepted": True, "confidence": 0.05}
+REJECTED = {"accepted": False, "confidence": 0.0}
+
+
+def _quad(x, y, width=63, height=88):
+    return np.array([[x, y], [x + width, y], [x + width, y + height], [x, y + height]], dtype=np.float32)
+
+
+def test_quad_iou():
+    assert quad_iou(_quad(0, 0), _quad(0, 0)) == pytest.approx(1.0)
+    assert quad_iou(_quad(0, 0), _quad(500, 500)) == 0.0
+    assert quad_iou(_quad(0, 0, 100, 100), _quad(50, 0, 100, 100)) == pytest.approx(1 / 3, abs=1e-3)
+
+
+def test_quad_iou_of_non_convex_detection():
+    # Coins dans le désordre (quadrilatère croisé) : comparé via son enveloppe convexe
+    crossed = _quad(0, 0)[[0, 2, 1, 3]]
+    assert quad_iou(crossed, _quad(0, 0)) == pytest.approx(1.0)
+
+
+def test_corner_displacement_is_relative_to_card_size():
+    assert corner_displacement(_quad(0, 0), _quad(0, 0)) == 0.0
+    diagonal = np.hypot(64, 89) # Boîte englobante entière (coins inclus)
+    assert corner_displacement(_quad(0, 0), _quad(10, 0)) == pytest.approx(10 / diagonal, rel=1e-3)
+
+
+def _identify(tracker, detections, match_result):
+    """Un traitement : met à jour les pistes et identifie celles qui le demandent."""
+    visible_tracks = tracker.update(detections)
+    to_identify = tracker.tracks_to_identify(visible_tracks)
+    for track in to_identify:
+        tracker.store_identification(track, match_result)
+    return visible_tracks, to_identify
+
+
+def test_static_cards_are_identified_once():
+    tracker = CardTracker()
+    detections = [_quad(0, 0), _quad(100, 0), _quad(200, 0)]
+    _, to_identify = _identify(tracker, detections, ACCEPTED)
+    assert len(to_identify) == 3
+    for _ in range(10):
+        _, to_identify = _identify(tracker, detections, ACCEPTED)
+        assert to_identify == []
+    assert (tracker.identifications_requested, tracker.identifications_skipped) == (3, 30)
+
+
+def test_tracks_keep_their_identity_and_moved_cards_are_reidentified():
+    tracker = CardTracker()
+    first_tracks, _ = _identify(tracker, [_quad(0, 0), _quad(100, 0)], ACCEPTED)
+    # La deuxième carte bouge un peu (recouvrement suffisant, déplacement au-delà du seuil)
+    second_tracks, to_identify = _identify(tracker, [_quad(0, 0), _quad(112, 0)], ACCEPTED)
+    assert [track.track_id for track in second_tracks] == [track.track_id for track in first_tracks]
+    assert [track.track_id for track in to_identify] == [first_tracks[1].track_id]
+
+
+def test_lost_tracks_are_dropped():
+    tracker = CardTracker(max_missed_frames=2)
+    _identify(tracker, [_quad(0, 0)], ACCEPTED)
+    for _ in range(3):
+        tracker.update([])
+    assert tracker.tracks == []
+    _, to_identify = _identify(tracker, [_quad(0, 0)], ACCEPTED)
+    assert len(to_identify) == 1
+
+
+@pytest.mark.parametrize("match_result", [REJECTED, LOW_CONFIDENCE])
+def test_unreliable_static_track_backs_off_exponentially(match_result):
+    tracker = CardTracker()
+    identified_at = []
+    for frame in range(200):
+        _, to_identify = _identify(tracker, [_quad(0, 0)], match_result)
+        if to_identify:
+            identified_at.append(frame)
+    intervals = np.diff(identified_at).tolist()
+    assert intervals[0] == UNRELIABLE_RETRY_INTERVAL
+    assert intervals == sorted(intervals)
+    assert max(intervals) == MAX_UNRELIABLE_RETRY_INTERVAL
+    assert len(identified_at) < 20
+
+
+def test_reliable_identification_resets_back_off():
+    tracker = CardTracker()
+    for _ in range(20):
+        _identify(tracker, [_quad(0, 0)], REJECTED)
+    track = tracker.tracks[0]
+    assert track.retry_interval() > UNRELIABLE_RETRY_INTERVAL
+    tracker.store_identification(track, ACCEPTED)
+    assert track.unreliable_identifications == 0
+    assert not track.needs_identification()
+
+
+def test_invalidate_identifications_forces_reidentification():
+    tracker = CardTracker()
+    detections = [_quad(0, 0), _quad(100, 0)]
+    _identify(tracker, detections, ACCEPTED)
+    tracker.invalidate_identifications()
+    _, to_identify = _identify(tracker, detections, ACCEPTED)
+    assert len(to_identify) == 2
@@ -0,0 +1,52 @@
+# tests/test_hash_audit.py
+"""Audit des quasi-doublons : comparaison avec un calcul par paires en Python pur."""
+import numpy as np
+import pytest
+
+from conftest import hamming
+from hash_audit import NO_NEIGHBOUR_DISTANCE, audit_hashes, build_audit_report, collision_clusters
+from hash_matcher import HashMatrix
+
+
+@pytest.mark.parametrize("block_size", [7, 64, 1024])
+def test_audit_matches_brute_force(hashed_data, block_size):
+    hashed_data = hashed_data[:120]
+    audit = audit_hashes(HashMatrix.from_hashed_data(hashed_data), radius=4, block_size=block_size, workers=3)
+    for index, card_entry in enumerate(hashed_data):
+        others = [(hamming(card_entry["hash"], other["hash"]), other_index)
+                  for other_index, other in enumerate(hashed_data) if other_index != index]
+        assert audit["nearest_distance"][index] == min(others)[0]
+        different_names = [distance for distance, other_index in others
+                           if hashed_data[other_index]["name"] != card_entry["name"]]
+        assert audit["min_separation"][index] == min(different_names + [NO_NEIGHBOUR_DISTANCE])
+
+    expected_pairs = {(first, second, hamming(hashed_data[first]["hash"], hashed_data[second]["hash"]))
+                      for first in range(len(hashed_data)) for second in range(first + 1, len(hashed_data))
+                      if hamming(hashed_data[first]["hash"], hashed_data[second]["hash"]) <= 4}
+    assert set(map(tuple, audit["pairs"].tolist())) == expected_pairs
+    assert expected_pairs # La base synthétique contient des quasi-doublons
+
+
+def test_card_without_differently_named_neighbour():
+    hash_matrix = HashMatrix(np.array([0, 1], dtype=np.uint64), ["a-1", "a-2"], ["Pikachu", "Pikachu"])
+    audit = audit_hashes(hash_matrix)
+    assert audit["min_separation"].tolist() == [NO_NEIGHBOUR_DISTANCE] * 2
+    assert audit["separation_index"].tolist() == [-1, -1]
+    assert audit["nearest_index"].tolist() == [1, 0]
+
+
+def test_collision_clusters():
+    pairs = np.array([[0, 1, 2], [1, 4, 3], [5, 6, 0]])
+    assert collision_clusters(7, pairs) == [[0, 1, 4], [5, 6]]
+    assert collision_clusters(3, np.empty((0, 3), dtype=np.int64)) == []
+
+
+def test_report_flags_conflicting_clusters(hashed_data):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    audit = audit_hashes(hash_matrix)
+    report = build_audit_report(hash_matrix, audit)
+    # Une quasi-collision sur dix cartes, dont une sur deux entre cartes de même nom (réimpression)
+    assert report["near_duplicate_pairs"] == 30
+    assert (report["clusters"], report["conflicting_clusters"]) == (30, 15)
+    assert report["collision_clusters"][0]["conflicting"]
+    assert report["least_separated_cards"][0]["min_separation"] == int(audit["min_separation"].min())
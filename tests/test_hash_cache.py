@@ -0,0 +1,45 @@
+# tests/test_hash_cache.py
+"""Cache local des hachages : validité par URL et par empreintes, persistance."""
+from hash_cache import HashCache, content_digest
+from hash_matcher import SECONDARY_HASH_FUNCTIONS
+
+URL = "https://images.example/base1/4_hires.png"
+FINGERPRINTS = dict({"hash": "ba7ae1e504989dc5"}, **{name: "0" * 16 for name in SECONDARY_HASH_FUNCTIONS})
+
+
+def test_entry_is_invalidated_when_the_url_changes(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.json"))
+    cache.update("base1-4", URL, FINGERPRINTS, etag='"abc"')
+    assert cache.get("base1-4", URL)["fingerprints"] == FINGERPRINTS
+    assert cache.get("base1-4", URL.replace("base1", "base2")) is None
+    assert cache.get("base1-5", URL) is None
+
+
+def test_entry_without_all_fingerprints_is_invalid(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.json"))
+    cache.update("base1-4", URL, {"hash": FINGERPRINTS["hash"]})
+    assert cache.get("base1-4", URL) is None
+
+
+def test_conditional_headers(tmp_path):
+    cache = HashCache(str(tmp_path / "cache.json"))
+    cache.update("base1-4", URL, FINGERPRINTS, etag='"abc"', last_modified="Wed, 21 Oct 2015 07:28:00 GMT")
+    assert cache.conditional_headers(cache.get("base1-4", URL)) == {
+        "If-None-Match": '"abc"', "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"}
+    assert cache.conditional_headers(None) == {}
+
+
+def test_save_and_reload(tmp_path):
+    cache_path = str(tmp_path / "cache.json")
+    cache = HashCache(cache_path)
+    cache.update("base1-4", URL, FINGERPRINTS, digest=content_digest(b"image"))
+    cache.save()
+    reloaded = HashCache(cache_path)
+    assert reloaded.get("base1-4", URL)["digest"] == content_digest(b"image")
+    assert not (tmp_path / "cache.json.tmp").exists()
+
+
+def test_unreadable_cache_is_rebuilt(tmp_path):
+    cache_path = tmp_path / "cache.json"
+    cache_path.write_text("{ tronqué")
+    assert HashCache(str(cache_path)).entries == {}
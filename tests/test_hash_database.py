@@ -0,0 +1,106 @@
+# tests/test_hash_database.py
+"""Format binaire : aller-retour JSON -> binaire -> HashMatrix et régénération du binaire."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from hash_audit import audit_hashes
+from hash_database import (StringTable, convert_json_to_binary, load_hash_database, load_hash_matrix,
+                           read_hash_database_sections, write_hash_database)
+from hash_matcher import HashMatrix, SECONDARY_HASH_FUNCTIONS
+
+
+@pytest.fixture()
+def json_path(tmp_path, hashed_data):
+    path = tmp_path / "hashes.json"
+    path.write_text(json.dumps(hashed_data))
+    return str(path)
+
+
+def test_write_and_read_sections(tmp_path):
+    binary_path = str(tmp_path / "db.bin")
+    hashes = np.array([1, 2 ** 64 - 1, 12345], dtype=np.uint64)
+    write_hash_database(binary_path, hashes, {"id": ["a-1", "b-2", "c-3"], "name": ["Évoli", "", "Mew ex"]},
+                        uint64_columns={"dhash": [7, 8, 9]})
+    card_count, sections = read_hash_database_sections(binary_path)
+    assert card_count == 3
+    assert sections["phash"].tolist() == hashes.tolist()
+    assert sections["dhash"].tolist() == [7, 8, 9]
+    assert isinstance(sections["name"], StringTable)
+    assert list(sections["name"]) == ["Évoli", "", "Mew ex"]
+    assert sections["id"][-1] == "c-3"
+    with pytest.raises(IndexError):
+        sections["id"][3]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_write_rejects_misaligned_columns(tmp_path):
+    with pytest.raises(ValueError):
+        write_hash_database(str(tmp_path / "db.bin"), np.zeros(2, dtype=np.uint64), {"id": ["a-1"]})
+
+
+def test_read_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_db.bin"
+    path.write_bytes(b"NOTADB!!" + b"\0" * 32)
+    with pytest.raises(ValueError):
+        read_hash_database_sections(str(path))
+
+
+def test_json_to_binary_round_trip(tmp_path, json_path, hashed_data):
+    binary_path = str(tmp_path / "hashes.bin")
+    assert convert_json_to_binary(json_path, binary_path) == len(hashed_data)
+    from_json = HashMatrix.from_hashed_data(hashed_data)
+    from_binary = load_hash_database(binary_path)
+
+    assert len(from_binary) == len(from_json)
+    assert np.array_equal(from_binary.hashes, from_json.hashes)
+    assert list(from_binary.ids) == from_json.ids
+    assert list(from_binary.names) == from_json.names
+    assert list(from_binary.set_ids) == from_json.set_ids
+    assert list(from_binary.series) == from_json.series
+    assert set(from_binary.secondary_hashes) == set(SECONDARY_HASH_FUNCTIONS)
+    for name, column in from_json.secondary_hashes.items():
+        assert np.array_equal(from_binary.secondary_hashes[name], column)
+    for index in (0, 57, len(hashed_data) - 1):
+        assert from_binary.entry(index)["id"] == hashed_data[index]["id"]
+        assert from_binary.entry(index)["hash"] == hashed_data[index]["hash"]
+
+
+def test_conversion_audits_without_touching_json(tmp_path, json_path, hashed_data):
+    json_before = open(json_path).read()
+    binary_path = str(tmp_path / "hashes.bin")
+    convert_json_to_binary(json_path, binary_path)
+    from_binary = load_hash_database(binary_path)
+
+    expected_separation = audit_hashes(HashMatrix.from_hashed_data(hashed_data))["min_separation"]
+    assert np.array_equal(from_binary.min_separation, expected_separation)
+    assert from_binary.acceptance_radii is not None
+    assert open(json_path).read() == json_before
+
+
+def test_load_hash_matrix_converts_only_when_json_is_newer(tmp_path, json_path):
+    binary_path = str(tmp_path / "hashes.bin")
+    load_hash_matrix(json_path, binary_path)
+    assert os.path.exists(binary_path)
+
+    # Binaire plus récent que le JSON : réutilisé tel quel
+    os.utime(json_path, (1_000_000, 1_000_000))
+    binary_mtime = os.path.getmtime(binary_path)
+    load_hash_matrix(json_path, binary_path)
+    assert os.path.getmtime(binary_path) == binary_mtime
+
+    # JSON modifié après le binaire : reconverti
+    hashed_data = json.load(open(json_path))[:10]
+    with open(json_path, "w") as f:
+        json.dump(hashed_data, f)
+    os.utime(binary_path, (1_000_000, 1_000_000))
+    assert len(load_hash_matrix(json_path, binary_path)) == 10
+
+
+def test_load_hash_matrix_without_json_uses_binary(tmp_path, json_path, hashed_data):
+    binary_path = str(tmp_path / "hashes.bin")
+    convert_json_to_binary(json_path, binary_path)
+    os.remove(json_path)
+    assert len(load_hash_matrix(json_path, binary_path)) == len(hashed_data)
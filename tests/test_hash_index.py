@@ -0,0 +1,48 @@
+# tests/test_hash_index.py
+"""Index multi-bandes (MultiIndexHash) comparé à la recherche linéaire."""
+import pytest
+
+from card_identifier import find_matching_card
+from conftest import hamming
+from hash_index import MultiIndexHash
+from hash_matcher import HashMatrix
+from test_hash_matcher import card_images, hashed_card_images, near_queries
+
+
+@pytest.mark.parametrize("num_bands", [2, 4, 8])
+def test_nearest_matches_hash_matrix(hashed_data, num_bands):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    index = MultiIndexHash(hash_matrix, num_bands=num_bands)
+    for query_hex in near_queries(hashed_data):
+        best_index, distance, _ = index.nearest(query_hex, max_hamming_distance=12)
+        expected_index, expected_distance = hash_matrix.best_match(query_hex, max_hamming_distance=12)
+        assert best_index == expected_index
+        if expected_index is not None:
+            assert distance == expected_distance
+
+
+def test_range_search_matches_brute_force(hashed_data):
+    index = MultiIndexHash.from_hashed_data(hashed_data)
+    for query_hex in near_queries(hashed_data, count=20):
+        results, _ = index.range_search(query_hex, radius=8)
+        expected = sorted((hamming(card_entry["hash"], query_hex), card_index)
+                          for card_index, card_entry in enumerate(hashed_data)
+                          if hamming(card_entry["hash"], query_hex) <= 8)
+        assert results == [(card_index, distance) for distance, card_index in expected]
+
+
+def test_index_backend_matches_python_loop():
+    images = card_images(12)
+    hashed_data = hashed_card_images(images)
+    index = MultiIndexHash.from_hashed_data(hashed_data)
+    for query in [image.rotate(2) for image in images] + card_images(3, seed=5):
+        expected_id = find_matching_card(query, hashed_data, backend="python")["id"]
+        assert find_matching_card(query, hashed_data, backend="index")["id"] == expected_id
+        assert find_matching_card(query, index)["id"] == expected_id
+
+
+def test_index_backend_on_hash_matrix():
+    # load_hash_matrix et ReloadingHashDatabase retournent une HashMatrix
+    hash_matrix = HashMatrix.from_hashed_data(hashed_card_images(card_images(8)))
+    for index, query in enumerate(card_images(8)):
+        assert find_matching_card(query, hash_matrix, backend="index")["id"] == hash_matrix.ids[index]
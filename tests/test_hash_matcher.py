@@ -0,0 +1,77 @@
+# tests/test_hash_matcher.py
+"""Backend vectorisé (HashMatrix, XOR + popcount) comparé à la boucle Python d'origine."""
+import imagehash
+import numpy as np
+import pytest
+from PIL import Image
+
+from card_identifier import find_matching_card, find_matching_cards
+from conftest import hamming
+from hash_matcher import HashMatrix, compute_fingerprints, popcount64
+
+
+def brute_force_nearest(hashed_data, query_hex, max_hamming_distance):
+    distances = [hamming(card_entry["hash"], query_hex) for card_entry in hashed_data]
+    best_index = min(range(len(distances)), key=lambda index: (distances[index], index))
+    if distances[best_index] > max_hamming_distance:
+        return None, distances[best_index]
+    return best_index, distances[best_index]
+
+
+def near_queries(hashed_data, count=60, seed=1):
+    """Requêtes à distance variable (0 à 20 bits) de cartes de la base, plus des hashes aléatoires."""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(count):
+        value = int(hashed_data[int(rng.integers(len(hashed_data)))]["hash"], 16)
+        for bit in rng.choice(64, size=int(rng.integers(0, 21)), replace=False):
+            value ^= 1 << int(bit)
+        queries.append(f"{value:016x}")
+    queries.extend(f"{int(value):016x}" for value in rng.integers(0, 2 ** 63, 10))
+    return queries
+
+
+def card_images(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [Image.fromarray(rng.integers(0, 256, (22, 16, 3), dtype=np.uint8)).resize((250, 349))
+            for _ in range(count)]
+
+
+def hashed_card_images(images):
+    """Entrées de base (format de `load_hashed_data`, avec "hash_obj") pour des images de cartes."""
+    hashed_data = [dict(compute_fingerprints(image), id=f"base1-{index}", name=f"Carte {index}")
+                   for index, image in enumerate(images)]
+    for card_entry in hashed_data:
+        card_entry["hash_obj"] = imagehash.hex_to_hash(card_entry["hash"])
+    return hashed_data
+
+
+def test_popcount_matches_python():
+    values = np.random.default_rng(0).integers(0, 2 ** 64, 1000, dtype=np.uint64)
+    assert popcount64(values).tolist() == [bin(int(value)).count("1") for value in values]
+
+
+@pytest.mark.parametrize("max_hamming_distance", [0, 6, 10, 14])
+def test_hash_matrix_best_match_matches_brute_force(hashed_data, max_hamming_distance):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    queries = near_queries(hashed_data)
+    for query_hex in queries:
+        assert hash_matrix.best_match(query_hex, max_hamming_distance) == \
+            brute_force_nearest(hashed_data, query_hex, max_hamming_distance)
+    assert hash_matrix.best_matches(queries, max_hamming_distance) == \
+        [brute_force_nearest(hashed_data, query_hex, max_hamming_distance) for query_hex in queries]
+
+
+def test_find_matching_card_numpy_backend_matches_python_loop():
+    images = card_images(12)
+    hashed_data = hashed_card_images(images)
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    queries = [image.rotate(2) for image in images] + card_images(3, seed=5)
+
+    for query in queries:
+        expected_id = find_matching_card(query, hashed_data, backend="python")["id"]
+        assert find_matching_card(query, hashed_data, backend="numpy")["id"] == expected_id
+        assert find_matching_card(query, hash_matrix)["id"] == expected_id
+    batch_ids = [result["id"] for result in find_matching_cards(queries, hash_matrix)]
+    assert batch_ids == [find_matching_card(query, hash_matrix)["id"] for query in queries]
+    assert batch_ids[:len(images)] == [card_entry["id"] for card_entry in hashed_data]
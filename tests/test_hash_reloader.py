@@ -0,0 +1,72 @@
+# tests/test_hash_reloader.py
+"""Rechargement à chaud de la base quand son fichier JSON change."""
+import json
+import os
+
+import pytest
+
+from hash_reloader import STABLE_POLLS_BEFORE_RELOAD, ReloadingHashDatabase
+
+
+def _write_json(path, hashed_data, mtime):
+    with open(path, "w") as f:
+        json.dump(hashed_data, f)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture()
+def json_path(tmp_path, hashed_data):
+    path = str(tmp_path / "hashes.json")
+    _write_json(path, hashed_data, 1_000_000)
+    return path
+
+
+def _poll_until_reload(database):
+    results = [database.check_for_update() for _ in range(STABLE_POLLS_BEFORE_RELOAD)]
+    assert results[:-1] == [False] * (STABLE_POLLS_BEFORE_RELOAD - 1)
+    return results[-1]
+
+
+def test_unchanged_file_is_not_reloaded(json_path):
+    database = ReloadingHashDatabase(json_path)
+    assert [database.check_for_update() for _ in range(3)] == [False] * 3
+    assert database.generation == 1
+
+
+def test_changed_file_is_swapped_after_it_is_stable(json_path, hashed_data):
+    reloaded = []
+    database = ReloadingHashDatabase(json_path, on_reload=reloaded.append)
+    first = database.current
+    _write_json(json_path, hashed_data[:50], 1_000_010)
+
+    assert _poll_until_reload(database)
+    assert len(database) == 50
+    assert database.previous is first
+    assert (database.generation, database.reload_count) == (2, 1)
+    assert reloaded == [database.current]
+    assert not database.check_for_update()
+
+
+def test_binary_database_is_reconverted(tmp_path, json_path, hashed_data):
+    binary_path = str(tmp_path / "hashes.bin")
+    database = ReloadingHashDatabase(json_path, binary_path)
+    assert len(database) == len(hashed_data)
+    _write_json(json_path, hashed_data[:20], 1_000_010)
+
+    assert _poll_until_reload(database)
+    assert len(database) == 20
+    assert list(database.current.ids) == [card_entry["id"] for card_entry in hashed_data[:20]]
+
+
+def test_invalid_file_keeps_the_current_database(json_path, hashed_data):
+    database = ReloadingHashDatabase(json_path)
+    with open(json_path, "w") as f:
+        f.write("[{ tronqué")
+    os.utime(json_path, (1_000_010, 1_000_010))
+
+    assert not _poll_until_reload(database)
+    assert len(database) == len(hashed_data)
+    assert database.reload_errors == 1
+    # Le même fichier invalide n'est pas réessayé en boucle
+    assert not database.check_for_update()
+    assert database.reload_errors == 1
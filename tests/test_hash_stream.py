@@ -0,0 +1,58 @@
+# tests/test_hash_stream.py
+"""Flux JSON Lines du builder : reprise après interruption et compactage."""
+import json
+
+from hash_stream import HashStreamWriter, compact_hash_stream, read_hash_stream, read_streamed_card_ids
+
+
+def _card(card_id, hash_value="0" * 16):
+    return {"id": card_id, "name": f"Carte {card_id}", "hash": hash_value}
+
+
+def test_writer_streams_one_card_per_line(tmp_path):
+    stream_path = str(tmp_path / "stream.jsonl")
+    with HashStreamWriter(stream_path, checkpoint_every=2) as writer:
+        for index in range(5):
+            writer.write(_card(f"base1-{index}"))
+    assert writer.written_count == 5
+    assert [card["id"] for card in read_hash_stream(stream_path)] == [f"base1-{index}" for index in range(5)]
+
+
+def test_resume_drops_partial_last_line(tmp_path):
+    stream_path = tmp_path / "stream.jsonl"
+    # Écriture interrompue au milieu de la troisième carte
+    stream_path.write_text(json.dumps(_card("base1-1")) + "\n" + json.dumps(_card("base1-2")) + "\n{\"id\": \"base1-")
+    assert read_streamed_card_ids(str(stream_path)) == {"base1-1", "base1-2"}
+
+    with HashStreamWriter(str(stream_path), resume=True) as writer:
+        writer.write(_card("base1-3"))
+    lines = stream_path.read_text().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["base1-1", "base1-2", "base1-3"]
+
+
+def test_without_resume_the_stream_restarts(tmp_path):
+    stream_path = tmp_path / "stream.jsonl"
+    stream_path.write_text(json.dumps(_card("base1-1")) + "\n")
+    with HashStreamWriter(str(stream_path)) as writer:
+        writer.write(_card("base1-2"))
+    assert read_streamed_card_ids(str(stream_path)) == {"base1-2"}
+
+
+def test_missing_stream_is_empty(tmp_path):
+    assert read_streamed_card_ids(str(tmp_path / "absent.jsonl")) == set()
+
+
+def test_compact_keeps_last_value_and_merges_existing(tmp_path):
+    stream_path, output_path = str(tmp_path / "stream.jsonl"), tmp_path / "hashes.json"
+    output_path.write_text(json.dumps([_card("old-1", "1" * 16), _card("base1-1", "2" * 16)]))
+    with HashStreamWriter(stream_path) as writer:
+        writer.write(_card("base1-1", "3" * 16))
+        writer.write(_card("base1-2", "4" * 16))
+        writer.write(_card("base1-1", "5" * 16))
+
+    assert compact_hash_stream(stream_path, str(output_path), merge_existing=True) == 3
+    compacted = {card["id"]: card["hash"] for card in json.loads(output_path.read_text())}
+    assert compacted == {"old-1": "1" * 16, "base1-1": "5" * 16, "base1-2": "4" * 16}
+
+    assert compact_hash_stream(stream_path, str(output_path)) == 2
+    assert {card["id"] for card in json.loads(output_path.read_text())} == {"base1-1", "base1-2"}
@@ -0,0 +1,50 @@
+# tests/test_scanner_pipeline.py
+"""Pipeline capture -> traitement -> affichage sur une source synthétique."""
+import threading
+
+import numpy as np
+
+from scanner_pipeline import run_pipeline
+
+
+class FrameSource:
+    """Source imitant cv2.VideoCapture : `frame_count` images noires, puis fin de flux."""
+
+    def __init__(self, frame_count):
+        self.remaining = frame_count
+
+    def read(self):
+        if self.remaining <= 0:
+            return False, None
+        self.remaining -= 1
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def _recording_processor(processed):
+    def process_frame(frame):
+        processed.append(frame)
+        return []
+    return process_frame
+
+
+def test_every_nth_frame_is_processed():
+    processed = []
+    pipeline_metrics = run_pipeline(FrameSource(40), _recording_processor(processed), processing_interval=5, workers=1,
+                                    realtime=True, fps=500)
+    assert pipeline_metrics["frames_processed"] == len(processed)
+    assert 0 < len(processed) <= 8
+    assert pipeline_metrics["frames_skipped"] > 0
+
+
+def test_forced_processing_ignores_the_interval():
+    processed = []
+    force_processing = threading.Event()
+    force_processing.set()
+    pipeline_metrics = run_pipeline(FrameSource(20), _recording_processor(processed), processing_interval=1000,
+                                    realtime=True, fps=500, force_processing=force_processing)
+    assert pipeline_metrics["frames_submitted"] == 1
+    assert len(processed) == 1
+    assert not force_processing.is_set()
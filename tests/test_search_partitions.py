@@ -0,0 +1,107 @@
+# tests/test_search_partitions.py
+"""Partitions de la base (extensions, séries), périmètres de recherche et biais de session."""
+import numpy as np
+import pytest
+
+import hash_matcher
+from hash_matcher import HashMatrix
+from search_partitions import SearchScope, SessionPrior, parse_partition_list
+
+
+def test_partitions_count_cards(hashed_data):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    assert hash_matrix.partitions() == {"base1": 60, "base2": 60, "sm9": 60, "sv3pt5": 60, "swsh1": 60}
+    assert hash_matrix.partitions(by="series") == {"Sun & Moon": 60, "Other": 240}
+
+
+def test_restrict_matches_a_filtered_database(hashed_data):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    restricted = hash_matrix.restrict(set_ids=["base1", "sm9"])
+    expected = [card_entry for card_entry in hashed_data if card_entry["id"].split("-")[0] in ("base1", "sm9")]
+    assert list(restricted.ids) == [card_entry["id"] for card_entry in expected]
+    assert restricted.hashes.flags["C_CONTIGUOUS"]
+
+    filtered = HashMatrix.from_hashed_data(expected)
+    for card_entry in expected[::7]:
+        best_index, distance = restricted.best_match(card_entry["hash"])
+        assert restricted.entry(best_index)["id"] == filtered.entry(filtered.best_match(card_entry["hash"])[0])["id"]
+        assert distance == 0
+
+
+def test_restrict_by_series_and_without_filter(hashed_data):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    assert hash_matrix.restrict() is hash_matrix
+    assert {card_id.split("-")[0] for card_id in hash_matrix.restrict(series=["Sun & Moon"]).ids} == {"sm9"}
+    assert len(hash_matrix.restrict(set_ids=["base1"], series=["Sun & Moon"])) == 0
+
+
+def test_restrict_rejects_unknown_partitions(hashed_data):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    with pytest.raises(ValueError, match="base9"):
+        hash_matrix.restrict(set_ids=["base1", "base9"])
+    with pytest.raises(ValueError, match="Diamond"):
+        hash_matrix.restrict(series=["Diamond"])
+
+
+def test_restricted_matrices_are_cached_with_bounded_size(hashed_data, monkeypatch):
+    monkeypatch.setattr(hash_matcher, "RESTRICTED_CACHE_SIZE", 2)
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    base1 = hash_matrix.restrict(set_ids=["base1"])
+    assert hash_matrix.restrict(set_ids=("base1",)) is base1
+    hash_matrix.restrict(set_ids=["base2"])
+    assert hash_matrix.restrict(set_ids=["base1"]) is base1 # Le plus récemment utilisé est conservé
+    hash_matrix.restrict(set_ids=["sm9"])
+    assert len(hash_matrix._restricted) == 2
+    assert hash_matrix.restrict(set_ids=["base1"]) is base1
+    assert hash_matrix.restrict(set_ids=["base2"]) is not None
+
+
+def test_search_scope(hashed_data):
+    assert parse_partition_list(" base1, ,sm9 ") == ("base1", "sm9")
+    assert parse_partition_list("") is None
+    assert not SearchScope()
+    scope = SearchScope("base1,sm9")
+    assert scope.key == (frozenset({"base1", "sm9"}), frozenset())
+    assert scope.contains({"id": "base1-4"})
+    assert not scope.contains({"id": "base2-4"})
+    assert len(scope.apply(hashed_data)) == 120
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    assert SearchScope().apply(hash_matrix) is hash_matrix
+
+
+def test_session_prior_favours_recent_sets():
+    session_prior = SessionPrior(max_bonus=1.5, min_observations=3)
+    matches = [{"id": "base1-1", "set_id": "base1", "score": 10.0, "distance": 10},
+               {"id": "sm9-1", "set_id": "sm9", "score": 10.5, "distance": 10}]
+    session_prior.observe({"id": "sm9-2"})
+    session_prior.observe({"id": "sm9-3"})
+    assert session_prior.bonus("sm9") == 0.0
+    assert session_prior.apply([dict(match) for match in matches])[0]["id"] == "base1-1"
+
+    session_prior.observe({"id": "sm9-4", "set_id": "sm9"})
+    assert session_prior.bonus("sm9") == pytest.approx(1.5)
+    assert session_prior.top_sets() == [("sm9", pytest.approx(1.0))]
+    reranked = session_prior.apply([dict(match) for match in matches])
+    assert [match["id"] for match in reranked] == ["sm9-1", "base1-1"]
+    assert reranked[0]["prior_bonus"] == pytest.approx(1.5)
+
+    session_prior.reset()
+    assert session_prior.bonus("sm9") == 0.0
+
+
+def test_session_prior_decays_old_observations():
+    session_prior = SessionPrior(decay=0.5, min_observations=1)
+    session_prior.observe({"id": "base1-1"})
+    session_prior.observe({"id": "sm9-1"})
+    assert session_prior.bonus("sm9") > session_prior.bonus("base1")
+    assert np.isclose(session_prior.bonus("sm9") + session_prior.bonus("base1"), session_prior.max_bonus)
+
+
+def test_entry_decodes_requested_row(hashed_data):
+    hash_matrix = HashMatrix.from_hashed_data(hashed_data)
+    card_entry = hash_matrix.restrict(set_ids=["sm9"]).entry(3)
+    expected = [card_entry for card_entry in hashed_data if card_entry["id"].startswith("sm9-")][3]
+    assert card_entry["id"] == expected["id"]
+    assert card_entry["name"] == expected["name"]
+    assert card_entry["hash"] == expected["hash"]
+    assert (card_entry["set_id"], card_entry["series"]) == ("sm9", "Sun & Moon")